@@ -1,16 +1,37 @@
 #!/usr/bin/env python
 import argparse
 import datetime
+import glob
+import multiprocessing
 import os
+import Queue
 import re
+import shutil
 import socket
 import sys
+import tempfile
 import time
+import traceback
 
 from json_to_relation.edxTrackLogJSONParser import EdXTrackLogJSONParser
-from json_to_relation.input_source import InURI
+from json_to_relation.input_source import InURI, InFileSegment
 from json_to_relation.json_to_relation import JSONToRelation
-from json_to_relation.output_disposition import OutputDisposition, OutputFile
+from json_to_relation.output_disposition import OutputDisposition, OutputFile, OutputRows
+from json_to_relation.transform_manifest import TransformManifest
+from json_to_relation.transform_stats import TransformStats
+
+# Dates in daily tracking log names, such as tracking.log-20130610.gz
+# or tracking_log_2016-03-01.json:
+LOG_FILE_DATE_PATTERN = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+
+# Rows passed at once by convertToRows(), and how many such
+# batches may be waiting for the caller to take them:
+ROW_BATCH_SIZE = 1000
+ROW_QUEUE_BATCHES = 64
+
+# Tables to which every shard's parser writes the same rows,
+# keyed by the input file, such as its LoadInfo row:
+PER_FILE_TABLE_SUFFIXES = ['_LoadInfoTable.csv']
 
 # Transforms a single .json OpenEdX tracking log file to
 # relational tables. See argparse below for options.
@@ -29,13 +50,492 @@ def buildOutputFileName(inFilePath, destDir):
     '''
     return os.path.join(destDir, os.path.basename(inFilePath) + '.sql')
 
+def computeShardOffsets(inFilePath, numShards):
+    '''
+    Split an uncompressed file into at most numShards byte ranges
+    whose boundaries fall on line starts. Small files may yield
+    fewer ranges than requested.
+
+    @param inFilePath: full path to .json file
+    @type inFilePath: String
+    @param numShards: number of ranges wanted
+    @type numShards: int
+    @return: list of (startOffset, endOffset) tuples, in file order
+    @rtype: [(int,int)]
+    '''
+    fileSize = os.path.getsize(inFilePath)
+    boundaries = [0]
+    with open(inFilePath, 'rb') as fd:
+        for shardNum in range(1, numShards):
+            approxOffset = fileSize * shardNum / numShards
+            if approxOffset <= boundaries[-1]:
+                continue
+            # Back up one byte, so that an offset that already
+            # sits on a line start is kept as is:
+            fd.seek(approxOffset - 1)
+            fd.readline()
+            offset = fd.tell()
+            if offset > boundaries[-1] and offset < fileSize:
+                boundaries.append(offset)
+    boundaries.append(fileSize)
+    return zip(boundaries[:-1], boundaries[1:])
+
+def convertShard(shardSpec):
+    '''
+    Pool worker: translate one byte range of a tracking log
+    into its own set of CSV files. Must be a module level function
+    so that multiprocessing can pickle it.
+
+    @param shardSpec: (inFilePath, startOffset, endOffset, shardOutFullPath, shardLogFile, dropTables, collectStats)
+    @type shardSpec: (String, int, int, String, String, Boolean, Boolean)
+    @return: the shard's .sql file name, and its TransformStats if collectStats is True, else None
+    @rtype: (String, {TransformStats | None})
+    '''
+    (inFilePath, startOffset, endOffset, shardOutFullPath, shardLogFile, dropTables, collectStats) = shardSpec
+    outSQLFile = OutputFile(shardOutFullPath, OutputDisposition.OutputFormat.CSV, options='wb')
+    jsonConverter = JSONToRelation(InFileSegment(inFilePath, startOffset, endOffset),
+                                   outSQLFile,
+                                   mainTableName='EdxTrackEvent',
+                                   logFile=shardLogFile,
+                                   progressEvery = 10000,
+                                   collectStats=collectStats
+                                   )
+    jsonConverter.setParser(EdXTrackLogJSONParser(jsonConverter,
+                                                  'EdxTrackEvent',
+                                                  replaceTables=dropTables,
+                                                  dbName='Edx',
+                                                  progressEvery = 10000
+                                              ))
+    jsonConverter.convert()
+    return (shardOutFullPath, jsonConverter.stats)
+
+def listTableSuffixes(shardOutFullPaths):
+    '''
+    Not every shard necessarily produces every table. Collect
+    the '_<tableName>Table.csv' suffixes of the CSV files of all
+    of them.
+
+    @param shardOutFullPaths: .sql file names of the shards
+    @type shardOutFullPaths: [String]
+    @return: the suffixes, sorted
+    @rtype: [String]
+    '''
+    tableSuffixes = set()
+    for shardOutFullPath in shardOutFullPaths:
+        (shardDir, shardFileName) = os.path.split(shardOutFullPath)
+        for fileName in os.listdir(shardDir):
+            if fileName.startswith(shardFileName + '_'):
+                tableSuffixes.add(fileName[len(shardFileName):])
+    return sorted(tableSuffixes)
+
+def mergeShardOutputs(shardOutFullPaths, outFullPath, shardLogFiles, logFile, append=False):
+    '''
+    Concatenate the per-table CSV files of all shards, in shard
+    order, into the CSV files a single-process run would have
+    produced. Of the tables in PER_FILE_TABLE_SUFFIXES, only the
+    rows of the first shard are kept, since the other shards repeat
+    them. The .sql file of the first shard is kept, with its
+    LOAD DATA file names pointed at the merged CSV files. Shard
+    logs are appended to the main log.
+
+    @param shardOutFullPaths: .sql file names of the shards, in input order
+    @type shardOutFullPaths: [String]
+    @param outFullPath: .sql file name of the merged result
+    @type outFullPath: String
+    @param shardLogFiles: log files of the shards, in input order
+    @type shardLogFiles: [String]
+    @param logFile: main log file
+    @type logFile: String
+    @param append: if True, add to existing merged CSV files, rather than replacing them
+    @type append: Boolean
+    '''
+    for tableSuffix in listTableSuffixes(shardOutFullPaths):
+        with open(outFullPath + tableSuffix, 'ab' if append else 'wb') as outFd:
+            for shardOutFullPath in shardOutFullPaths:
+                if not os.path.exists(shardOutFullPath + tableSuffix):
+                    continue
+                with open(shardOutFullPath + tableSuffix, 'rb') as inFd:
+                    shutil.copyfileobj(inFd, outFd, 1024 * 1024)
+                if tableSuffix in PER_FILE_TABLE_SUFFIXES:
+                    break
+
+    with open(shardOutFullPaths[0], 'rb') as inFd:
+        sqlText = inFd.read()
+    with open(outFullPath, 'wb') as outFd:
+        outFd.write(sqlText.replace(shardOutFullPaths[0], outFullPath))
+
+    if len(shardLogFiles) == 0:
+        return
+    with open(logFile, 'ab') as outFd:
+        for shardLogFile in shardLogFiles:
+            if not os.path.exists(shardLogFile):
+                continue
+            with open(shardLogFile, 'rb') as inFd:
+                shutil.copyfileobj(inFd, outFd)
+            os.remove(shardLogFile)
+
+def convertSharded(inFilePath, outFullPath, logFile, dropTables, workers, collectStats=False):
+    '''
+    Translate one uncompressed tracking log with a pool of worker
+    processes, each running its own JSONToRelation/EdXTrackLogJSONParser
+    pair over a newline-aligned byte range of the file. The
+    per-shard CSV files are merged in input order.
+
+    Note that the server downtime detection of the parser only
+    sees the events of its own shard. The first event of an IP in
+    each shard therefore never carries a downtime_for value.
+
+    @param inFilePath: full path to .json file
+    @type inFilePath: String
+    @param outFullPath: .sql file name of the merged result
+    @type outFullPath: String
+    @param logFile: main log file
+    @type logFile: String
+    @param dropTables: passed on to the parsers
+    @type dropTables: Boolean
+    @param workers: number of worker processes
+    @type workers: int
+    @param collectStats: whether to collect TransformStats in the shards
+    @type collectStats: Boolean
+    @return: the merged stats of all shards if collectStats is True, else None
+    @rtype: {TransformStats | None}
+    '''
+    startTime = time.time()
+    (destDir, outFileName) = os.path.split(outFullPath)
+    shardDir = tempfile.mkdtemp(prefix='.j2s_shards_', dir=destDir)
+    shardSpecs = []
+    shardLogFiles = []
+    for (shardNum, (startOffset, endOffset)) in enumerate(computeShardOffsets(inFilePath, workers)):
+        shardOutFullPath = os.path.join(shardDir, 'shard%03d_%s' % (shardNum, outFileName))
+        shardLogFile = '%s.shard%03d' % (logFile, shardNum)
+        shardSpecs.append((inFilePath, startOffset, endOffset, shardOutFullPath, shardLogFile, dropTables, collectStats))
+        shardLogFiles.append(shardLogFile)
+
+    try:
+        pool = multiprocessing.Pool(processes=min(workers, len(shardSpecs)))
+        try:
+            # Results come back in the order of shardSpecs,
+            # regardless of which shard finishes first:
+            shardResults = pool.map(convertShard, shardSpecs, chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+        shardOutFullPaths = [shardResultPath for (shardResultPath, shardStats) in shardResults]
+        mergeShardOutputs(shardOutFullPaths, outFullPath, shardLogFiles, logFile)
+    finally:
+        shutil.rmtree(shardDir, ignore_errors=True)
+
+    if not collectStats:
+        return None
+    stats = TransformStats(shardResults[0][1].sourceName)
+    for (shardResultPath, shardStats) in shardResults:
+        stats.merge(shardStats)
+    stats.startTime = startTime
+    stats.finish()
+    return stats
+
+def isShardable(inFilePath):
+    '''
+    Only uncompressed files on the local file system can be split
+    into byte ranges.
+
+    @param inFilePath: file path or URL of the tracking log
+    @type inFilePath: String
+    @return: True if the file can be translated in shards
+    @rtype: Boolean
+    '''
+    return os.path.isfile(inFilePath) and not inFilePath.endswith(('gz', 'bz2', 'zst', 'zstd'))
+
+def isMultiFileInput(inFilePath):
+    '''
+    Whether the input is a directory of tracking logs, or a
+    shell wildcard pattern, rather than a single log.
+
+    @param inFilePath: file path, directory, or wildcard pattern
+    @type inFilePath: String
+    @rtype: Boolean
+    '''
+    return os.path.isdir(inFilePath) or re.search(r'[*?[]', inFilePath) is not None
+
+def expandInputPaths(inFilePath):
+    '''
+    List the tracking logs in a directory, or those matching a
+    wildcard pattern, in chronological order. Files are ordered
+    by the date in their name, such as the 20130610 of
+    tracking.log-20130610.gz; files without a date come first,
+    in name order. Hidden files are ignored.
+
+    @param inFilePath: directory, or wildcard pattern
+    @type inFilePath: String
+    @return: paths of the logs
+    @rtype: [String]
+    '''
+    if os.path.isdir(inFilePath):
+        candidates = [os.path.join(inFilePath, fileName) for fileName in os.listdir(inFilePath)]
+    else:
+        candidates = glob.glob(inFilePath)
+    logFilePaths = [path for path in candidates
+                    if os.path.isfile(path) and not os.path.basename(path).startswith('.')]
+
+    def chronologicalKey(path):
+        fileName = os.path.basename(path)
+        dateMatch = LOG_FILE_DATE_PATTERN.search(fileName)
+        return (''.join(dateMatch.groups()) if dateMatch is not None else '', fileName)
+
+    return sorted(logFilePaths, key=chronologicalKey)
+
+def convertLogFile(fileSpec):
+    '''
+    Pool worker: translate one whole tracking log into its own
+    set of CSV files. Like convertShard(), a module level function
+    so that multiprocessing can pickle it.
+
+    @param fileSpec: (inFilePath, fileOutFullPath, logFile, dropTables, collectStats)
+    @type fileSpec: (String, String, String, Boolean, Boolean)
+    @return: the file's .sql file name, and its TransformStats if collectStats is True, else None
+    @rtype: (String, {TransformStats | None})
+    '''
+    (inFilePath, fileOutFullPath, logFile, dropTables, collectStats) = fileSpec
+    outSQLFile = OutputFile(fileOutFullPath, OutputDisposition.OutputFormat.CSV, options='wb')
+    jsonConverter = JSONToRelation(InURI(inFilePath),
+                                   outSQLFile,
+                                   mainTableName='EdxTrackEvent',
+                                   logFile=logFile,
+                                   progressEvery = 10000,
+                                   collectStats=collectStats
+                                   )
+    jsonConverter.setParser(EdXTrackLogJSONParser(jsonConverter,
+                                                  'EdxTrackEvent',
+                                                  replaceTables=dropTables,
+                                                  dbName='Edx',
+                                                  progressEvery = 10000
+                                              ))
+    jsonConverter.convert()
+    return (fileOutFullPath, jsonConverter.stats)
+
+def convertMany(inFilePaths, outFullPath, logDir, dropTables, workers, collectStats=False):
+    '''
+    Translate a series of tracking logs, such as the daily logs of
+    a course, into one set of CSV files. Each log is translated
+    as a whole by a pool of worker processes. Results are appended
+    to the merged CSV files in the order of inFilePaths, as soon as
+    all earlier files are merged, and each merged file is recorded
+    in the manifest <outFullPath>.manifest. Files that the manifest
+    already lists are skipped, so a re-run over the same logs, be it
+    after new logs arrived or after a crash, only translates the
+    logs that are missing. The manifest is ignored if outFullPath
+    does not exist.
+
+    Like the shards of convertSharded(), each file's parser only
+    sees the events of its own file for the server downtime detection.
+
+    @param inFilePaths: paths of the logs, in chronological order
+    @type inFilePaths: [String]
+    @param outFullPath: .sql file name of the merged result
+    @type outFullPath: String
+    @param logDir: directory for the per-file j2s_<inputFileName>.log files
+    @type logDir: String
+    @param dropTables: passed on to the parsers
+    @type dropTables: Boolean
+    @param workers: number of worker processes
+    @type workers: int
+    @param collectStats: whether to collect TransformStats for each file
+    @type collectStats: Boolean
+    @return: the merged stats of the files translated in this run if collectStats
+             is True and any were translated, else None
+    @rtype: {TransformStats | None}
+    '''
+    startTime = time.time()
+    manifest = TransformManifest(outFullPath + '.manifest')
+    if not os.path.exists(outFullPath):
+        # Earlier results are gone; the manifest is stale:
+        manifest.clear()
+    interruptedFilePath = manifest.rollBackMerge()
+    if interruptedFilePath is not None:
+        print("Removed the partially merged rows of %s." % interruptedFilePath)
+    toDo = [inFilePath for inFilePath in inFilePaths if inFilePath not in manifest]
+    if len(toDo) < len(inFilePaths):
+        print("Skipping %d of %d tracking logs that were translated earlier." %
+              (len(inFilePaths) - len(toDo), len(inFilePaths)))
+    if len(toDo) == 0:
+        return None
+
+    (destDir, outFileName) = os.path.split(outFullPath)
+    fileDir = tempfile.mkdtemp(prefix='.j2s_files_', dir=destDir)
+    fileSpecs = []
+    for (fileNum, inFilePath) in enumerate(toDo):
+        fileOutFullPath = os.path.join(fileDir, 'file%05d_%s' % (fileNum, outFileName))
+        logFile = os.path.join(logDir, 'j2s_%s.log' % os.path.basename(inFilePath))
+        fileSpecs.append((inFilePath, fileOutFullPath, logFile, dropTables, collectStats))
+
+    stats = None
+    pool = None
+    try:
+        if workers > 1:
+            pool = multiprocessing.Pool(processes=min(workers, len(fileSpecs)))
+            # Results come back in the order of fileSpecs:
+            fileResults = pool.imap(convertLogFile, fileSpecs, chunksize=1)
+        else:
+            fileResults = (convertLogFile(fileSpec) for fileSpec in fileSpecs)
+        for (fileNum, (fileOutFullPath, fileStats)) in enumerate(fileResults):
+            inFilePath = toDo[fileNum]
+            append = len(manifest) > 0
+            if append:
+                manifest.startMerge(inFilePath, [outFullPath + tableSuffix
+                                                 for tableSuffix in listTableSuffixes([fileOutFullPath])])
+            mergeShardOutputs([fileOutFullPath], outFullPath, [], None, append=append)
+            manifest.add(inFilePath)
+            for fileName in os.listdir(fileDir):
+                if fileName.startswith(os.path.basename(fileOutFullPath)):
+                    os.remove(os.path.join(fileDir, fileName))
+            if fileStats is not None:
+                if stats is None:
+                    stats = TransformStats(outFullPath)
+                stats.merge(fileStats)
+        if pool is not None:
+            pool.close()
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+        shutil.rmtree(fileDir, ignore_errors=True)
+
+    if stats is not None:
+        stats.startTime = startTime
+        stats.finish()
+    return stats
+
+def translateToQueue(rowSpec):
+    '''
+    Process target of convertToRows(): translates one tracking log,
+    putting the rows of the wanted tables on the queue in batches,
+    then None. If the translation fails, its traceback is put
+    on the queue instead. The values of a row, which hold no NUL
+    (see JSONToRelation.constructCSVValues()), are sent as one
+    NUL-separated string, much cheaper to pickle than a list.
+
+    @param rowSpec: (inFilePath, outFullPath, logFile, tableNames, rowQueue)
+    @type rowSpec: (String, String, String, {[String] | None}, multiprocessing.Queue)
+    '''
+    (inFilePath, outFullPath, logFile, tableNames, rowQueue) = rowSpec
+    try:
+        rows = []
+        def consumeRow(tableName, values):
+            if tableNames is None or tableName in tableNames:
+                rows.append((tableName, '\0'.join(values)))
+                if len(rows) >= ROW_BATCH_SIZE:
+                    rowQueue.put((jsonConverter.bytesRead, rows[:]))
+                    del rows[:]
+        outRows = OutputRows(outFullPath, consumeRow, options='wb')
+        jsonConverter = JSONToRelation(InURI(inFilePath),
+                                       outRows,
+                                       mainTableName='EdxTrackEvent',
+                                       logFile=logFile,
+                                       progressEvery = 10000
+                                       )
+        jsonConverter.setParser(EdXTrackLogJSONParser(jsonConverter,
+                                                      'EdxTrackEvent',
+                                                      dbName='Edx',
+                                                      progressEvery = 10000
+                                                  ))
+        jsonConverter.convert()
+        rowQueue.put((jsonConverter.bytesRead, rows))
+        rowQueue.put(None)
+    except Exception:
+        rowQueue.put(traceback.format_exc())
+
+def convertToRows(inFilePath, destDir, outFileName=None, keepCSV=False, tableNames=None):
+    '''
+    Translate one tracking log to the rows of the CSV tables, handed to
+    the caller as they are produced rather than written to and read back
+    from the CSV files. A separate process translates the log, so that
+    the caller processes the rows meanwhile; at most ROW_QUEUE_BATCHES
+    batches are held in between. Each row is (tableName, values), the
+    values being the strings that reading the table's CSV file would
+    give. Rows of a JSON object's Answer and CorrectMap tables come
+    before the EdxTrackEvent rows that refer to them.
+
+    @param inFilePath: full path to the .json file, possibly compressed
+    @type inFilePath: String
+    @param destDir: destination directory of the CSV files, if kept, and
+                    parent of the TransformLogs directory
+    @type destDir: String
+    @param outFileName: name of the .sql file, as for convert()
+    @type outFileName: {String | None}
+    @param keepCSV: if True, the CSV files are written as well, as convert() would
+    @type keepCSV: Boolean
+    @param tableNames: names of the tables whose rows are wanted; None for all
+    @type tableNames: {[String] | None}
+    @return: generator of (bytesRead, rows) batches, bytesRead being
+             how much of the log was translated when the batch was sent
+    @rtype: generator
+    @raise RuntimeError: if the translation fails
+    '''
+    if outFileName is None:
+        outFullPath = buildOutputFileName(inFilePath, destDir)
+    else:
+        outFullPath = os.path.join(destDir, outFileName)
+
+    logDir = os.path.join(destDir, '..', 'TransformLogs')
+    if not os.access(logDir, os.W_OK):
+        try:
+            os.makedirs(logDir)
+        except OSError:
+            # Log dir already exists:
+            pass
+    logFile = os.path.join(logDir, 'j2s_%s.log' % os.path.basename(inFilePath))
+
+    rowQueue = multiprocessing.Queue(ROW_QUEUE_BATCHES)
+    translator = multiprocessing.Process(target=translateToQueue,
+                                         args=((inFilePath,
+                                                outFullPath if keepCSV else os.devnull,
+                                                logFile, tableNames, rowQueue),))
+    translator.daemon = True
+    translator.start()
+    try:
+        while True:
+            try:
+                batch = rowQueue.get(timeout=1)
+            except Queue.Empty:
+                # A translator that failed says so on the queue,
+                # unless it was killed:
+                if not translator.is_alive() and translator.exitcode != 0:
+                    raise RuntimeError("Translation of %s died with exit code %s" %
+                                       (inFilePath, translator.exitcode))
+                continue
+            if batch is None:
+                break
+            if isinstance(batch, str):
+                raise RuntimeError("Translation of %s failed:\n%s" % (inFilePath, batch))
+            (bytesRead, rows) = batch
+            yield (bytesRead, [(tableName, values.split('\0')) for (tableName, values) in rows])
+    finally:
+        # Also reached when the caller stops early:
+        if translator.is_alive():
+            translator.terminate()
+        translator.join()
+
 # Convert the OpenEdX tracking log to SQL files
 # See command line help further below for the meaning of
 # each argument.
-def convert(inFilePath, destDir, targetFormat, dropTables = False):
+# The input may also be a directory or wildcard pattern
+# of tracking logs (see convertMany()).
+def convert(inFilePath, destDir, targetFormat, dropTables = False, workers = 1, collectStats = False, outFileName = None, resume = False):
     # Output file is name of input file with the
-    # .json extension replaced by .sql
-    outFullPath = buildOutputFileName(inFilePath, destDir)
+    # .json extension replaced by .sql, unless the
+    # caller picks the name (e.g. to drop a .gz).
+    # For a directory or pattern, wildcards are
+    # replaced to get a usable name:
+    if outFileName is None:
+        outFullPath = buildOutputFileName(re.sub(r'[*?[\]]', '_', os.path.normpath(inFilePath)), destDir)
+    else:
+        outFullPath = os.path.join(destDir, outFileName)
 
     # Log file will go to <destDir>/../TransformLogs, the file being named j2s_<inputFileName>.log:
     logDir = os.path.join(destDir, '..', 'TransformLogs')
@@ -47,6 +547,48 @@ def convert(inFilePath, destDir, targetFormat, dropTables = False):
             pass
 
     logFile = os.path.join(logDir, 'j2s_%s.log' % os.path.basename(inFilePath))
+    # Instrumentation report, if requested, goes next to the log:
+    statsFile = os.path.join(logDir, 'j2s_%s.stats.json' % os.path.basename(inFilePath))
+
+    if isMultiFileInput(inFilePath):
+        if targetFormat != 'csv':
+            print("Can only translate several tracking logs to csv, not %s." % targetFormat)
+            sys.exit(1)
+        inFilePaths = expandInputPaths(inFilePath)
+        if len(inFilePaths) == 0:
+            print("No tracking logs found in %s." % inFilePath)
+            sys.exit(1)
+        stats = convertMany(inFilePaths, outFullPath, logDir, dropTables, workers, collectStats)
+        if stats is not None:
+            stats.writeReport(statsFile)
+        return
+
+    # Single-process CSV conversions are checkpointed, so that
+    # a crashed conversion can be resumed with resume=True:
+    checkpointFile = outFullPath + '.checkpoint'
+    checkpoint = None
+    if resume:
+        checkpoint = JSONToRelation.readCheckpoint(checkpointFile)
+        if checkpoint is None:
+            print("No checkpoint found for %s; translating from the start." % inFilePath)
+        elif workers > 1:
+            print("Resuming %s from its checkpoint with one process." % inFilePath)
+            workers = 1
+    elif os.path.exists(checkpointFile):
+        # Stale checkpoint of an earlier run; must not be
+        # resumed from after this run overwrote the output:
+        os.remove(checkpointFile)
+
+    # Sharding only works for pure CSV output: INSERT statement
+    # dumps of separate shards cannot simply be concatenated:
+    if workers > 1:
+        if targetFormat == 'csv' and isShardable(inFilePath):
+            stats = convertSharded(inFilePath, outFullPath, logFile, dropTables, workers, collectStats)
+            if stats is not None:
+                stats.writeReport(statsFile)
+            return
+        print("Cannot translate %s with multiple workers (format %s); using one process." %
+              (inFilePath, targetFormat))
 
     # Create an instance of JSONToRelation, taking input from the given file:
     # and pumping output to the given output path:
@@ -57,12 +599,17 @@ def convert(inFilePath, destDir, targetFormat, dropTables = False):
     else:
         outputFormat = OutputDisposition.OutputFormat.SQL_INSERTS_AND_CSV
 
-    outSQLFile = OutputFile(outFullPath, outputFormat, options='wb') # overwrite any existing sql file
+    # Overwrite any existing sql file. When resuming, the CSV files
+    # are instead cut back to where the checkpoint was taken:
+    outSQLFile = OutputFile(outFullPath, outputFormat, options='wb',
+                            csvFileSizes=checkpoint['csvFileSizes'] if checkpoint is not None else None)
     jsonConverter = JSONToRelation(InURI(inFilePath),
                                    outSQLFile,
                                    mainTableName='EdxTrackEvent',
                                    logFile=logFile,
-                                   progressEvery = 10000
+                                   progressEvery = 10000,
+                                   collectStats=collectStats,
+                                   checkpointFile=checkpointFile if targetFormat == 'csv' else None
                                    )
     try:
         jsonConverter.setParser(EdXTrackLogJSONParser(jsonConverter, 
@@ -83,7 +630,9 @@ def convert(inFilePath, destDir, targetFormat, dropTables = False):
             pass
         sys.exit(1)
         
-    jsonConverter.convert()
+    jsonConverter.convert(resume=checkpoint is not None)
+    if jsonConverter.stats is not None:
+        jsonConverter.stats.writeReport(statsFile)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='json2sql.py')
@@ -97,10 +646,26 @@ if __name__ == "__main__":
                         dest='targetFormat',
                         default='sql_dump',
                         choices = ['csv', 'sql_dump', 'sql_dump_and_csv'])
+    parser.add_argument('-w', '--workers',
+                        help='Number of processes that translate the file in parallel, each one a byte range of it, or, for a directory or wildcard inFilePath, each one whole file at a time. Only for csv output, and byte ranges only for uncompressed files. Default: 1',
+                        dest='workers',
+                        type=int,
+                        default=1)
+    parser.add_argument('-s', '--stats',
+                        help='Record per event type counts and handler times, JSON decode time, and bytes read; written to TransformLogs/j2s_<inputFileName>.stats.json',
+                        dest='collectStats',
+                        action='store_true',
+                        default=False)
+    parser.add_argument('-r', '--resume',
+                        help='Continue an interrupted csv translation from its last checkpoint, rather than from the start',
+                        dest='resume',
+                        action='store_true',
+                        default=False)
     parser.add_argument('destDir',
                         help='file path for the destination .sql/csv file(s)')
     parser.add_argument('inFilePath',
-                        help='json file path to be converted to sql/csv.')
+                        help='json file path to be converted to sql/csv; or, for csv, a directory or quoted wildcard pattern of daily json files, translated in date order into one set of tables. Files translated by an earlier run into the same destDir are skipped.')
 
     args = parser.parse_args()
-    convert(args.inFilePath, args.destDir, args.targetFormat, args.dropTables)
+    convert(args.inFilePath, args.destDir, args.targetFormat, args.dropTables, args.workers, args.collectStats,
+            resume=args.resume)
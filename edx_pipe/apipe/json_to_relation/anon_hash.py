@@ -0,0 +1,125 @@
+'''
+Hashing of user names and emails into anonymous
+identifiers, such as anon_screen_name.
+
+A tracking log holds hundreds of millions of events, but
+only on the order of 100k distinct users. Hashes are
+therefore memoized in a dict, which is cleared when it
+reaches its size limit.
+All users of makeHash() in one process share the same
+cache: the tracking log parser, scripts/makeAnonScreenName.py,
+and the newmitx extensions.
+
+This module deliberately imports nothing beyond the
+standard library, so that code outside of json_to_relation
+can use it without pulling in the parser's dependencies.
+'''
+import hashlib
+
+
+class HashCache(object):
+    '''
+    Size-capped cache from names to their ripemd160 hashes,
+    with hit/miss counters. A hit is a single dict lookup; keeping
+    track of recency would cost more than computing the hash.
+    '''
+
+    # Enough for the distinct users of a large course,
+    # at roughly 200 bytes per entry:
+    DEFAULT_MAX_ENTRIES = 200000
+
+    def __init__(self, maxEntries=DEFAULT_MAX_ENTRIES):
+        '''
+        :param maxEntries: number of hashes to keep before the cache is cleared
+        :type maxEntries: int
+        '''
+        if maxEntries < 1:
+            raise ValueError("Hash cache must hold at least one entry; got %s" % maxEntries)
+        self.maxEntries = maxEntries
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def getHash(self, name):
+        '''
+        Return the ripemd160 40 char hash of the given name,
+        computing it only if it is not in the cache.
+
+        :param name: name to be hashed
+        :type name: String
+        :return: hashed equivalent
+        :rtype: String
+        '''
+        try:
+            theHash = self.cache[name]
+            self.hits += 1
+            return theHash
+        except KeyError:
+            theHash = HashCache.computeHash(name)
+            self.misses += 1
+            if len(self.cache) >= self.maxEntries:
+                self.cache.clear()
+            self.cache[name] = theHash
+            return theHash
+
+    def hitRate(self):
+        '''
+        :return: fraction of getHash() calls answered from the cache; 0 if none were made
+        :rtype: float
+        '''
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return float(self.hits) / lookups
+
+    def clear(self):
+        '''
+        Drop all cached hashes. The counters are kept.
+        '''
+        self.cache.clear()
+
+    def __len__(self):
+        return len(self.cache)
+
+    @classmethod
+    def computeHash(cls, name):
+        #return hashlib.sha224(name).hexdigest()
+        oneHash = hashlib.new('ripemd160')
+        oneHash.update(name)
+        return oneHash.hexdigest()
+
+# The cache shared by all callers in this process:
+sharedHashCache = HashCache()
+
+def makeHash(name):
+    '''
+    Returns a ripemd160 40 char hash of the given name,
+    using the process-wide cache.
+
+    :param name: name to be hashed
+    :type name: String
+    :return: hashed equivalent. Calling this function multiple times returns the same string
+    :rtype: String
+    '''
+    return sharedHashCache.getHash(name)
+
+if __name__ == '__main__':
+    # Benchmark: cache hits against computing the hash, for
+    # names repeating as the users of a course's events do:
+    import random
+    import time
+    names = ['user%06d@example.com' % userNum for userNum in range(100000)]
+    lookups = [random.choice(names) for _ in range(1000000)]
+    startTime = time.time()
+    for name in lookups:
+        HashCache.computeHash(name)
+    computeSecs = time.time() - startTime
+    cache = HashCache()
+    for name in names:
+        cache.getHash(name)
+    startTime = time.time()
+    for name in lookups:
+        cache.getHash(name)
+    hitSecs = time.time() - startTime
+    print('computeHash: %.3fus  cache hit: %.3fus  (%.1fx)' %
+          (1e6 * computeSecs / len(lookups), 1e6 * hitSecs / len(lookups), computeSecs / hitSecs))
@@ -23,20 +23,22 @@ Modifications:
 
 from collections import OrderedDict
 import datetime
-import hashlib
 import json
 import os
 import re
 import string
+import time
 from unidecode import unidecode
 import uuid
 import mitLogsAdapter
 
+from anon_hash import makeHash
 from col_data_type import ColDataType
 from generic_json_parser import GenericJSONParser
 from locationManager import LocationManager
 from modulestoreImporter import ModulestoreImporter
 from output_disposition import ColumnSpec
+from timestamp_parser import TimestampParser
 from ipToCountry import IpCountryDict
 
 EDX_HEARTBEAT_PERIOD = 360  # seconds
@@ -189,6 +191,9 @@ class EdXTrackLogJSONParser(GenericJSONParser):
         # An ip-country lookup facility:
         self.ipCountryDict = IpCountryDict()
 
+        # Parser for the event time stamps in downtime detection:
+        self.eventTimeParser = TimestampParser(['%Y-%m-%d %H:%M:%S.%f %Z'])
+
         # Lookup table from OpenEdx 32-bit hash values to
         # corresponding problem, course, or video display_names.
         # This call can cause a portion of the modulestore to be
@@ -485,6 +490,186 @@ class EdXTrackLogJSONParser(GenericJSONParser):
         self.currLoadInfoFK = self.pushLoadInfo(loadInfoDict)
         self.currContext = None
 
+        # Map from event_type to handler, and list of event_type
+        # prefixes with their handlers. Filled by registerEventTypeHandlers():
+        self.eventTypeHandlers = {}
+        self.eventTypePrefixHandlers = []
+        self.registerEventTypeHandlers()
+
+    def getCheckpointState(self):
+        '''
+        Besides the generic state, the time each server was
+        last heard from carries over from one event to the next.
+        '''
+        state = super(EdXTrackLogJSONParser, self).getCheckpointState()
+        state['downtimes'] = self.downtimes
+        return state
+
+    def restoreCheckpointState(self, state):
+        super(EdXTrackLogJSONParser, self).restoreCheckpointState(state)
+        self.downtimes = state['downtimes']
+
+    def registerEventTypeHandlers(self):
+        '''
+        Build the dispatch tables used by processOneJSONObject() to
+        find the handler for an event_type. Subclasses that handle
+        additional event types extend this method, or call
+        registerEventTypeHandler()/registerEventTypePrefixHandler()
+        after construction.
+        '''
+        register = self.registerEventTypeHandler
+
+        register(['seq_goto', 'seq_next', 'seq_prev'], self.handleSeqNav, passEventType=True)
+        # Already recorded everything needed in common-fields:
+        register(['/accounts/login', '/dashboard'], None)
+        register(['/login_ajax'], self.handleAjaxLogin, passEventType=True)
+        # Note: some problem_check cases are also handled in handleAjaxLogin()
+        register(['problem_check', 'save_problem_check'], self.handleProblemCheck)
+        register(['problem_reset'], self.handleProblemReset)
+        register(['problem_show'], self.handleProblemShow)
+        register(['problem_save'], self.handleProblemSave)
+        register(['oe_hide_question', 'oe_hide_problem',
+                  'peer_grading_hide_question', 'peer_grading_hide_problem',
+                  'staff_grading_hide_question', 'staff_grading_hide_problem',
+                  'oe_show_question', 'oe_show_problem',
+                  'peer_grading_show_question', 'peer_grading_show_problem',
+                  'staff_grading_show_question', 'staff_grading_show_problem'],
+                 self.handleQuestionProblemHidingShowing)
+        register(['rubric_select'], self.handleRubricSelect)
+        register(['oe_show_full_feedback', 'oe_show_respond_to_feedback'], self.handleOEShowFeedback)
+        register(['oe_feedback_response_selected'], self.handleOEFeedbackResponseSelected)
+        register(['show_transcript', 'hide_transcript'], self.handleShowHideTranscript)
+        register(['edx.video.closed_captions.hidden', 'edx.video.closed_captions.shown'],
+                 self.handleShowHideCaptions)
+        register(['play_video', 'pause_video', 'load_video', 'stop_video'], self.handleVideoPlayPause)
+        register(['seek_video'], self.handleVideoSeek)
+        register(['speed_change_video'], self.handleVideoSpeedChange)
+        register(['video_hide_cc_menu', 'video_show_cc_menu'], self.handleVideoHideShowCCMenu)
+        register(['fullscreen'], self.handleFullscreen)
+        register(['not_fullscreen'], self.handleNotFullscreen)
+        register(['book'], self.handleBook)
+        register(['showanswer', 'show_answer'], self.handleShowAnswer)
+        register(['problem_check_fail', 'save_problem_check_fail'], self.handleProblemCheckFail,
+                 replacesRow=False)
+        register(['problem_rescore_fail'], self.handleProblemRescoreFail)
+        register(['problem_rescore'], self.handleProblemRescore)
+        # The case save_problem_check is not here:
+        # save_problem_check is treated as problem_check
+        # in early log versions.
+        register(['save_problem_fail', 'save_problem_success', 'reset_problem_fail'],
+                 self.handleSaveProblemFailSuccessCheckOrReset)
+        register(['reset_problem'], self.handleResetProblem)
+
+        # Instructor events. These have no additional info. The event_type
+        # says it all, and that's already been stuck into the table:
+        register(['list-students', 'dump-grades', 'dump-grades-raw',
+                  'dump-grades-csv', 'dump-grades-csv-raw',
+                  'dump-answer-dist-csv', 'dump-graded-assignments-config',
+                  'list-staff', 'list-instructors', 'list-beta-testers'], None)
+        register(['rescore-all-submissions', 'reset-all-attempts'], self.handleRescoreReset,
+                 replacesRow=False)
+        register(['delete-student-module-state', 'rescore-student-submission'],
+                 self.handleDeleteStateRescoreSubmission, replacesRow=False)
+        register(['reset-student-attempts'], self.handleResetStudentAttempts, replacesRow=False)
+        register(['get-student-progress-page'], self.handleGetStudentProgressPage, replacesRow=False)
+        register(['add-instructor', 'remove-instructor'], self.handleAddRemoveInstructor, replacesRow=False)
+        register(['list-forum-admins', 'list-forum-mods', 'list-forum-community-TAs'],
+                 self.handleListForumMatters, replacesRow=False)
+        register(['remove-forum-admin', 'add-forum-admin',
+                  'remove-forum-mod', 'add-forum-mod',
+                  'remove-forum-community-TA', 'add-forum-community-TA'],
+                 self.handleForumManipulations, replacesRow=False)
+        register(['psychometrics-histogram-generation'], self.handlePsychometricsHistogramGen,
+                 replacesRow=False)
+        register(['add-or-remove-user-group'], self.handleAddRemoveUserGroup, replacesRow=False)
+        register(['/create_account'], self.handleCreateAccount, replacesRow=False)
+        # This method handles all its own pushing; it
+        # returns the row that is left to push, if any:
+        register(['problem_graded'], self.handleProblemGraded)
+        register(['change-email-settings'], self.handleReceiveEmail, replacesRow=False)
+
+        # A/B Test Events:
+        register(['assigned_user_to_partition', 'child_render'], self.handleABExperimentEvent,
+                 replacesRow=False)
+        register(['edx.course.enrollment.activated', 'edx.course.enrollment.deactivated'],
+                 self.handleCourseEnrollActivatedDeactivated, replacesRow=False)
+
+        # Forum events:
+        register(['edx.forum.searched'], self.handleForumEvent, replacesRow=False)
+
+        # Event type values that start with slash, and are
+        # not registered above:
+        self.registerEventTypePrefixHandler('/', self.handlePathStyledEventTypes, replacesRow=False)
+
+    def registerEventTypeHandler(self, eventTypes, handler, passEventType=False, replacesRow=True):
+        '''
+        Have processOneJSONObject() call the given handler for
+        events of the given types. Replaces any earlier registration
+        for those types.
+
+        :param eventTypes: event_type values for which the handler is to be called
+        :type eventTypes: [String]
+        :param handler: method called as handler(record, row, event), or
+               as handler(record, row, event, eventType) if passEventType is True.
+               None if the common fields already hold all there is to record.
+        :type handler: {callable | None}
+        :param passEventType: whether the event type is passed to the handler
+        :type passEventType: Boolean
+        :param replacesRow: if True, the handler's return value is the row
+               to push into the main table; else the handler fills in the
+               row it is passed.
+        :type replacesRow: Boolean
+        '''
+        for eventType in eventTypes:
+            self.eventTypeHandlers[eventType] = (handler, passEventType, replacesRow)
+
+    def registerEventTypePrefixHandler(self, eventTypePrefix, handler, passEventType=False, replacesRow=True):
+        '''
+        Have processOneJSONObject() call the given handler for events
+        whose type starts with the given prefix, such as '/' for path-styled,
+        or 'edx.forum.' for namespaced event types. Only consulted if
+        no handler is registered for the exact event type. The longest
+        matching prefix wins.
+
+        :param eventTypePrefix: start of event_type values for which the handler is to be called
+        :type eventTypePrefix: String
+        :param handler: as for registerEventTypeHandler()
+        :type handler: {callable | None}
+        :param passEventType: as for registerEventTypeHandler()
+        :type passEventType: Boolean
+        :param replacesRow: as for registerEventTypeHandler()
+        :type replacesRow: Boolean
+        '''
+        self.eventTypePrefixHandlers = [prefixSpec for prefixSpec in self.eventTypePrefixHandlers
+                                        if prefixSpec[0] != eventTypePrefix]
+        self.eventTypePrefixHandlers.append((eventTypePrefix, (handler, passEventType, replacesRow)))
+        self.eventTypePrefixHandlers.sort(key=lambda prefixSpec: len(prefixSpec[0]), reverse=True)
+
+    def findEventTypeHandler(self, eventType):
+        '''
+        Look up the handler registered for the given event type:
+        exact matches first, then the longest registered prefix.
+
+        :param eventType: event_type of a tracking log entry
+        :type eventType: String
+        :return: (handler, passEventType, replacesRow), or None if no handler is registered
+
+        :rtype: {(callable, Boolean, Boolean) | None}
+        '''
+        try:
+            return self.eventTypeHandlers[eventType]
+        except KeyError:
+            pass
+        except TypeError:
+            # Not a hashable event type, such as a dict:
+            return None
+        if not isinstance(eventType, basestring):
+            return None
+        for (eventTypePrefix, handlerSpec) in self.eventTypePrefixHandlers:
+            if eventType.startswith(eventTypePrefix):
+                return handlerSpec
+        return None
+
     def setupMySqlDumpControlInstructions(self):
 
         # Preamble for MySQL dumps to make loads fast:
@@ -549,8 +734,8 @@ class EdXTrackLogJSONParser(GenericJSONParser):
         It's a long method, and should be partitioned. First, bookkeeping
         fields are filled in that are common to all events, such as the 
         user agent, and the reference into the LoadInfo table that shows
-        on which date this row was loaded. Then a long 'case' statement
-        calls handler methods depending on the incoming track log's event_type.  
+        on which date this row was loaded. Then the handler registered for
+        the incoming track log's event_type is called (see registerEventTypeHandlers()).  
         
         Given one line from the EdX Track log, produce one row
         of relational output. Return is an array of values, the 
@@ -619,7 +804,10 @@ class EdXTrackLogJSONParser(GenericJSONParser):
         # No error has occurred yet in processing this JSON str:
         self.errorOccurred = False
         self.jsonToRelationConverter.bumpLineCounter()
+        stats = self.stats
         try:
+            if stats is not None:
+                decodeStartTime = time.time()
             # Turn top level JSON object to dict:
             try:
                 record = json.loads(str(jsonStr))
@@ -634,6 +822,8 @@ class EdXTrackLogJSONParser(GenericJSONParser):
                     # Pull out what we can, and place in 'badly_formatted' column
                     self.rescueBadJSON(jsonStr, row=row)
                     raise ValueError('Ill formed JSON: %s' % ` e `)
+            if stats is not None:
+                stats.addJSONDecodeTime(time.time() - decodeStartTime)
 
             # Apply formatting specific to MIT logs
             mitLogsAdapter.format_timestamp(record)
@@ -641,7 +831,11 @@ class EdXTrackLogJSONParser(GenericJSONParser):
             # Dispense with the fields common to all events, except event,
             # which is a nested JSON string. Results will be 
             # in self.resultDict:
+            if stats is not None:
+                commonFieldsStartTime = time.time()
             self.handleCommonFields(record, row)
+            if stats is not None:
+                stats.addCommonFieldsTime(time.time() - commonFieldsStartTime)
             #print self.resultDict 
 
             # If the event was fully handled in
@@ -670,6 +864,9 @@ class EdXTrackLogJSONParser(GenericJSONParser):
                         "No event type field; cannot determine tye type of event."
                     )
 
+            if stats is not None:
+                stats.countEvent(eventType)
+
             # Check whether we had a server downtime:
             try:
                 eventTimeStr = record['time']
@@ -683,8 +880,7 @@ class EdXTrackLogJSONParser(GenericJSONParser):
                     eventTimeStr = eventTimeStr[0:-6]
                 # Modified the time stamp for new MITx logs
                 # TODO: make it compatible for all logs later
-                eventDateTime = datetime.datetime.strptime(
-                    eventTimeStr, '%Y-%m-%d %H:%M:%S.%f %Z')
+                eventDateTime = self.eventTimeParser.parse(eventTimeStr)
             except KeyError:
                 raise ValueError("No event time or server IP.")
             except ValueError:
@@ -738,6 +934,8 @@ class EdXTrackLogJSONParser(GenericJSONParser):
                 raise ValueError("Event of type %s has no event field" %
                                  eventType)
 
+            if stats is not None:
+                decodeStartTime = time.time()
             try:
                 if '{' not in eventJSONStrOrDict or eventJSONStrOrDict[:
                                                                        5] == 'input':
@@ -763,235 +961,32 @@ class EdXTrackLogJSONParser(GenericJSONParser):
                         'Bad JSON; saved in col badlyFormatted: event_type %s (%s)'
                         % (eventType, ` e1 `))
                     return
+            if stats is not None:
+                stats.addJSONDecodeTime(time.time() - decodeStartTime)
 
-            if eventType == 'seq_goto' or\
-               eventType == 'seq_next' or\
-               eventType == 'seq_prev':
-
-                row = self.handleSeqNav(record, row, event, eventType)
-                return
-
-            elif eventType == '/accounts/login':
-                # Already recorded everything needed in common-fields
-                return
-
-            elif eventType == '/login_ajax':
-                row = self.handleAjaxLogin(record, row, event, eventType)
-                return
-
-            elif eventType == 'problem_check' or\
-                 eventType == 'save_problem_check':
-                # Note: some problem_check cases are also handled in handleAjaxLogin()
-                row = self.handleProblemCheck(record, row, event)
-                return
-
-            elif eventType == 'problem_reset':
-                row = self.handleProblemReset(record, row, event)
-                return
-
-            elif eventType == 'problem_show':
-                row = self.handleProblemShow(record, row, event)
-                return
-
-            elif eventType == 'problem_save':
-                row = self.handleProblemSave(record, row, event)
-                return
-
-            elif eventType == 'oe_hide_question' or\
-                 eventType == 'oe_hide_problem' or\
-                 eventType == 'peer_grading_hide_question' or\
-                 eventType == 'peer_grading_hide_problem' or\
-                 eventType == 'staff_grading_hide_question' or\
-                 eventType == 'staff_grading_hide_problem' or\
-                 eventType == 'oe_show_question' or\
-                 eventType == 'oe_show_problem' or\
-                 eventType == 'peer_grading_show_question' or\
-                 eventType == 'peer_grading_show_problem' or\
-                 eventType == 'staff_grading_show_question' or\
-                 eventType == 'staff_grading_show_problem':
-
-                row = self.handleQuestionProblemHidingShowing(record, row,
-                                                              event)
-                return
-
-            elif eventType == 'rubric_select':
-                row = self.handleRubricSelect(record, row, event)
-                return
-
-            elif eventType == 'oe_show_full_feedback' or\
-                 eventType == 'oe_show_respond_to_feedback':
-                row = self.handleOEShowFeedback(record, row, event)
-                return
-
-            elif eventType == 'oe_feedback_response_selected':
-                row = self.handleOEFeedbackResponseSelected(record, row, event)
-                return
-
-            elif eventType == 'show_transcript' or eventType == 'hide_transcript':
-                row = self.handleShowHideTranscript(record, row, event)
-                return
-            elif eventType == 'edx.video.closed_captions.hidden' or eventType == 'edx.video.closed_captions.shown':
-                row = self.handleShowHideCaptions(record, row, event)
-                return
-            elif eventType == 'play_video' or\
-                 eventType == 'pause_video' or\
-                 eventType == 'load_video' or\
-                 eventType == 'stop_video':
-                row = self.handleVideoPlayPause(record, row, event)
-                return
-
-            elif eventType == 'seek_video':
-                row = self.handleVideoSeek(record, row, event)
-                return
-
-            elif eventType == 'speed_change_video':
-                row = self.handleVideoSpeedChange(record, row, event)
-                return
-
-            elif eventType == 'video_hide_cc_menu' or\
-                 eventType == 'video_show_cc_menu':
-                row = self.handleVideoHideShowCCMenu(record, row, event)
-                return
-
-            elif eventType == 'fullscreen':
-                row = self.handleFullscreen(record, row, event)
-                return
-
-            elif eventType == 'not_fullscreen':
-                row = self.handleNotFullscreen(record, row, event)
-                return
-
-            elif eventType == '/dashboard':
-                # Nothing additional to grab:
-                return
-
-            elif eventType == 'book':
-                row = self.handleBook(record, row, event)
-                return
-
-            elif eventType == 'showanswer' or eventType == 'show_answer':
-                row = self.handleShowAnswer(record, row, event)
-                return
-
-            elif eventType == 'problem_check_fail' or\
-                 eventType == 'save_problem_check_fail':
-                self.handleProblemCheckFail(record, row, event)
-                return
-
-            elif eventType == 'problem_rescore_fail':
-                row = self.handleProblemRescoreFail(record, row, event)
-                return
-
-            elif eventType == 'problem_rescore':
-                row = self.handleProblemRescore(record, row, event)
-                return
-
-            elif eventType == 'save_problem_fail' or\
-                 eventType == 'save_problem_success' or\
-                 eventType == 'reset_problem_fail':
-                row = self.handleSaveProblemFailSuccessCheckOrReset(record,
-                                                                    row, event)
-                return
-                # Removed the case eventType == 'save_problem_check' 
-                # save_problem_check should be treated as
-                # problem_check in early log versions.
-
-            elif eventType == 'reset_problem':
-                row = self.handleResetProblem(record, row, event)
-                return
-
-            # Instructor events:
-            elif eventType in [
-                    'list-students', 'dump-grades', 'dump-grades-raw',
-                    'dump-grades-csv', 'dump-grades-csv-raw',
-                    'dump-answer-dist-csv', 'dump-graded-assignments-config',
-                    'list-staff', 'list-instructors', 'list-beta-testers'
-            ]:
-                # These events have no additional info. The event_type says it all,
-                # and that's already been stuck into the table:
-                return
-
-            elif eventType == 'rescore-all-submissions' or eventType == 'reset-all-attempts':
-                self.handleRescoreReset(record, row, event)
-                return
-
-            elif eventType == 'delete-student-module-state' or eventType == 'rescore-student-submission':
-                self.handleDeleteStateRescoreSubmission(record, row, event)
-                return
-
-            elif eventType == 'reset-student-attempts':
-                self.handleResetStudentAttempts(record, row, event)
-                return
-
-            elif eventType == 'get-student-progress-page':
-                self.handleGetStudentProgressPage(record, row, event)
-                return
-
-            elif eventType == 'add-instructor' or eventType == 'remove-instructor':
-                self.handleAddRemoveInstructor(record, row, event)
-                return
-
-            elif eventType in [
-                    'list-forum-admins', 'list-forum-mods',
-                    'list-forum-community-TAs'
-            ]:
-                self.handleListForumMatters(record, row, event)
-                return
-
-            elif eventType in [
-                    'remove-forum-admin', 'add-forum-admin',
-                    'remove-forum-mod', 'add-forum-mod',
-                    'remove-forum-community-TA', 'add-forum-community-TA'
-            ]:
-                self.handleForumManipulations(record, row, event)
-                return
-
-            elif eventType == 'psychometrics-histogram-generation':
-                self.handlePsychometricsHistogramGen(record, row, event)
-                return
-
-            elif eventType == 'add-or-remove-user-group':
-                self.handleAddRemoveUserGroup(record, row, event)
-                return
-
-            elif eventType == '/create_account':
-                self.handleCreateAccount(record, row, event)
-                return
-
-            elif eventType == 'problem_graded':
-                # Need to look at return, b/c this
-                # method handles all its own pushing:
-                row = self.handleProblemGraded(record, row, event)
-                return
-
-            elif eventType == 'change-email-settings':
-                self.handleReceiveEmail(record, row, event)
-                return
-
-            # A/B Test Events:
-            elif eventType == 'assigned_user_to_partition' or eventType == 'child_render':
-                self.handleABExperimentEvent(record, row, event)
-                return
-
-            elif eventType == 'edx.course.enrollment.activated' or eventType == 'edx.course.enrollment.deactivated':
-                self.handleCourseEnrollActivatedDeactivated(record, row, event)
-                return
-
-            # Forum events:
-            elif eventType == 'edx.forum.searched':
-                self.handleForumEvent(record, row, event)
-                return
-
-            # Event type values that start with slash:
-            elif eventType[0] == '/':
-                self.handlePathStyledEventTypes(record, row, event)
-                return
-
-            else:
+            handlerSpec = self.findEventTypeHandler(eventType)
+            if handlerSpec is None:
                 self.logWarn("Unknown event type '%s' in tracklog row %s" %
                              (eventType,
                               self.jsonToRelationConverter.makeFileCitation()))
                 return
+            (handler, passEventType, replacesRow) = handlerSpec
+            if handler is None:
+                # Already recorded everything needed in common-fields
+                return
+            if stats is not None:
+                handlerStartTime = time.time()
+            if passEventType:
+                result = handler(record, row, event, eventType)
+            else:
+                result = handler(record, row, event)
+            if stats is not None:
+                stats.addHandlerTime(eventType, time.time() - handlerStartTime)
+            # Some handlers return the row to push; others
+            # fill in the passed-in row, or do their own pushing:
+            if replacesRow:
+                row = result
+            return
         except Exception as e:
             # Note whether any error occurred, so that
             # the finally clause can act accordingly:
@@ -4595,6 +4590,9 @@ class EdXTrackLogJSONParser(GenericJSONParser):
     def makeHash(cls, username):
         '''
         Returns a ripemd160 40 char hash of the given name. 
+        Hashes are memoized in the process-wide cache of
+        module anon_hash, which is also used by code that
+        does not go through this parser.
 
         :param username: name to be hashed
         :type username: String
@@ -4602,10 +4600,7 @@ class EdXTrackLogJSONParser(GenericJSONParser):
 
         :rtype: String
         '''
-        #return hashlib.sha224(username).hexdigest()
-        oneHash = hashlib.new('ripemd160')
-        oneHash.update(username)
-        return oneHash.hexdigest()
+        return makeHash(username)
 
     def extractOpenEdxHash(self, idStr):
         '''
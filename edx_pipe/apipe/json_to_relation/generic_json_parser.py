@@ -48,6 +48,10 @@ class GenericJSONParser(object):
         # in subclasses, and the column names are added in setValInRow() as
         # that method is called to insert values.
         self.colNamesByTable = {} 
+
+        # TransformStats instance if the converter collects
+        # statistics; set by JSONToRelation.convert():
+        self.stats = None
     
     def getReadyForNextRow(self):
         '''
@@ -300,6 +304,28 @@ class GenericJSONParser(object):
             self.logInfo("Processed %d JSON objects..." % self.totalLinesDoneSoFar)
             self.linesSinceLastProgReport = 0
             
+    def getCheckpointState(self):
+        '''
+        Return the parser state that carries over from one JSON
+        object to the next, for inclusion in a checkpoint of the
+        conversion. Subclasses with such state extend the dict.
+        The values must be picklable.
+
+        :return: state to hand to restoreCheckpointState() when resuming
+        :rtype: {String : <any>}
+        '''
+        return {'totalLinesDoneSoFar' : self.totalLinesDoneSoFar}
+
+    def restoreCheckpointState(self, state):
+        '''
+        Reinstate state returned by getCheckpointState()
+        when a conversion is resumed from a checkpoint.
+
+        :param state: state from a checkpoint
+        :type state: {String : <any>}
+        '''
+        self.totalLinesDoneSoFar = state['totalLinesDoneSoFar']
+
     def logWarn(self, msg):
         self.jsonToRelationConverter.__class__.logger.warn(msg)
 
@@ -7,11 +7,15 @@ JSON strings, and MongoDB collections.
 
 @author: paepcke
 '''
+import Queue
 import StringIO
 import bz2
+from distutils.spawn import find_executable
 import gzip
 import os
+import subprocess
 import sys
+import threading
 from urllib import FancyURLopener
 import urllib2
 from urlparse import urlparse
@@ -21,6 +25,118 @@ class COMPRESSION_TYPE:
     NO_COMPRESSION = 0;
     GZIP = 1;
     BZIP2 = 2
+    ZSTD = 3
+
+# External decompressors, in order of preference, for each
+# compression type. The multi-threaded ones come first. Each
+# command writes the decompressed file to stdout:
+DECOMPRESSOR_COMMANDS = {
+    COMPRESSION_TYPE.GZIP  : [['pigz', '-dc'], ['gzip', '-dc']],
+    COMPRESSION_TYPE.BZIP2 : [['pbzip2', '-dc'], ['bzip2', '-dc']],
+    COMPRESSION_TYPE.ZSTD  : [['zstd', '-dcq']],
+}
+
+def findDecompressor(compression):
+    '''
+    Return the command line of the preferred external
+    decompressor that is installed for the given compression
+    type, or None if there is none.
+
+    :param compression: one of the COMPRESSION_TYPE values
+    :type compression: int
+    :return: command without the file argument, like ['pigz', '-dc']
+    :rtype: {[String] | None}
+    '''
+    for command in DECOMPRESSOR_COMMANDS.get(compression, []):
+        if find_executable(command[0]) is not None:
+            return command
+    return None
+
+class BlockLineReader(object):
+    '''
+    Iterator over the lines of a file-like object, which is
+    read in large blocks by a separate thread. The thread
+    splits the blocks into lines, and keeps a few blocks ahead
+    of the consumer. Reading, which includes decompression
+    for gzip.GzipFile and bz2.BZ2File, or waiting on the pipe
+    from an external decompressor, thus overlaps with the
+    processing of the lines.
+    '''
+
+    BLOCK_SIZE = 4 * 1024 * 1024
+    # Number of blocks the reader thread may be ahead:
+    BLOCKS_AHEAD = 4
+
+    def __init__(self, rawFile, blockSize=BLOCK_SIZE):
+        '''
+        :param rawFile: file-like object with a read(size) method
+        :type rawFile: file
+        :param blockSize: number of bytes per read
+        :type blockSize: int
+        '''
+        self.rawFile = rawFile
+        self.blockSize = blockSize
+        self.blocks = Queue.Queue(BlockLineReader.BLOCKS_AHEAD)
+        self.stopRequested = False
+        # Set when rawFile has been read to its end:
+        self.reachedEnd = False
+        self.readerThread = threading.Thread(target=self.readBlocks, name='BlockLineReader')
+        self.readerThread.daemon = True
+        self.readerThread.start()
+        # One generator for all iterations, so that an iteration
+        # that is cut short can be continued:
+        self.lineIterator = self.iterLines()
+
+    def readBlocks(self):
+        '''
+        Body of the reader thread. Queues lists of lines; the
+        last line of a block is held back until the next block
+        completes it. At the end, queues None, or the exception
+        that ended the reading.
+        '''
+        try:
+            partialLine = ''
+            while not self.stopRequested:
+                block = self.rawFile.read(self.blockSize)
+                if not block:
+                    self.reachedEnd = True
+                    break
+                lines = (partialLine + block).split('\n')
+                partialLine = lines.pop()
+                self.putBlock([line + '\n' for line in lines])
+            if partialLine and not self.stopRequested:
+                self.putBlock([partialLine])
+            self.putBlock(None)
+        except Exception as e:
+            self.putBlock(e)
+
+    def putBlock(self, item):
+        # Don't block forever if the consumer went away:
+        while not self.stopRequested:
+            try:
+                self.blocks.put(item, timeout=1)
+                return
+            except Queue.Full:
+                continue
+
+    def __iter__(self):
+        return self.lineIterator
+
+    def iterLines(self):
+        while True:
+            lines = self.blocks.get()
+            if lines is None:
+                return
+            if isinstance(lines, Exception):
+                raise lines
+            for line in lines:
+                yield line
+
+    def close(self):
+        self.stopRequested = True
+        self.readerThread.join()
+        self.rawFile.close()
+
 
 class InputSource(object):
     '''
@@ -53,6 +169,29 @@ class InputSource(object):
         # If the conversion worked fine, then this return value
         # is ignored.
         return False
+
+    def skipTo(self, byteOffset):
+        '''
+        Position the source at the given offset into its
+        (decompressed) content, which must be the start of
+        a line. Used when resuming a conversion from a checkpoint.
+        Must be called before reading from the source. This
+        default implementation reads and discards lines;
+        subclasses may seek instead.
+
+        :param byteOffset: number of bytes to skip
+        :type byteOffset: int
+        @raise IOError: if the source ends before the offset,
+               or the offset is not at a line start
+        '''
+        bytesSkipped = 0
+        if byteOffset > 0:
+            for line in self.fileHandle:
+                bytesSkipped += len(line)
+                if bytesSkipped >= byteOffset:
+                    break
+        if bytesSkipped != byteOffset:
+            raise IOError("Cannot skip to byte %d of %s" % (byteOffset, self.getSourceName()))
             
     
 
@@ -69,12 +208,26 @@ class InURI(InputSource):
         # Sets self.deleteTempFile if a tmp file was created:
         self.ensureFileLocal(inFilePathOrURL)
         
+        # Compressed files are streamed, never expanded on disk. An external
+        # (preferably multi-threaded) decompressor is used if one is installed,
+        # since it runs in parallel with the parsing:
+        self.decompressorProcess = None
         if self.compression == COMPRESSION_TYPE.NO_COMPRESSION:
             self.fileHandle = urllib2.urlopen(self.localFilePath)
+            return
+        decompressorCommand = findDecompressor(self.compression)
+        if decompressorCommand is not None:
+            self.decompressorProcess = subprocess.Popen(decompressorCommand + [self.localFilePath],
+                                                        stdout=subprocess.PIPE,
+                                                        bufsize=BlockLineReader.BLOCK_SIZE)
+            rawFile = self.decompressorProcess.stdout
         elif self.compression == COMPRESSION_TYPE.GZIP:
-            self.fileHandle = gzip.open(self.localFilePath, 'rb')
+            rawFile = gzip.open(self.localFilePath, 'rb')
         elif self.compression == COMPRESSION_TYPE.BZIP2:
-            self.fileHandle = bz2.BZ2File(self.localFilePath, 'rb')
+            rawFile = bz2.BZ2File(self.localFilePath, 'rb')
+        else:
+            raise IOError("Cannot read %s: no zstd decompressor found; install zstd." % self.localFilePath)
+        self.fileHandle = BlockLineReader(rawFile)
     
     def getSourceName(self):
         '''
@@ -86,32 +239,67 @@ class InURI(InputSource):
         :rtype: String
         '''
         return self.inFilePathOrURL
+
+    def skipTo(self, byteOffset):
+        '''
+        Uncompressed local files are positioned by seeking;
+        all others by reading and discarding lines.
+
+        :param byteOffset: number of bytes to skip
+        :type byteOffset: int
+        '''
+        parseResult = urlparse(self.localFilePath)
+        if self.compression != COMPRESSION_TYPE.NO_COMPRESSION or parseResult.scheme != 'file':
+            return super(InURI, self).skipTo(byteOffset)
+        if byteOffset > os.path.getsize(parseResult.path):
+            raise IOError("Cannot skip to byte %d of %s" % (byteOffset, self.getSourceName()))
+        self.fileHandle.close()
+        self.fileHandle = open(parseResult.path, 'rb')
+        if byteOffset > 0:
+            # The byte before the offset must end a line:
+            self.fileHandle.seek(byteOffset - 1)
+            if self.fileHandle.read(1) != '\n':
+                raise IOError("Byte %d of %s is not at the start of a line" % (byteOffset, self.getSourceName()))
     
     def decompress(self, line):
         if self.compression == COMPRESSION_TYPE.NO_COMPRESSION:
             return line
-        # For gzip and bz2, the read() of the fileHandle took
+        # For compressed files, the reading of the fileHandle took
         # care of decompression. This method is here for expansion
         # to other compression schemes:
         return line
         
     def close(self):
+        # If we stopped reading before the end of the decompressor's
+        # output, we don't care about the rest of it. The reader
+        # thread may reach the end while we terminate, so whether
+        # we killed the decompressor is decided here, once:
+        terminated = self.decompressorProcess is not None and not self.fileHandle.reachedEnd
+        if terminated:
+            self.decompressorProcess.terminate()
         # closing is different in case of file vs. URL:
         try:
             (scheme,netloc,path,query,fragment) = self.fileHandle.urlsplit()  # @UnusedVariable
         except AttributeError:
             self.fileHandle.close()
+        exitStatus = 0
+        if self.decompressorProcess is not None:
+            exitStatus = self.decompressorProcess.wait()
         if self.deleteTempFile:
             try:
                 os.remove(self.localFilePath)
             except:
                 pass
+        if exitStatus != 0 and not terminated:
+            # E.g. a truncated file:
+            raise IOError("Decompression of %s failed with exit status %s" %
+                          (self.inFilePathOrURL, exitStatus))
     
     def determineCompression(self, fileURI):
         '''
         Given a file path, determine by file extension whether
-        the file is gzip or bzip2 compressed, or whether it is
-        not compressed.
+        the file is gzip, bzip2, or zstd compressed, or whether
+        it is not compressed.
 
         :param fileURI: item that str() turns into a file path or URL
         :type fileURI: STRING
@@ -120,6 +308,8 @@ class InURI(InputSource):
             return COMPRESSION_TYPE.BZIP2
         elif str(fileURI).endswith('gz'):
             return COMPRESSION_TYPE.GZIP
+        elif str(fileURI).endswith(('zst', 'zstd')):
+            return COMPRESSION_TYPE.ZSTD
         else:
             return COMPRESSION_TYPE.NO_COMPRESSION
     
@@ -150,6 +340,60 @@ class InURI(InputSource):
         self.localFilePath = opener.retrieve(inFilePathOrURL)[0]
         self.deleteTempFile = True
     
+class InFileSegment(InputSource):
+    '''
+    One newline-aligned byte range of an uncompressed, local
+    file. Used to hand disjoint portions of one large tracking
+    log to separate JSONToRelation instances that run in
+    parallel. The offsets are expected to fall on line starts;
+    see json2sql.computeShardOffsets().
+    '''
+    def __init__(self, inFilePath, startOffset, endOffset):
+        self.inFilePath = inFilePath
+        self.startOffset = startOffset
+        self.endOffset = endOffset
+        self.rawFile = open(inFilePath, 'rb')
+        self.rawFile.seek(startOffset)
+        self.fileHandle = self.readLines()
+
+    def readLines(self):
+        '''
+        Generator over the lines of the segment. Uses the
+        file's own (read-ahead) iterator, and keeps track of the
+        position by summing line lengths, since tell() is not
+        reliable while iterating.
+        '''
+        pos = self.startOffset
+        for line in self.rawFile:
+            if pos >= self.endOffset:
+                break
+            pos += len(line)
+            yield line
+
+    def getSourceName(self):
+        '''
+        Identify this source such that logging can identify sources
+        of errors. Same name as InURI would report for the whole
+        file, so that the LoadInfo entries of all segments agree.
+
+        :return: a string that can be prepended to a line number in error/warn msgs
+
+        :rtype: String
+        '''
+        return 'file://' + self.inFilePath
+
+    def decompress(self, line):
+        '''
+        Segments are only taken from uncompressed files.
+
+        :param line:
+        :type line:
+        '''
+        return line
+
+    def close(self):
+        self.rawFile.close()
+
 class InString(InputSource):
     def __init__(self, inputStr):
         self.fileHandle = StringIO.StringIO(inputStr)
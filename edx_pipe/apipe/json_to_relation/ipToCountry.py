@@ -16,7 +16,12 @@ The underlying IP->Country information comes from http://software77.net/geo-ip/
 
 @author: paepcke
 '''
+from array import array
+import bisect
+from collections import OrderedDict
+import cPickle
 import os
+import tempfile
 import unittest
 
 
@@ -30,9 +35,15 @@ class IpCountryDict(unittest.TestCase):
     THREE_LETTER_POS = 3
     COUNTRY_POS = 4
 
-    def __init__(self, ipTablePath=None):
+    # Number of most recently looked up IPs whose
+    # country is remembered:
+    RECENT_IPS_MAX = 10000
+
+    UNKNOWN_COUNTRY = ('ZZ','ZZZ','unknown')
+
+    def __init__(self, ipTablePath=None, pickleCachePath=None):
         '''
-        Create an in-memory dict for quickly looking up IP addresses.
+        Create an in-memory index for quickly looking up IP addresses.
         The underlying IP->Country information comes from http://software77.net/geo-ip/
         If an unzipped table from their Web site is not passed in, then 
         the table is expected to reside in subdirectory 'data' of this script's directory
@@ -40,40 +51,116 @@ class IpCountryDict(unittest.TestCase):
         columns for (decimal)startRange, endRange, assigning agency, assignment
         date, two-letter-country code, three-letter-country code, and country.
         
-        The lookup table we construct uses the first four digits of the 
-        starting ranges as key. Values are an array of tuples:
-            (startIpRange,endIPRange,2-letterCode,3-letterCode,Country)
-        All IPs in one key's values thus start with the key's digits.
-        The arrays are just a few tuples long, so the scan through them
-        is fast. The arrays are ordered by rising start and (therefore)
-        end IP.
+        The index consists of three parallel arrays, ordered by
+        rising start IP: the start IPs, the end IPs, and the position
+        of each range's country in self.countries, which holds
+        (2-letterCode,3-letterCode,Country) tuples. A lookup is a
+        binary search over the start IPs. The countries of the most
+        recently looked up IPs are kept in a small LRU dict, since
+        the IPs of one tracking log repeat a lot.
+        
+        Parsing the CSV file takes a few seconds. The index is 
+        therefore pickled to pickleCachePath, and loaded from
+        there as long as the pickle is newer than the CSV file.
         
         We also construct a simpler dict that maps a country's three-letter
         code to a tuple: (two-letter code, three-letter code, full country name).
+
+        :param ipTablePath: software77.net CSV table. Default: data/ipToCountrySoftware77DotNet.csv
+        :type ipTablePath: String
+        :param pickleCachePath: destination for the cached index. Default: the table path with extension .pkl
+        :type pickleCachePath: String
         '''
-        currKey = 0
-        self.ipToCountryDict = {currKey : []}
-        self.threeLetterKeyedDict = {}
         if ipTablePath is None:
             tableSubPath = os.path.join('data/', 'ipToCountrySoftware77DotNet.csv')
             ipTablePath = os.path.join(os.path.dirname(__file__), tableSubPath)
+        if pickleCachePath is None:
+            pickleCachePath = os.path.splitext(ipTablePath)[0] + '.pkl'
+        self.recentIPs = OrderedDict()
+        if not self.loadIndexCache(ipTablePath, pickleCachePath):
+            self.buildIndex(ipTablePath)
+            self.saveIndexCache(pickleCachePath)
+
+    def buildIndex(self, ipTablePath):
+        '''
+        Parse the software77.net CSV table into the index
+        arrays and the three-letter code dict.
+
+        :param ipTablePath: software77.net CSV table
+        :type ipTablePath: String
+        '''
+        ranges = []
+        self.threeLetterKeyedDict = {}
         with open(ipTablePath, 'r') as fd:
             for line in fd:
                 if line[0] == '#':
                     continue
                 (startIPStr,endIPStr,auth,assigned,twoLetterCountry,threeLetterCountry,country) = line.strip().split(',')  # @UnusedVariable
-                # Use first four digits of start ip as hash key:
-                hashKey = startIPStr.strip('"').zfill(10)[0:4]
-                if hashKey != currKey:
-                    self.ipToCountryDict[hashKey] = []
-                    currKey = hashKey
-                self.ipToCountryDict[hashKey].append((int(startIPStr.strip('"')), 
-                                                       int(endIPStr.strip('"')), 
-                                                       twoLetterCountry.strip('"'), 
-                                                       threeLetterCountry.strip('"'), 
-                                                       country.strip('"'))
-                                                    )
-                self.threeLetterKeyedDict[threeLetterCountry.strip('"')] = (twoLetterCountry.strip('"'), threeLetterCountry.strip('"'), country.strip('"'))
+                countryTuple = (twoLetterCountry.strip('"'), threeLetterCountry.strip('"'), country.strip('"'))
+                ranges.append((int(startIPStr.strip('"')), int(endIPStr.strip('"')), countryTuple))
+                self.threeLetterKeyedDict[countryTuple[1]] = countryTuple
+        ranges.sort()
+        self.startIPs = array('L')
+        self.endIPs = array('L')
+        self.countryIndexes = array('H')
+        self.countries = []
+        countryToIndex = {}
+        for (startIP, endIP, countryTuple) in ranges:
+            self.startIPs.append(startIP)
+            self.endIPs.append(endIP)
+            try:
+                self.countryIndexes.append(countryToIndex[countryTuple])
+            except KeyError:
+                countryToIndex[countryTuple] = len(self.countries)
+                self.countryIndexes.append(len(self.countries))
+                self.countries.append(countryTuple)
+
+    def loadIndexCache(self, ipTablePath, pickleCachePath):
+        '''
+        Load the index from its pickle cache, unless the cache
+        is missing, unreadable, or older than the CSV table.
+
+        :return: True if the index was loaded
+        :rtype: bool
+        '''
+        try:
+            if os.path.getmtime(pickleCachePath) < os.path.getmtime(ipTablePath):
+                return False
+            with open(pickleCachePath, 'rb') as pickleFd:
+                (self.startIPs,
+                 self.endIPs,
+                 self.countryIndexes,
+                 self.countries,
+                 self.threeLetterKeyedDict) = cPickle.load(pickleFd)
+        except (OSError, IOError, EOFError, ValueError, cPickle.UnpicklingError):
+            return False
+        return True
+
+    def saveIndexCache(self, pickleCachePath):
+        '''
+        Pickle the index for future instances. The cache is
+        written to a temporary file that then replaces it, so that
+        other processes loading the cache meanwhile never see a
+        partial one. Failure to write the cache, e.g. in a read-only
+        installation, only costs time, and is therefore ignored.
+        '''
+        tmpPickleCachePath = None
+        try:
+            (tmpFd, tmpPickleCachePath) = tempfile.mkstemp(prefix='.ipToCountry_',
+                                                           dir=os.path.dirname(pickleCachePath))
+            with os.fdopen(tmpFd, 'wb') as pickleFd:
+                cPickle.dump((self.startIPs,
+                              self.endIPs,
+                              self.countryIndexes,
+                              self.countries,
+                              self.threeLetterKeyedDict),
+                             pickleFd,
+                             cPickle.HIGHEST_PROTOCOL)
+            os.chmod(tmpPickleCachePath, 0644)
+            os.rename(tmpPickleCachePath, pickleCachePath)
+        except (OSError, IOError):
+            if tmpPickleCachePath is not None and os.path.exists(tmpPickleCachePath):
+                os.remove(tmpPickleCachePath)
 
     def get(self, ipStr, default=None):
         '''
@@ -91,7 +178,7 @@ class IpCountryDict(unittest.TestCase):
         try:
             return self.lookupIP(ipStr)
         except KeyError:
-            return None
+            return default
 
     def getBy3LetterCode(self, threeLetterCode):
         return self.threeLetterKeyedDict[threeLetterCode]
@@ -108,47 +195,94 @@ class IpCountryDict(unittest.TestCase):
         :raise ValueError: when given IP address is None
         :raise KeyError: when the country for the given IP is not found. 
         '''
-        (ipNum, lookupKey) = self.ipStrToIntAndKey(ipStr)
-        if ipNum is None or lookupKey is None:
+        recentIPs = self.recentIPs
+        try:
+            countryTuple = recentIPs.pop(ipStr)
+        except KeyError:
+            ipNum = self.ipStrToInt(ipStr)
+            if ipNum is None:
+                raise ValueError('IP string is not a valid IP address: %s' % str(ipStr))
+            countryTuple = self.lookupIPNum(ipNum)
+            if len(recentIPs) >= IpCountryDict.RECENT_IPS_MAX:
+                recentIPs.popitem(last=False)
+        except TypeError:
+            # Unhashable, so certainly not an IP string:
             raise ValueError('IP string is not a valid IP address: %s' % str(ipStr))
-        while lookupKey > 0:
-            try:
-                ipRangeChain = self.ipToCountryDict[lookupKey]
-                break
-            except KeyError:
-                lookupKey = str(int(lookupKey) - 1).zfill(4)[0:4]
-                continue
-        if ipRangeChain is None:
-            raise KeyError('IP string is not a valid IP address: %s' % str(ipStr))
-        for ipInfo in ipRangeChain:
-            # Have (rangeStart,rangeEnd,country2Let,country3Let,county)
-            # Sorted by rangeStart:
-            if ipNum > ipInfo[IpCountryDict.END_IP_POS]:
-                continue
-            return(ipInfo[IpCountryDict.TWO_LETTER_POS], 
-                   ipInfo[IpCountryDict.THREE_LETTER_POS],
-                   ipInfo[IpCountryDict.COUNTRY_POS])
-        # If we get here, the IP is in a range in which
-        # the IP-->Country table has a hole:
-        return('ZZ','ZZZ','unknown')
-        
-        
-            
+        # (Re-)insert as most recently used:
+        recentIPs[ipStr] = countryTuple
+        return countryTuple
+
+    def lookupIPNum(self, ipNum):
+        '''
+        Find the country of an IP address given as int.
+
+        :param ipNum: IP address as int, e.g. 16793600
+        :type ipNum: int
+        :return: 2-letter country code, 3-letter country code, and country string
+        :rtype: (str,str,str)
+        '''
+        # Rightmost range that starts at or below the IP:
+        rangeIndex = bisect.bisect_right(self.startIPs, ipNum) - 1
+        if rangeIndex < 0 or ipNum > self.endIPs[rangeIndex]:
+            # The IP is in a range in which
+            # the IP-->Country table has a hole:
+            return IpCountryDict.UNKNOWN_COUNTRY
+        return self.countries[self.countryIndexes[rangeIndex]]
+
+    def lookupMany(self, ipStrs, default=None):
+        '''
+        Batch version of get(): look up the countries of many IP
+        addresses at once. Each distinct IP is searched only once,
+        and the searches are done in order of rising IP, which
+        keeps the binary searches cache friendly. The LRU of
+        recently looked up IPs is neither consulted nor updated.
+
+        :param ipStrs: IP address strings
+        :type ipStrs: [String]
+        :param default: result for strings that are not valid IP addresses
+        :type default: <any>
+        :return: for each given IP, in order, the 2-letter country code, 3-letter country code,
+                 and country string; or default
+        :rtype: [{(str,str,str) | defaultType}]
+        '''
+        ipNums = {}
+        for ipStr in ipStrs:
+            if ipStr not in ipNums:
+                ipNums[ipStr] = self.ipStrToInt(ipStr)
+        countryByIPNum = {None : default}
+        for ipNum in sorted(set(ipNums.values()) - set([None])):
+            countryByIPNum[ipNum] = self.lookupIPNum(ipNum)
+        return [countryByIPNum[ipNums[ipStr]] for ipStr in ipStrs]
+
+    def ipStrToInt(self, ipStr):
+        '''
+        Given an IP string, return the numeric int.
+        :param ipStr: ip string like '171.64.65.66'
+        :type ipStr: string
+        :return: ip int, like 16793600. Returns None if IP was not a four-octet str.
+        :rtype: int
+        '''
+        try:
+            (oct0,oct1,oct2,oct3) = ipStr.split('.')
+            return int(oct3) + (int(oct2) * 256) + (int(oct1) * 256 * 256) + (int(oct0) * 256 * 256 * 256)
+        except (ValueError, AttributeError):
+            # Given ip str does not contain four numeric octets:
+            return None
+
     def ipStrToIntAndKey(self, ipStr):
         '''
         Given an IP string, return two-tuple: the numeric
-        int, and a lookup key into self.ipToCountryDict. 
+        int, and the first four digits of the zero-padded int.
+        The key is no longer used for lookups; the method is
+        kept for existing callers.
         :param ipStr: ip string like '171.64.65.66'
         :type ipStr: string
         :return: two-tuple of ip int and the first four digits, i.e. a lookup key. Like (16793600, 1679). Returns (None,None) if IP was not a four-octed str.
         :rtype: (int,int)
         '''
-        try:
-            (oct0,oct1,oct2,oct3) = ipStr.split('.')
-        except ValueError:
-            # Given ip str does not contain four octets:
+        ipNum = self.ipStrToInt(ipStr)
+        if ipNum is None:
             return (None,None)
-        ipNum = int(oct3) + (int(oct2) * 256) + (int(oct1) * 256 * 256) + (int(oct0) * 256 * 256 * 256)
         return (ipNum, str(ipNum).zfill(10)[0:4])
 
 
@@ -29,7 +29,9 @@ Modifications:
 
 from cStringIO import StringIO
 from collections import OrderedDict
+import cPickle
 import copy
+import csv
 import logging
 import math
 import os
@@ -38,10 +40,12 @@ import shutil
 import tempfile
 import datetime
 
+from anon_hash import sharedHashCache
 from col_data_type import ColDataType
 from generic_json_parser import GenericJSONParser
 from input_source import InputSource, InURI, InString, InMongoDB, InPipe
-from output_disposition import OutputDisposition, OutputFile, OutputPipe
+from output_disposition import OutputDisposition, OutputFile, OutputPipe, OutputRows
+from transform_stats import TransformStats
 
 class JSONToRelation(object):
     '''
@@ -75,6 +79,10 @@ class JSONToRelation(object):
     # the INSERT, and column name specs. Or round
     # down like this:
     MAX_ALLOWED_PACKET_SIZE = 1000000; 
+
+    # Default number of JSON objects between
+    # checkpoints (see writeCheckpoint()):
+    CHECKPOINT_EVERY = 100000
     
 
     # Remember whether logging has been initialized (class var!):
@@ -89,7 +97,10 @@ class JSONToRelation(object):
                  loggingLevel=logging.INFO,
                  logFile=None,
                  mainTableName='Main',
-                 progressEvery=1000):
+                 progressEvery=1000,
+                 collectStats=False,
+                 checkpointFile=None,
+                 checkpointEvery=CHECKPOINT_EVERY):
         '''
         Create a JSON-to-Relation converter. The JSON source can be
         a file with JSON objects, a StringIO.StringIO string pseudo file,
@@ -139,6 +150,16 @@ class JSONToRelation(object):
         :type logFile: String
         :param progressEvery: number of JSON object to process before reporting the number in a log info msg. If None, no reporting
         :type  progressEvery: {int | None}
+        :param collectStats: if True, convert() records bytes read, JSON decode time, and
+                        per event type counts and handler times in self.stats, a TransformStats instance.
+        :type collectStats: Boolean
+        :param checkpointFile: if provided, convert() periodically records in this file how far it got,
+                        so that a crashed conversion can be resumed via convert(resume=True). Only
+                        supported for CSV output to an OutputFile. The file is removed when the
+                        conversion completes.
+        :type checkpointFile: {String | None}
+        :param checkpointEvery: number of JSON objects between checkpoints
+        :type checkpointEvery: int
         @raise ValueError: when value of jsonParserInstance is neither None, nor an instance of GenericJSONParser,
                         nor one of its subclasses.
         @raise ValueError: when jsonSource is not an instance of InPipe, InString, InURI, or InMongoDB  
@@ -162,6 +183,8 @@ class JSONToRelation(object):
         # self.loadDateTime = time.strftime('%Y%m%d%H%M%s', time.localtime())
         self.loadDateTime = datetime.datetime.now().isoformat()
         self.loadFile = jsonSource.getSourceName()
+        # Bytes of the source translated so far, updated by convert():
+        self.bytesRead = 0
 
         # Check schemaHints correctness:
         if schemaHints is not None:
@@ -215,6 +238,12 @@ class JSONToRelation(object):
         # newly encountered: 
         self.nextNewColPos = 0;
 
+        # Optional instrumentation:
+        self.stats = TransformStats(self.loadFile) if collectStats else None
+
+        self.checkpointFile = checkpointFile
+        self.checkpointEvery = checkpointEvery
+
     def flush(self):
         '''
         MUST be called when no more items are to be converted. Needed
@@ -340,7 +369,7 @@ class JSONToRelation(object):
             colDataType = userDefinedHintType
         self.destination.ensureColExistence(colName, colDataType, self, tableName)
 
-    def convert(self, prependColHeader=False):
+    def convert(self, prependColHeader=False, resume=False):
         '''
         Main user-facing API method. Read from the JSON source establish
         in the __init__() call. Create a MySQL schema as the JSON is read.
@@ -353,6 +382,13 @@ class JSONToRelation(object):
                 completed column name header row to the final destination that was specified
                 by the client. 
         :type prependColHeader: Boolean
+        :param resume: if True, continue the conversion from the checkpoint in self.checkpointFile:
+                the input is positioned where the checkpoint was taken, the parser state is
+                restored, and the per-table CSV files are cut back to their sizes at the
+                checkpoint. The destination must have been created with those sizes
+                (see readCheckpoint() and OutputFile).
+        :type resume: Boolean
+        @raise ValueError: if resume is True, but there is no usable checkpoint
         '''
         savedFinalOutDest = None
         if self.destination.getOutputFormat() != self.destination.OutputFormat.SQL_INSERT_STATEMENTS: 
@@ -366,10 +402,48 @@ class JSONToRelation(object):
                 # to self.destination before this point:
                 savedFinalOutDest.copySchemas(self.destination)
 
+        # Local var, so that the test below is cheap when
+        # no stats are collected:
+        stats = self.stats
+        self.jsonParserInstance.stats = stats
+        if stats is not None:
+            # The hash cache is shared process-wide; only
+            # count the lookups of this conversion:
+            (anonHashHitsBefore, anonHashMissesBefore) = (sharedHashCache.hits, sharedHashCache.misses)
+
+        # Checkpoints need the CSV files written row by row, which
+        # is the case for CSV output to files:
+        checkpointEvery = None
+        if self.checkpointFile is not None:
+            if isinstance(self.destination, OutputFile) and savedFinalOutDest is None and\
+               self.destination.getOutputFormat() == OutputDisposition.OutputFormat.CSV:
+                checkpointEvery = self.checkpointEvery
+            else:
+                JSONToRelation.logger.warn('Checkpoints are only taken for CSV output to files; none will be written.')
+
+        malformedEntryCount = 0
+        bytesRead = 0
+        if resume:
+            checkpoint = JSONToRelation.readCheckpoint(self.checkpointFile)
+            if checkpoint is None or checkpoint['source'] != self.loadFile:
+                raise ValueError("No checkpoint for %s in %s" % (self.loadFile, self.checkpointFile))
+            bytesRead = checkpoint['byteOffset']
+            self.lineCounter = checkpoint['lineCounter']
+            malformedEntryCount = checkpoint['malformedEntryCount']
+            self.jsonParserInstance.restoreCheckpointState(checkpoint['parserState'])
+            self.destination.truncateCSVFiles()
+            self.jsonSource.skipTo(bytesRead)
+            JSONToRelation.logger.info('Resuming at line %d (byte %d)' % (self.lineCounter + 1, bytesRead))
+        if checkpointEvery is not None:
+            nextCheckpointLine = self.lineCounter + checkpointEvery
+
         with self.destination as outFd, self.jsonSource as inFd:
-            malformedEntryCount = 0
 
             for jsonStr in inFd:
+                bytesRead += len(jsonStr)
+                self.bytesRead = bytesRead
+                if stats is not None:
+                    stats.countLine(jsonStr)
                 # Skip empty rows:
                 if jsonStr == '\n' or len(jsonStr) == 0:
                     continue
@@ -390,6 +464,9 @@ class JSONToRelation(object):
                     # traceback.print_tb(sys.exc_info()[2])
                     # print("----------------------------------------------------------------------------")
                     #***************
+                if checkpointEvery is not None and self.lineCounter >= nextCheckpointLine:
+                    self.writeCheckpoint(bytesRead, malformedEntryCount)
+                    nextCheckpointLine = self.lineCounter + checkpointEvery
 
             print("Malformed JSON tracking log entries: %d/%d" % (malformedEntryCount, self.lineCounter + 1))
             # Since we hold back SQL insertion values to include them
@@ -409,6 +486,17 @@ class JSONToRelation(object):
                 self.jsonParserInstance.finish(includeCSVLoadCommands=True, outputDisposition=self.destination)
             else:
                 self.jsonParserInstance.finish(includeCSVLoadCommands=False)
+            if stats is not None:
+                stats.addAnonHashCounts(sharedHashCache.hits - anonHashHitsBefore,
+                                        sharedHashCache.misses - anonHashMissesBefore)
+                stats.finish()
+
+        # The conversion is complete; nothing to resume:
+        if checkpointEvery is not None:
+            try:
+                os.remove(self.checkpointFile)
+            except OSError:
+                pass
         
         
         # If output to other than MySQL table (e.g. CSV file), check whether
@@ -429,6 +517,52 @@ class JSONToRelation(object):
                     pass
                 
 
+    def writeCheckpoint(self, byteOffset, malformedEntryCount):
+        '''
+        Record how far the conversion got in self.checkpointFile: the input
+        byte offset after the last processed line, the line counter, the size
+        of each table's CSV file, and the parser state that carries over from
+        one line to the next. Held-back rows are flushed first, so that the
+        CSV files hold exactly the rows of the lines up to the offset. The
+        file is replaced atomically, so a crash while checkpointing leaves
+        the previous checkpoint intact.
+
+        :param byteOffset: number of input bytes consumed
+        :type byteOffset: int
+        :param malformedEntryCount: number of bad JSON objects seen so far
+        :type malformedEntryCount: int
+        '''
+        self.processFinishedRow('FLUSH', self.destination)
+        checkpoint = {'source' : self.loadFile,
+                      'byteOffset' : byteOffset,
+                      'lineCounter' : self.lineCounter,
+                      'malformedEntryCount' : malformedEntryCount,
+                      'csvFileSizes' : self.destination.getCSVFileSizes(),
+                      'parserState' : self.jsonParserInstance.getCheckpointState()
+                      }
+        tmpCheckpointFile = self.checkpointFile + '.tmp'
+        with open(tmpCheckpointFile, 'wb') as checkpointFd:
+            cPickle.dump(checkpoint, checkpointFd, cPickle.HIGHEST_PROTOCOL)
+            checkpointFd.flush()
+            os.fsync(checkpointFd.fileno())
+        os.rename(tmpCheckpointFile, self.checkpointFile)
+
+    @classmethod
+    def readCheckpoint(cls, checkpointFile):
+        '''
+        Read a checkpoint written by writeCheckpoint().
+
+        :param checkpointFile: path to the checkpoint
+        :type checkpointFile: String
+        :return: the checkpoint dict, or None if there is no readable checkpoint
+        :rtype: {dict | None}
+        '''
+        try:
+            with open(checkpointFile, 'rb') as checkpointFd:
+                return cPickle.load(checkpointFd)
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            return None
+
     def pushString(self, whatToWrite):
         '''
         Pushes the given string straight to the output (pipe or file).
@@ -485,6 +619,30 @@ class JSONToRelation(object):
         # information than CSV destined parsers. MySQL dumps provide
         # a list ('tableName', 'insertSig', [valsArray]), while the
         # others produce just an array of values:
+        if isinstance(filledNewRow, tuple) and isinstance(outFd, OutputRows):
+            # Rows handed on in the same process: the values are passed
+            # as the CSV file would give them back, and only written
+            # to it if the files are kept:
+            (tableName, insertSig, valsArray) = filledNewRow  # @UnusedVariable
+            for csvValues in self.constructCSVValues(valsArray):
+                outFd.rowConsumer(tableName, csvValues)
+            if outFd.keepCSVFiles:
+                try:
+                    outFd.writeCSVLine(tableName, self.constructCSVLine(valsArray))
+                except Exception as e:
+                    JSONToRelation.logger.warn('Error during writeCSVLine() call in json_to_relation.processFinishRow(): %s' % `e`)
+            return
+        if isinstance(filledNewRow, tuple) and isinstance(outFd, OutputFile) and\
+           outFd.getOutputFormat() == OutputDisposition.OutputFormat.CSV:
+            # CSV only: no INSERT statement is needed, so don't build
+            # one just to have OutputFile parse the values back out of it:
+            (tableName, insertSig, valsArray) = filledNewRow  # @UnusedVariable
+            csvLine = self.constructCSVLine(valsArray)
+            try:
+                outFd.writeCSVLine(tableName, csvLine)
+            except Exception as e:
+                JSONToRelation.logger.warn('Error during writeCSVLine() call in json_to_relation.processFinishRow(): %s' % `e`)
+            return
         if isinstance(filledNewRow, tuple) or filledNewRow == "FLUSH":
             # Calling parser created INSERT statements:
             filledNewRow = self.prepareMySQLRow(filledNewRow)
@@ -652,6 +810,75 @@ class JSONToRelation(object):
             isFirstVal = True
         return valsFileStr
 
+    def constructCSVLine(self, valsArray):
+        '''
+        Takes the values of one row, and returns the line that
+        OutputFile.writeCSVRowsFromInsertStatement() would extract
+        for that row from the INSERT statement built by constructValuesStr():
+        the same quoting rules, without the parentheses. Ex: ['foo',10,None]
+        returns "'foo',10,null\\n".
+
+        :param valsArray: values of one row
+        :type valsArray: [<any>]
+        :return: one CSV line, including the newline
+
+        :rtype: String
+        @raise UnicodeEncodeError: if a value is not ASCII, as is the case
+               when the values are sized up for an INSERT statement.
+        '''
+        return str(','.join(['null' if insertVal == 'null' or insertVal is None
+                             else "'" + insertVal + "'" if isinstance(insertVal, basestring)
+                             else str(insertVal)
+                             for insertVal in valsArray]) + '\n')
+
+    def constructCSVValues(self, valsArray):
+        '''
+        Takes the values of one row, and returns them as a csv reader,
+        with quotechar "'" and escapechar backslash, reads them back from
+        the line constructCSVLine() makes of them: a list of strings, 'null'
+        for None. Plain values are converted directly; only rows with
+        values that are escaped in the line are read back from it.
+        A list of rows is returned, since such a line may read back as
+        several rows.
+
+        :param valsArray: values of one row
+        :type valsArray: [<any>]
+        :return: the rows read back from the row's CSV line, usually one;
+                 no value holds a NUL, which a csv reader rejects
+        :rtype: [[String]]
+        @raise UnicodeEncodeError: if a value is not ASCII, as constructCSVLine() does.
+        @raise csv.Error: if a value holds a NUL.
+        '''
+        csvValues = ['null' if insertVal == 'null' or insertVal is None
+                     else insertVal if isinstance(insertVal, basestring)
+                     else str(insertVal) if isinstance(insertVal, (int, long, float))
+                     else None
+                     for insertVal in valsArray]
+        # Other values, that str() may render with commas:
+        if None in csvValues:
+            return self.readCSVLine(self.constructCSVLine(valsArray))
+        # Values that are escaped in the line, or that hold the NUL
+        # separating them here, which a csv reader rejects:
+        allValues = '\0'.join(csvValues)
+        if "'" in allValues or '\\' in allValues or \
+           allValues.count('\0') != len(csvValues) - 1:
+            return self.readCSVLine(self.constructCSVLine(valsArray))
+        if isinstance(allValues, unicode):
+            # Raises as constructCSVLine() does for non-ASCII values:
+            return [str(allValues).split('\0')]
+        return [csvValues]
+
+    def readCSVLine(self, csvLine):
+        '''
+        Reads back the rows of a line made by constructCSVLine().
+
+        :param csvLine: comma-separated values, including the trailing newline
+        :type csvLine: String
+        :return: the non-empty rows of the line
+        :rtype: [[String]]
+        '''
+        return [row for row in csv.reader(StringIO(csvLine), quotechar="'", escapechar='\\') if row]
+
     def getSchema(self, tableName=None):
         '''
         Returns an ordered list of ColumnSpec instances.
@@ -261,7 +261,7 @@ class OutputFile(OutputDisposition):
     # we'll cut out in the code:
     VALUES_PATTERN = re.compile(r'^[\s]{4}\(([^\n]*)\n{0,1}')
     
-    def __init__(self, fileName, outputFormat, options='ab'):
+    def __init__(self, fileName, outputFormat, options='ab', csvFileSizes=None):
         '''
         Create instance of an output file destination for converted log files.
         Such an instance is created both for OutputFormat.SQL_INSERT_STATEMENTS and
@@ -278,6 +278,10 @@ class OutputFile(OutputDisposition):
         :param options: output file options as per Python built-in 'open()'. Defaults to append/binary. The
                   latter for compatibility with Windows
         :type options: String
+        :param csvFileSizes: when resuming a conversion from a checkpoint: the size of each
+                  table's CSV file at the checkpoint. Those files are then truncated to
+                  that size, rather than overwritten. Tables not in the dict start empty.
+        :type csvFileSizes: {String : int}
         '''
         super(OutputFile, self).__init__(outputFormat)        
         # Make file name accessible as property just like 
@@ -292,6 +296,7 @@ class OutputFile(OutputDisposition):
             outputFormat == OutputDisposition.OutputFormat.SQL_INSERTS_AND_CSV:
             # Prepare for CSV files needed for the tables:
             self.tableCSVWriters = {}
+        self.resumeCSVFileSizes = csvFileSizes
         
     def close(self):
         self.fileHandle.close()
@@ -446,7 +451,12 @@ class OutputFile(OutputDisposition):
             self.csvTableFiles[tableName] = outFile 
             return outFile
         csvOutFileName = self.getCSVTableOutFileName(tableName)
-        outFile = open(csvOutFileName, 'w')
+        if self.resumeCSVFileSizes is None:
+            outFile = open(csvOutFileName, 'w')
+        else:
+            # Keep what was written up to the checkpoint:
+            outFile = open(csvOutFileName, 'ab')
+            outFile.truncate(self.resumeCSVFileSizes.get(tableName, 0))
         self.csvTableFiles[tableName] = outFile
         self.tableCSVWriters[tableName] = csv.writer(outFile, 
                                                      dialect='excel', 
@@ -460,6 +470,50 @@ class OutputFile(OutputDisposition):
         # main file's name back:
         return "%s_%sTable.csv" % (self.getFileName(None), tableName) 
 
+    def getCSVFileSizes(self):
+        '''
+        Flush the per-table CSV files, and return their sizes.
+
+        :return: size in bytes of each open CSV file
+        :rtype: {String : int}
+        '''
+        csvFileSizes = {}
+        for (tableName, csvFd) in self.csvTableFiles.items():
+            csvFd.flush()
+            csvFileSizes[tableName] = os.fstat(csvFd.fileno()).st_size
+        return csvFileSizes
+
+    def truncateCSVFiles(self):
+        '''
+        When resuming from a checkpoint, drop whatever was appended
+        to the open CSV files since they were opened, such as rows
+        written again by a parser's constructor.
+        '''
+        if self.resumeCSVFileSizes is None:
+            return
+        for (tableName, csvFd) in self.csvTableFiles.items():
+            csvFd.flush()
+            csvFd.truncate(self.resumeCSVFileSizes.get(tableName, 0))
+
+    def writeCSVLine(self, tableName, csvLine):
+        '''
+        Append one already formatted line to the CSV file of the
+        given table. Used in CSV-only output, where the rows of
+        INSERT-generating parsers are written directly, rather than
+        going through writeCSVRowsFromInsertStatement().
+
+        :param tableName: name of table to which the line belongs
+        :type tableName: String
+        :param csvLine: comma-separated values, including the trailing newline
+        :type csvLine: String
+        '''
+        try:
+            theOutFd = self.csvTableFiles[tableName]
+        except KeyError:
+            self.ensureOpenCSVOutFileFromTableName(tableName)
+            theOutFd = self.csvTableFiles[tableName]
+        theOutFd.write(csvLine)
+
     def writeCSVRowsFromInsertStatement(self, insertStatement):
         '''
         Takes one SQL INSERT INTO Statement, possibly including multiple VALUES
@@ -511,6 +565,33 @@ class OutputFile(OutputDisposition):
             theOutFd = self.csvTableFiles[tblName]
             theOutFd.write(valuesList)
 
+class OutputRows(OutputFile):
+    '''
+    CSV output whose rows are handed to a function in the same process,
+    rather than read back from the CSV files by the next stage. Each row
+    is passed as the list of strings the CSV file would give back (see
+    JSONToRelation.constructCSVValues()). The CSV files are only written
+    as well if fileName is other than os.devnull, e.g. for debugging.
+    '''
+
+    def __init__(self, fileName, rowConsumer, options='ab'):
+        '''
+        :param fileName: prefix of the CSV file names, as for OutputFile, or
+                   os.devnull to write no files
+        :type fileName: String
+        :param rowConsumer: function called with the table name and the
+                   values of each row
+        :type rowConsumer: f(String, [String])
+        :param options: output file options as per Python built-in 'open()'
+        :type options: String
+        '''
+        super(OutputRows, self).__init__(fileName, OutputDisposition.OutputFormat.CSV, options)
+        self.rowConsumer = rowConsumer
+        self.keepCSVFiles = fileName != os.devnull
+
+    def __str__(self):
+        return "<OutputRows:%s>" % self.getFileName()
+
 class ColumnSpec(object):
     '''
     Housekeeping class. Each instance represents the name,
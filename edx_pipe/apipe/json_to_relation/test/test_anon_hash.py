@@ -0,0 +1,36 @@
+'''
+Tests for the memoized anonymization hashes.
+'''
+import hashlib
+import unittest
+
+from json_to_relation.anon_hash import HashCache
+
+
+class TestAnonHash(unittest.TestCase):
+
+    def testSameHashAsUncached(self):
+        cache = HashCache()
+        oneHash = hashlib.new('ripemd160')
+        oneHash.update('jane.doe@example.com')
+        self.assertEqual(oneHash.hexdigest(), cache.getHash('jane.doe@example.com'))
+        self.assertEqual(oneHash.hexdigest(), cache.getHash('jane.doe@example.com'))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(0.5, cache.hitRate())
+
+    def testClearedWhenFull(self):
+        cache = HashCache(maxEntries=2)
+        cache.getHash('ann')
+        cache.getHash('bob')
+        cache.getHash('ann')
+        # No room for 'cat': the cache starts over with it:
+        cache.getHash('cat')
+        self.assertEqual(['cat'], cache.cache.keys())
+        self.assertEqual(HashCache.computeHash('bob'), cache.getHash('bob'))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(4, cache.misses)
+
+if __name__ == "__main__":
+    unittest.main()
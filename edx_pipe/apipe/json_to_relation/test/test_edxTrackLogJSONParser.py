@@ -245,7 +245,31 @@ class TestEdxTrackLogJSONParser(unittest.TestCase):
         row = []
         edxParser.processOneJSONObject(self.loginEvent, row)
         #print row
-        
+
+    @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
+    def testEventTypeDispatch(self):
+        fileConverter = JSONToRelation(self.stringSource,
+                                       OutputFile(os.devnull, OutputDisposition.OutputFormat.CSV),
+                                       mainTableName='Main'
+                                       )
+        edxParser = EdXTrackLogJSONParser(fileConverter, 'Main', replaceTables=True, dbName='Edx', useDisplayNameCache=True)
+        self.assertEqual((edxParser.handleSeqNav, True, True), edxParser.findEventTypeHandler('seq_goto'))
+        self.assertEqual((edxParser.handleVideoSeek, False, True), edxParser.findEventTypeHandler(u'seek_video'))
+        self.assertEqual((None, False, True), edxParser.findEventTypeHandler('/dashboard'))
+        # Exact matches take precedence over the '/' prefix:
+        self.assertEqual((edxParser.handleCreateAccount, False, False), edxParser.findEventTypeHandler('/create_account'))
+        self.assertEqual((edxParser.handlePathStyledEventTypes, False, False),
+                         edxParser.findEventTypeHandler('/courses/Medicine/HRP258/Statistics_in_Medicine/about'))
+        self.assertIsNone(edxParser.findEventTypeHandler('no_such_event'))
+        self.assertIsNone(edxParser.findEventTypeHandler({'name' : 'seq_goto'}))
+
+        # Longest registered prefix wins:
+        edxParser.registerEventTypePrefixHandler('edx.', edxParser.handleForumEvent, replacesRow=False)
+        edxParser.registerEventTypePrefixHandler('edx.forum.', edxParser.handleForumEvent, passEventType=True)
+        self.assertEqual((edxParser.handleForumEvent, True, True), edxParser.findEventTypeHandler('edx.forum.thread.created'))
+        self.assertEqual((edxParser.handleForumEvent, False, False), edxParser.findEventTypeHandler('edx.bookmark.added'))
+
+
     @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
     def testEdxHeartbeat(self):        
         # Test series of heartbeats that did not experience a server outage:
@@ -0,0 +1,65 @@
+'''
+Tests for streaming of (compressed) input files.
+'''
+import StringIO
+import gzip
+import os
+import tempfile
+import unittest
+
+from json_to_relation.input_source import BlockLineReader, InURI
+
+
+class TestInputSource(unittest.TestCase):
+
+    LINES = ['{"event_type": "play_video"}\n',
+             '\n',
+             '{"event_type": "seq_goto", "page": "x"}\n',
+             '{"event_type": "book"}']
+
+    def testBlockLineReaderSplitsAcrossBlocks(self):
+        # Blocks of 7 bytes cut through every line:
+        reader = BlockLineReader(StringIO.StringIO(''.join(TestInputSource.LINES)), blockSize=7)
+        self.assertEqual(TestInputSource.LINES, list(reader))
+        reader.close()
+
+    def testGzipFileStreamed(self):
+        (fd, gzPath) = tempfile.mkstemp(suffix='.json.gz')
+        os.close(fd)
+        try:
+            gzFd = gzip.open(gzPath, 'wb')
+            gzFd.write(''.join(TestInputSource.LINES))
+            gzFd.close()
+            with InURI(gzPath) as inFd:
+                self.assertEqual(TestInputSource.LINES, list(inFd))
+        finally:
+            os.remove(gzPath)
+
+    def testSkipToResumesAtLine(self):
+        (fd, jsonPath) = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        (fd, gzPath) = tempfile.mkstemp(suffix='.json.gz')
+        os.close(fd)
+        try:
+            with open(jsonPath, 'wb') as jsonFd:
+                jsonFd.write(''.join(TestInputSource.LINES))
+            gzFd = gzip.open(gzPath, 'wb')
+            gzFd.write(''.join(TestInputSource.LINES))
+            gzFd.close()
+            offset = len(TestInputSource.LINES[0]) + len(TestInputSource.LINES[1])
+            # Seeking for the plain file, skipping lines for the gzipped one:
+            for path in [jsonPath, gzPath]:
+                inURI = InURI(path)
+                inURI.skipTo(offset)
+                with inURI as inFd:
+                    self.assertEqual(TestInputSource.LINES[2:], list(inFd))
+                inURI = InURI(path)
+                # Offset within a line:
+                self.assertRaises(IOError, inURI.skipTo, offset + 1)
+                inURI.close()
+        finally:
+            os.remove(jsonPath)
+            os.remove(gzPath)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+'''
+Tests for the merging of the CSV files of tracking log shards.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from json2sql import mergeShardOutputs
+
+
+class TestJson2sql(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def writeShard(self, shardNum, tables):
+        shardOutFullPath = os.path.join(self.tmpDir, 'shard%03d_tracking.log.sql' % shardNum)
+        with open(shardOutFullPath, 'wb') as sqlFd:
+            sqlFd.write("LOAD DATA LOCAL INFILE '%s_EdxTrackEventTable.csv';\n" % shardOutFullPath)
+        for (tableName, lines) in tables.items():
+            with open('%s_%sTable.csv' % (shardOutFullPath, tableName), 'wb') as csvFd:
+                csvFd.write(''.join(lines))
+        return shardOutFullPath
+
+    def readTable(self, outFullPath, tableName):
+        with open('%s_%sTable.csv' % (outFullPath, tableName), 'rb') as csvFd:
+            return csvFd.read()
+
+    def testLoadInfoRowKeptOnce(self):
+        loadInfoLine = "'a1b2',2013-06-10 10:00:00,'file:///logs/tracking.log'\n"
+        shardOutFullPaths = [self.writeShard(0, {'EdxTrackEvent': ["'e1'\n", "'e2'\n"],
+                                                 'LoadInfo': [loadInfoLine]}),
+                             self.writeShard(1, {'EdxTrackEvent': ["'e3'\n"],
+                                                 'LoadInfo': [loadInfoLine]}),
+                             self.writeShard(2, {'LoadInfo': [loadInfoLine]})]
+        outFullPath = os.path.join(self.tmpDir, 'tracking.log.sql')
+        mergeShardOutputs(shardOutFullPaths, outFullPath, [], None)
+        self.assertEqual("'e1'\n'e2'\n'e3'\n", self.readTable(outFullPath, 'EdxTrackEvent'))
+        self.assertEqual(loadInfoLine, self.readTable(outFullPath, 'LoadInfo'))
+        with open(outFullPath, 'rb') as sqlFd:
+            self.assertEqual("LOAD DATA LOCAL INFILE '%s_EdxTrackEventTable.csv';\n" % outFullPath,
+                             sqlFd.read())
+
+if __name__ == "__main__":
+    unittest.main()
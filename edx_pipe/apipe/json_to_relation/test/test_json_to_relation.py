@@ -297,6 +297,54 @@ class TestJSONToRelation(unittest.TestCase):
         self.assertIsNone(self.fileConverter.currOutTable)
         self.assertIsNone(self.fileConverter.currInsertSig)
         self.assertEqual([], self.fileConverter.currValsArray)
+
+    @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
+    def testConstructCSVValues(self):
+        # Values as the CSV line gives them back, read directly:
+        self.assertEqual([['foo', '10', 'null', 'null', '0.5', 'a, b\nc']],
+                         self.fileConverter.constructCSVValues(['foo', 10, None, u'null', 0.5, u'a, b\nc']))
+        # ... or read back from the line:
+        for valsArray in [["it\\'s", 'x'], ['back\\\\slash'], [[1, 2], 'x'], [u'r\xe9sum\xe9']]:
+            try:
+                expected = self.fileConverter.readCSVLine(self.fileConverter.constructCSVLine(valsArray))
+            except UnicodeEncodeError:
+                self.assertRaises(UnicodeEncodeError, self.fileConverter.constructCSVValues, valsArray)
+                continue
+            self.assertEqual(expected, self.fileConverter.constructCSVValues(valsArray))
+        self.assertEqual([["it's", 'x']], self.fileConverter.constructCSVValues(["it\\'s", 'x']))
+
+    @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
+    def testDirectCSVLinesMatchInsertRoundTrip(self):
+        # CSV-only output writes each row's line directly. The lines must be
+        # those the INSERT statements, parsed back by OutputFile, gave before:
+        rows = [['foo', 10, None, 'null'],
+                ["it\\'s", 'say "hi", then', 0.5, -3],
+                ['back\\\\slash', 'trailing\\\\', 12345678901L, ''],
+                [u'plain unicode', 1.0e-7, None, 0]]
+        tmpDir = tempfile.mkdtemp()
+        try:
+            directOut = OutputFile(os.path.join(tmpDir, 'direct.sql'),
+                                   OutputDisposition.OutputFormat.CSV, options='wb')
+            roundTripOut = OutputFile(os.path.join(tmpDir, 'roundTrip.sql'),
+                                      OutputDisposition.OutputFormat.CSV, options='wb')
+            # Drop the rows held back by the parser's constructor:
+            self.fileConverter.prepareMySQLRow('FLUSH')
+            for valsArray in rows:
+                insertInfo = ('MyTable', 'col1,col2,col3,col4', valsArray)
+                self.fileConverter.processFinishedRow(insertInfo, directOut)
+                insertStatement = self.fileConverter.prepareMySQLRow(insertInfo)
+                if insertStatement is not None:
+                    roundTripOut.writerow(insertStatement)
+            roundTripOut.writerow(self.fileConverter.prepareMySQLRow('FLUSH'))
+            directOut.close()
+            roundTripOut.close()
+            with open(directOut.getCSVTableOutFileName('MyTable'), 'rb') as directFd:
+                directBytes = directFd.read()
+            with open(roundTripOut.getCSVTableOutFileName('MyTable'), 'rb') as roundTripFd:
+                self.assertEqual(roundTripFd.read(), directBytes)
+            self.assertEqual(len(rows), directBytes.count('\n'))
+        finally:
+            shutil.rmtree(tmpDir)
         
 #--------------------------------------------------------------------------------------------------    
     def assertFileContentEquals(self, expected, filePath):
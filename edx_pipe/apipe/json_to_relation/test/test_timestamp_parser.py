@@ -0,0 +1,52 @@
+'''
+Tests for the fixed-format timestamp parser.
+'''
+import datetime
+import unittest
+
+from json_to_relation.timestamp_parser import TimestampParser
+
+
+class TestTimestampParser(unittest.TestCase):
+
+    FORMATS = ['%Y-%m-%dT%H:%M:%S.%f',
+               '%Y-%m-%dT%H:%M:%S',
+               '%Y-%m-%d %H:%M:%S',
+               '%Y-%m-%d %H:%M:%S.%f %Z']
+
+    def testSameResultsAsStrptime(self):
+        parser = TimestampParser(TestTimestampParser.FORMATS)
+        for timeStr in ['2013-09-11T13:25:44.876729',
+                        '2013-09-11T13:25:44.8',
+                        '2013-04-15T12:59:10',
+                        '2013-04-16 02:35:54',
+                        # Only strptime() takes two blanks for one:
+                        '2013-04-16  02:35:54',
+                        # Only strptime() takes single digit fields:
+                        '2013-4-16 02:35:54',
+                        '2016-03-01 08:15:02.123 UTC',
+                        '2016-03-01 08:15:02.123 GMT']:
+            expected = None
+            for fmt in TestTimestampParser.FORMATS:
+                try:
+                    expected = datetime.datetime.strptime(timeStr, fmt)
+                    break
+                except ValueError:
+                    pass
+            self.assertEqual(expected, parser.parse(timeStr), timeStr)
+
+    def testRejectsWhatStrptimeRejects(self):
+        parser = TimestampParser(TestTimestampParser.FORMATS)
+        for timeStr in ['', '2013-13-16 02:35:54', '2013-02-29 02:35:54',
+                        '2013-04-16 02:35:54.1234567', '2013-04-16 02:35:54.', 'yesterday']:
+            self.assertRaises(ValueError, parser.parse, timeStr)
+
+    def testRemembersLastFormat(self):
+        parser = TimestampParser(TestTimestampParser.FORMATS)
+        parser.parse('2016-03-01 08:15:02.123 UTC')
+        self.assertEqual(3, parser.lastFormatIndex)
+        parser.parse('2016-03-01 08:15:03.5 UTC')
+        self.assertEqual(3, parser.lastFormatIndex)
+
+if __name__ == "__main__":
+    unittest.main()
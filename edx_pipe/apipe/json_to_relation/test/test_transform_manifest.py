@@ -0,0 +1,85 @@
+'''
+Tests for the manifest of translated tracking logs.
+'''
+import os
+import tempfile
+import unittest
+
+from json_to_relation.transform_manifest import TransformManifest
+
+
+class TestTransformManifest(unittest.TestCase):
+
+    def setUp(self):
+        (fd, self.manifestPath) = tempfile.mkstemp(suffix='.sql.manifest')
+        os.close(fd)
+        os.remove(self.manifestPath)
+
+    def tearDown(self):
+        for path in (self.manifestPath, self.manifestPath + '.pending'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def testAddedFilesSurviveReread(self):
+        manifest = TransformManifest(self.manifestPath)
+        self.assertEqual(0, len(manifest))
+        manifest.add('/logs/tracking.log-20130610.gz')
+        manifest.add('/logs/tracking.log-20130611.gz')
+        manifest = TransformManifest(self.manifestPath)
+        self.assertEqual(2, len(manifest))
+        self.assertIn('/logs/tracking.log-20130610.gz', manifest)
+        self.assertNotIn('/logs/tracking.log-20130612.gz', manifest)
+        # Relative paths are looked up by their absolute path:
+        manifest.add('tracking.log-20130612.gz')
+        self.assertIn(os.path.abspath('tracking.log-20130612.gz'), TransformManifest(self.manifestPath))
+
+    def testUnfinishedMergeRolledBack(self):
+        (fd, csvPath) = tempfile.mkstemp(suffix='_EdxTrackEventTable.csv')
+        os.write(fd, 'row1\n')
+        os.close(fd)
+        newCsvPath = csvPath + '.new'
+        try:
+            manifest = TransformManifest(self.manifestPath)
+            manifest.add('/logs/tracking.log-20130610.gz')
+            manifest.startMerge('/logs/tracking.log-20130611.gz', [csvPath, newCsvPath])
+            # The merge dies after appending some rows:
+            with open(csvPath, 'ab') as csvFd:
+                csvFd.write('row2\n')
+            with open(newCsvPath, 'wb') as csvFd:
+                csvFd.write('row3\n')
+            manifest = TransformManifest(self.manifestPath)
+            self.assertEqual('/logs/tracking.log-20130611.gz', manifest.rollBackMerge())
+            with open(csvPath, 'rb') as csvFd:
+                self.assertEqual('row1\n', csvFd.read())
+            self.assertFalse(os.path.exists(newCsvPath))
+            self.assertIsNone(manifest.rollBackMerge())
+        finally:
+            for path in (csvPath, newCsvPath):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def testFinishedMergeKept(self):
+        (fd, csvPath) = tempfile.mkstemp(suffix='_EdxTrackEventTable.csv')
+        os.write(fd, 'row1\n')
+        os.close(fd)
+        try:
+            manifest = TransformManifest(self.manifestPath)
+            manifest.startMerge('/logs/tracking.log-20130610.gz', [csvPath])
+            with open(csvPath, 'ab') as csvFd:
+                csvFd.write('row2\n')
+            manifest.add('/logs/tracking.log-20130610.gz')
+            self.assertIsNone(TransformManifest(self.manifestPath).rollBackMerge())
+            with open(csvPath, 'rb') as csvFd:
+                self.assertEqual('row1\nrow2\n', csvFd.read())
+        finally:
+            os.remove(csvPath)
+
+    def testClear(self):
+        manifest = TransformManifest(self.manifestPath)
+        manifest.add('/logs/tracking.log-20130610.gz')
+        manifest.clear()
+        self.assertFalse(os.path.exists(self.manifestPath))
+        self.assertNotIn('/logs/tracking.log-20130610.gz', TransformManifest(self.manifestPath))
+
+if __name__ == "__main__":
+    unittest.main()
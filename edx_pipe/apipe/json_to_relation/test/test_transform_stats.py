@@ -0,0 +1,70 @@
+'''
+Tests for the optional transform instrumentation.
+'''
+import json
+import os
+import tempfile
+import unittest
+
+from json_to_relation.transform_stats import TransformStats
+
+
+class TestTransformStats(unittest.TestCase):
+
+    def testCountsAndPercentile(self):
+        stats = TransformStats('file:///tmp/log.json')
+        stats.countLine('{"event_type": "play_video"}\n')
+        for _ in range(99):
+            stats.countEvent('play_video')
+            stats.addHandlerTime('play_video', 0.0001)
+        stats.countEvent('play_video')
+        stats.addHandlerTime('play_video', 0.5)
+        stats.countEvent('/heartbeat')
+
+        report = stats.getReport()
+        self.assertEqual(1, report['lines_read'])
+        self.assertEqual(29, report['bytes_read'])
+        self.assertEqual(['play_video', '/heartbeat'], report['event_types'].keys())
+        playVideo = report['event_types']['play_video']
+        self.assertEqual(100, playVideo['count'])
+        self.assertAlmostEqual(0.5099, playVideo['handler_seconds'])
+        self.assertEqual(0.5, playVideo['handler_max_seconds'])
+        # The 99th percentile is in the bucket of the fast calls,
+        # which is at most 19% wide:
+        self.assertTrue(0.0001 <= playVideo['handler_p99_seconds'] < 0.00012)
+        self.assertEqual(0, report['event_types']['/heartbeat']['handler_p99_seconds'])
+
+    def testMerge(self):
+        stats1 = TransformStats()
+        stats1.countEvent('seq_goto')
+        stats1.addHandlerTime('seq_goto', 0.001)
+        stats1.addJSONDecodeTime(1.0)
+        stats2 = TransformStats()
+        stats2.countEvent('seq_goto')
+        stats2.addHandlerTime('seq_goto', 0.003)
+        stats2.countEvent('book')
+        stats2.addJSONDecodeTime(2.0)
+        stats1.merge(stats2)
+
+        report = stats1.getReport()
+        self.assertEqual(3.0, report['json_decode_seconds'])
+        self.assertEqual(2, report['event_types']['seq_goto']['count'])
+        self.assertAlmostEqual(0.004, report['event_types']['seq_goto']['handler_seconds'])
+        self.assertEqual(0.003, report['event_types']['seq_goto']['handler_max_seconds'])
+        self.assertEqual(1, report['event_types']['book']['count'])
+
+    def testWriteReport(self):
+        stats = TransformStats()
+        stats.countEvent('book')
+        stats.finish()
+        (fd, reportPath) = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            stats.writeReport(reportPath)
+            with open(reportPath) as reportFd:
+                self.assertEqual(1, json.load(reportFd)['event_types']['book']['count'])
+        finally:
+            os.remove(reportPath)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -35,6 +35,17 @@ class IpToCountryTester(unittest.TestCase):
         twoLetThreeLetCountryTuple = lookup.lookupIP('107.203.248.200')
         self.assertTupleEqual(twoLetThreeLetCountryTuple, ('US','USA','United States'))
 
+    def testIpToCountryLookupMany(self):
+        lookup = IpToCountryTester.lookup
+        countries = lookup.lookupMany(['91.96.4.5', 'not.an.ip', '171.64.75.96', '91.96.4.5'])
+        self.assertEqual(countries, [('DE','DEU','Germany'),
+                                     None,
+                                     ('US','USA','United States'),
+                                     ('DE','DEU','Germany')])
+        # Lookups through the LRU give the same answer as uncached ones:
+        self.assertTupleEqual(lookup.lookupIP('91.96.4.5'), lookup.lookupIP('91.96.4.5'))
+        self.assertTupleEqual(lookup.lookupIP('91.96.4.5'), ('DE','DEU','Germany'))
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,221 @@
+'''
+Parsing of tracking log timestamps.
+
+datetime.strptime() interprets its format string anew on every
+call, which makes it one of the more expensive operations per
+event. Tracking log timestamps, however, come in only a handful
+of fixed layouts, such as '2013-09-11T13:25:44.876729'. A
+TimestampParser analyzes a list of strptime() formats once. It
+then parses those that consist only of fixed width numeric fields
+(%Y %m %d %H %M %S), an optional trailing fraction (%f), an
+optional trailing time zone name (%Z), and literal separators, by
+slicing the string at precomputed positions. Other formats, and
+strings that do not exactly fit the layout, are handed to
+strptime(), so results are the same as with strptime() alone.
+
+Logs rarely switch layout, so the format that succeeded last is
+tried first.
+
+The module only uses the standard library, so that both the
+JSON to relation transform and qpipe can use it.
+'''
+import datetime
+import time
+
+
+class TimestampParser(object):
+    '''
+    Parses timestamps against a list of strptime() formats.
+    '''
+
+    # Field directive --> (width, position in datetime constructor args):
+    FIXED_WIDTH_FIELDS = {'Y' : (4, 0),
+                          'm' : (2, 1),
+                          'd' : (2, 2),
+                          'H' : (2, 3),
+                          'M' : (2, 4),
+                          'S' : (2, 5)}
+
+    # Time zone names that strptime()'s %Z accepts independently
+    # of the local time zone. The result is naive either way:
+    FAST_TIME_ZONES = frozenset(['UTC', 'GMT'])
+
+    def __init__(self, formats):
+        '''
+        :param formats: strptime() formats to try, in order
+        :type formats: [String]
+        '''
+        self.formats = list(formats)
+        self.layouts = [TimestampParser.compileFormat(fmt) for fmt in self.formats]
+        # Index into self.formats of the format that parsed last:
+        self.lastFormatIndex = 0
+
+    def parse(self, timeStr):
+        '''
+        Return the datetime for the given timestamp string.
+
+        :param timeStr: timestamp
+        :type timeStr: String
+        :return: naive datetime
+        :rtype: datetime.datetime
+        :raise ValueError: if none of the formats matches
+        '''
+        lastFormatIndex = self.lastFormatIndex
+        try:
+            return self.parseWith(timeStr, lastFormatIndex)
+        except ValueError:
+            pass
+        for formatIndex in range(len(self.formats)):
+            if formatIndex == lastFormatIndex:
+                continue
+            try:
+                result = self.parseWith(timeStr, formatIndex)
+            except ValueError:
+                continue
+            self.lastFormatIndex = formatIndex
+            return result
+        raise ValueError("Timestamp '%s' matches none of the formats %s" % (timeStr, self.formats))
+
+    def parseWith(self, timeStr, formatIndex):
+        '''
+        Parse the timestamp with one format, on the fast
+        path if possible.
+
+        :raise ValueError: if the format does not match
+        '''
+        layout = self.layouts[formatIndex]
+        if layout is not None:
+            result = TimestampParser.parseLayout(timeStr, layout)
+            if result is not None:
+                return result
+        return datetime.datetime.strptime(timeStr, self.formats[formatIndex])
+
+    @classmethod
+    def parseLayout(cls, timeStr, layout):
+        '''
+        Fast path: parse by slicing at the positions computed
+        by compileFormat().
+
+        :return: the datetime, or None if timeStr does not
+                 exactly fit the layout
+        :rtype: {datetime.datetime | None}
+        :raise ValueError: if a field is out of range, e.g. month 13
+        '''
+        (length, fields, literals, fractionStart, hasTimeZone) = layout
+        if fractionStart is None and not hasTimeZone:
+            if len(timeStr) != length:
+                return None
+        elif len(timeStr) <= length:
+            return None
+        for (pos, literal) in literals:
+            if timeStr[pos] != literal:
+                return None
+        args = [1900, 1, 1, 0, 0, 0, 0]
+        for (start, end, argPos) in fields:
+            digits = timeStr[start:end]
+            if not digits.isdigit():
+                return None
+            args[argPos] = int(digits)
+        # The fraction and/or time zone name:
+        rest = timeStr[length:]
+        if hasTimeZone:
+            if fractionStart is None:
+                (rest, timeZone) = ('', rest)
+            else:
+                try:
+                    (rest, timeZone) = rest.rsplit(' ', 1)
+                except ValueError:
+                    return None
+            if timeZone not in TimestampParser.FAST_TIME_ZONES:
+                return None
+        if fractionStart is not None:
+            # Like strptime(), accept one to six digits:
+            if len(rest) > 6 or not rest.isdigit():
+                return None
+            args[6] = int(rest + '0' * (6 - len(rest)))
+        return datetime.datetime(*args)
+
+    @classmethod
+    def compileFormat(cls, fmt):
+        '''
+        Analyze a strptime() format. The layout is a tuple
+        (length, fields, literals, fractionStart, hasTimeZone):
+        the length of the string up to the fraction or time zone
+        name, a list of (start, end, argPos) slices of the numeric
+        fields, a list of (pos, char) literal separators, the start
+        of the %f digits or None, and whether the string ends in a
+        time zone name.
+
+        :param fmt: strptime() format
+        :type fmt: String
+        :return: layout, or None if the format can only be handled by strptime()
+        :rtype: {tuple | None}
+        '''
+        fields = []
+        literals = []
+        fractionStart = None
+        hasTimeZone = False
+        pos = 0
+        fmtPos = 0
+        while fmtPos < len(fmt):
+            if fractionStart is not None:
+                # Only ' %Z' may follow the fraction:
+                if fmt[fmtPos:] != ' %Z':
+                    return None
+                hasTimeZone = True
+                break
+            char = fmt[fmtPos]
+            if char != '%':
+                # Strings that strptime() would still accept, e.g. with
+                # more than one blank where the format has a blank,
+                # fail the exact comparison, and go to strptime():
+                literals.append((pos, char))
+                pos += 1
+                fmtPos += 1
+                continue
+            directive = fmt[fmtPos + 1:fmtPos + 2]
+            fmtPos += 2
+            if directive in TimestampParser.FIXED_WIDTH_FIELDS:
+                (width, argPos) = TimestampParser.FIXED_WIDTH_FIELDS[directive]
+                fields.append((pos, pos + width, argPos))
+                pos += width
+            elif directive == 'f':
+                fractionStart = pos
+            elif directive == 'Z' and fmtPos == len(fmt) and len(literals) > 0 and literals[-1] == (pos - 1, ' '):
+                hasTimeZone = True
+            else:
+                return None
+        if not fields:
+            return None
+        return (pos, fields, literals, fractionStart, hasTimeZone)
+
+if __name__ == '__main__':
+    # Benchmark against strptime() on synthetic timestamps of
+    # the layouts found in tracking logs:
+    import random
+    formats = ['%Y-%m-%dT%H:%M:%S.%f',
+               '%Y-%m-%dT%H:%M:%S',
+               '%Y-%m-%d %H:%M:%S',
+               '%Y-%m-%d %H:%M:%S.%f %Z']
+    numTimestamps = 200000
+    start = datetime.datetime(2013, 9, 1)
+    for fmt in formats:
+        timeStrs = [(start + datetime.timedelta(seconds=random.randint(0, 10000000),
+                                                microseconds=random.randint(1, 999999))).strftime(fmt.replace('%Z', 'UTC'))
+                    for _ in range(numTimestamps)]
+        startTime = time.time()
+        for timeStr in timeStrs:
+            for tryFmt in formats:
+                try:
+                    datetime.datetime.strptime(timeStr, tryFmt)
+                    break
+                except ValueError:
+                    pass
+        strptimeSecs = time.time() - startTime
+        parser = TimestampParser(formats)
+        startTime = time.time()
+        for timeStr in timeStrs:
+            parser.parse(timeStr)
+        parserSecs = time.time() - startTime
+        print('%-26s strptime: %6.3fs  TimestampParser: %6.3fs  (%.1fx)' %
+              (fmt, strptimeSecs, parserSecs, strptimeSecs / parserSecs))
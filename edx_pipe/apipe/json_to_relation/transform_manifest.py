@@ -0,0 +1,136 @@
+'''
+Record of the tracking log files whose translation has been merged
+into a set of intermediary tables.
+
+When json2sql translates a directory or glob of daily tracking logs,
+each file's rows are appended to the shared CSV files, and the file's
+absolute path is then appended to a manifest that lives next to the
+.sql file. A later run over the same directory skips the files that
+are listed, and only appends the rows of new files.
+
+Before a file's rows are appended, the sizes of the CSV files it will
+grow are recorded in <manifest>.pending. If the run dies before the
+file is added to the manifest, the next run truncates the CSV files
+back to those sizes before translating the file again.
+
+The module only uses the standard library, so that scripts such as
+manageEdxDb.py can use it.
+'''
+import os
+
+
+class TransformManifest(object):
+    '''
+    Set of absolute tracking log paths, backed by a file
+    with one path per line.
+    '''
+
+    def __init__(self, manifestPath):
+        '''
+        Read the manifest, if it exists.
+
+        :param manifestPath: path to the manifest file
+        :type manifestPath: String
+        '''
+        self.manifestPath = manifestPath
+        self.pendingPath = manifestPath + '.pending'
+        self.paths = set()
+        try:
+            with open(manifestPath, 'rb') as manifestFd:
+                for line in manifestFd:
+                    line = line.rstrip('\n')
+                    if len(line) > 0:
+                        self.paths.add(line)
+        except IOError:
+            # No manifest yet:
+            pass
+
+    def __contains__(self, logFilePath):
+        return os.path.abspath(logFilePath) in self.paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def startMerge(self, logFilePath, csvFilePaths):
+        '''
+        Record, before the given file's rows are appended, the
+        current size of each CSV file the merge will write to.
+        Files that do not exist yet are recorded as such. The
+        record replaces any earlier one atomically.
+
+        :param logFilePath: path to the tracking log about to be merged
+        :type logFilePath: String
+        :param csvFilePaths: paths of the CSV files the merge appends to
+        :type csvFilePaths: [String]
+        '''
+        tmpPendingPath = self.pendingPath + '.tmp'
+        with open(tmpPendingPath, 'wb') as pendingFd:
+            pendingFd.write(os.path.abspath(logFilePath) + '\n')
+            for csvFilePath in csvFilePaths:
+                csvFileSize = os.path.getsize(csvFilePath) if os.path.exists(csvFilePath) else -1
+                pendingFd.write('%d\t%s\n' % (csvFileSize, csvFilePath))
+            pendingFd.flush()
+            os.fsync(pendingFd.fileno())
+        os.rename(tmpPendingPath, self.pendingPath)
+
+    def rollBackMerge(self):
+        '''
+        Undo a merge that startMerge() recorded, but that was never
+        completed by add(): each CSV file is truncated to its recorded
+        size, and files the merge created are removed.
+
+        :return: path of the tracking log whose merge was undone, or None
+        :rtype: {String | None}
+        '''
+        try:
+            with open(self.pendingPath, 'rb') as pendingFd:
+                lines = [line.rstrip('\n') for line in pendingFd]
+        except IOError:
+            # No merge in progress:
+            return None
+        logFilePath = lines[0] if len(lines) > 0 else None
+        if logFilePath is not None and logFilePath not in self.paths:
+            for line in lines[1:]:
+                (csvFileSize, csvFilePath) = line.split('\t', 1)
+                csvFileSize = int(csvFileSize)
+                if not os.path.exists(csvFilePath):
+                    continue
+                if csvFileSize < 0:
+                    os.remove(csvFilePath)
+                else:
+                    with open(csvFilePath, 'r+b') as csvFd:
+                        csvFd.truncate(csvFileSize)
+        else:
+            # Crashed after add(), the merge is complete:
+            logFilePath = None
+        os.remove(self.pendingPath)
+        return logFilePath
+
+    def add(self, logFilePath):
+        '''
+        Record that the given file's rows have been merged. The
+        line is synced to disk before the record of startMerge()
+        is removed, so that a crash at any point leads either to
+        a roll back of the merge, or to no second merge.
+
+        :param logFilePath: path to a tracking log
+        :type logFilePath: String
+        '''
+        logFilePath = os.path.abspath(logFilePath)
+        with open(self.manifestPath, 'ab') as manifestFd:
+            manifestFd.write(logFilePath + '\n')
+            manifestFd.flush()
+            os.fsync(manifestFd.fileno())
+        self.paths.add(logFilePath)
+        if os.path.exists(self.pendingPath):
+            os.remove(self.pendingPath)
+
+    def clear(self):
+        '''
+        Forget all files, and remove the manifest file, along
+        with any record of an unfinished merge.
+        '''
+        self.paths = set()
+        for path in (self.manifestPath, self.pendingPath):
+            if os.path.exists(path):
+                os.remove(path)
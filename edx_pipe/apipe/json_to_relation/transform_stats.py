@@ -0,0 +1,222 @@
+'''
+Optional instrumentation of a JSON to relation transform.
+
+A TransformStats instance is attached to a JSONToRelation
+converter that was created with collectStats=True. The converter
+and its parser then record bytes read, time spent decoding JSON,
+time spent on the fields common to all events, and per event
+type the number of events and the time spent in the event
+type's handler. The hit rate of the anonymization hash cache
+is recorded as well. At the end of a run the numbers are
+written as a JSON report.
+
+When no TransformStats instance is attached, the only cost is
+a test for None in a few places per tracking log line.
+'''
+from collections import OrderedDict
+import json
+import math
+import time
+
+
+class TransformStats(object):
+    '''
+    Counters and timers for one transform, or for several
+    transforms merged together (see merge()).
+    '''
+
+    # Handler durations are kept in logarithmic buckets, so that
+    # memory stays constant however many events are seen. Bucket b
+    # holds durations below 2**(b/4) microseconds, i.e. the
+    # buckets are about 19% wide:
+    BUCKETS_PER_DOUBLING = 4
+
+    # Positions in the per-event-type lists:
+    COUNT_POS = 0
+    TOTAL_SECS_POS = 1
+    MAX_SECS_POS = 2
+    BUCKETS_POS = 3
+
+    def __init__(self, sourceName=None):
+        '''
+        :param sourceName: name of the JSON source, for the report
+        :type sourceName: String
+        '''
+        self.sourceName = sourceName
+        self.startTime = time.time()
+        self.wallSeconds = 0.0
+        self.linesRead = 0
+        self.bytesRead = 0
+        self.jsonDecodeSeconds = 0.0
+        self.commonFieldsSeconds = 0.0
+        self.anonHashHits = 0
+        self.anonHashMisses = 0
+        # Event type --> [count, totalHandlerSecs, maxHandlerSecs, {bucket : count}]:
+        self.eventTypes = {}
+
+    def countLine(self, line):
+        self.linesRead += 1
+        self.bytesRead += len(line)
+
+    def addJSONDecodeTime(self, seconds):
+        self.jsonDecodeSeconds += seconds
+
+    def addCommonFieldsTime(self, seconds):
+        self.commonFieldsSeconds += seconds
+
+    def addAnonHashCounts(self, hits, misses):
+        self.anonHashHits += hits
+        self.anonHashMisses += misses
+
+    def countEvent(self, eventType):
+        '''
+        Count one event of the given type, whether or not
+        a handler is called for it.
+
+        :param eventType: event_type of a tracking log entry
+        :type eventType: String
+        '''
+        try:
+            self.eventTypes[eventType][TransformStats.COUNT_POS] += 1
+        except KeyError:
+            self.eventTypes[eventType] = [1, 0.0, 0.0, {}]
+        except TypeError:
+            # Unhashable event type from malformed JSON:
+            self.countEvent(str(eventType))
+
+    def addHandlerTime(self, eventType, seconds):
+        '''
+        Record the time one call to the handler of the given
+        event type took. The event must have been counted
+        via countEvent() before.
+
+        :param eventType: event_type of a tracking log entry
+        :type eventType: String
+        :param seconds: duration of the handler call
+        :type seconds: float
+        '''
+        eventTypeStats = self.eventTypes[eventType]
+        eventTypeStats[TransformStats.TOTAL_SECS_POS] += seconds
+        if seconds > eventTypeStats[TransformStats.MAX_SECS_POS]:
+            eventTypeStats[TransformStats.MAX_SECS_POS] = seconds
+        bucket = TransformStats.bucketOf(seconds)
+        buckets = eventTypeStats[TransformStats.BUCKETS_POS]
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+
+    def finish(self):
+        '''
+        Note the end of the transform.
+        '''
+        self.wallSeconds = time.time() - self.startTime
+
+    def merge(self, otherStats):
+        '''
+        Add the numbers of another TransformStats instance to this one.
+        Used to combine the stats of transforms that ran in parallel.
+        Wall time is not merged; call finish() on the merged instance.
+
+        :param otherStats: stats to add to this instance
+        :type otherStats: TransformStats
+        '''
+        self.linesRead += otherStats.linesRead
+        self.bytesRead += otherStats.bytesRead
+        self.jsonDecodeSeconds += otherStats.jsonDecodeSeconds
+        self.commonFieldsSeconds += otherStats.commonFieldsSeconds
+        self.anonHashHits += otherStats.anonHashHits
+        self.anonHashMisses += otherStats.anonHashMisses
+        for (eventType, otherEventTypeStats) in otherStats.eventTypes.items():
+            eventTypeStats = self.eventTypes.get(eventType, None)
+            if eventTypeStats is None:
+                self.eventTypes[eventType] = [otherEventTypeStats[TransformStats.COUNT_POS],
+                                              otherEventTypeStats[TransformStats.TOTAL_SECS_POS],
+                                              otherEventTypeStats[TransformStats.MAX_SECS_POS],
+                                              dict(otherEventTypeStats[TransformStats.BUCKETS_POS])]
+                continue
+            eventTypeStats[TransformStats.COUNT_POS] += otherEventTypeStats[TransformStats.COUNT_POS]
+            eventTypeStats[TransformStats.TOTAL_SECS_POS] += otherEventTypeStats[TransformStats.TOTAL_SECS_POS]
+            eventTypeStats[TransformStats.MAX_SECS_POS] = max(eventTypeStats[TransformStats.MAX_SECS_POS],
+                                                              otherEventTypeStats[TransformStats.MAX_SECS_POS])
+            buckets = eventTypeStats[TransformStats.BUCKETS_POS]
+            for (bucket, count) in otherEventTypeStats[TransformStats.BUCKETS_POS].items():
+                buckets[bucket] = buckets.get(bucket, 0) + count
+
+    def getReport(self):
+        '''
+        Return the collected numbers as a dict that is ready for
+        JSON serialization. Event types are ordered by decreasing
+        cumulative handler time.
+
+        :return: report dict
+        :rtype: OrderedDict
+        '''
+        report = OrderedDict()
+        report['source'] = self.sourceName
+        report['wall_seconds'] = round(self.wallSeconds, 3)
+        report['lines_read'] = self.linesRead
+        report['bytes_read'] = self.bytesRead
+        report['json_decode_seconds'] = round(self.jsonDecodeSeconds, 3)
+        report['common_fields_seconds'] = round(self.commonFieldsSeconds, 3)
+        report['anon_hash_hits'] = self.anonHashHits
+        report['anon_hash_misses'] = self.anonHashMisses
+        anonHashLookups = self.anonHashHits + self.anonHashMisses
+        report['anon_hash_hit_rate'] = round(float(self.anonHashHits) / anonHashLookups, 4) if anonHashLookups > 0 else 0.0
+        eventTypesReport = OrderedDict()
+        for (eventType, eventTypeStats) in sorted(self.eventTypes.items(),
+                                                  key=lambda item: item[1][TransformStats.TOTAL_SECS_POS],
+                                                  reverse=True):
+            eventTypeReport = OrderedDict()
+            eventTypeReport['count'] = eventTypeStats[TransformStats.COUNT_POS]
+            eventTypeReport['handler_seconds'] = round(eventTypeStats[TransformStats.TOTAL_SECS_POS], 6)
+            eventTypeReport['handler_p99_seconds'] = round(self.percentile(eventTypeStats, 0.99), 6)
+            eventTypeReport['handler_max_seconds'] = round(eventTypeStats[TransformStats.MAX_SECS_POS], 6)
+            eventTypesReport[eventType] = eventTypeReport
+        report['event_types'] = eventTypesReport
+        return report
+
+    def writeReport(self, reportFilePath):
+        '''
+        Write the report returned by getReport() as JSON.
+
+        :param reportFilePath: file to (over)write
+        :type reportFilePath: String
+        '''
+        with open(reportFilePath, 'w') as fd:
+            json.dump(self.getReport(), fd, indent=2)
+            fd.write('\n')
+
+    def percentile(self, eventTypeStats, fraction):
+        '''
+        Estimate a percentile of the handler durations of one
+        event type from its buckets. The estimate is the upper
+        bound of the bucket in which the percentile falls, but
+        never more than the longest duration seen.
+
+        :param eventTypeStats: one value of self.eventTypes
+        :type eventTypeStats: [int, float, float, {int : int}]
+        :param fraction: percentile as fraction, e.g. 0.99
+        :type fraction: float
+        :return: duration in seconds; 0 if the handler never ran
+        :rtype: float
+        '''
+        buckets = eventTypeStats[TransformStats.BUCKETS_POS]
+        numTimed = sum(buckets.values())
+        if numTimed == 0:
+            return 0.0
+        countSoFar = 0
+        for bucket in sorted(buckets.keys()):
+            countSoFar += buckets[bucket]
+            if countSoFar >= fraction * numTimed:
+                return min(TransformStats.bucketUpperBound(bucket),
+                           eventTypeStats[TransformStats.MAX_SECS_POS])
+        return eventTypeStats[TransformStats.MAX_SECS_POS]
+
+    @classmethod
+    def bucketOf(cls, seconds):
+        micros = seconds * 1000000.0
+        if micros < 1.0:
+            return 0
+        return int(math.log(micros, 2) * cls.BUCKETS_PER_DOUBLING) + 1
+
+    @classmethod
+    def bucketUpperBound(cls, bucket):
+        return 2 ** (float(bucket) / cls.BUCKETS_PER_DOUBLING) / 1000000.0
@@ -16,7 +16,7 @@ source_dir = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "../json_
 source_dir.extend(sys.path)
 sys.path = source_dir
 
-from edxTrackLogJSONParser import EdXTrackLogJSONParser
+from anon_hash import makeHash
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -24,8 +24,8 @@ if __name__ == '__main__':
         sys.exit(1)
     if sys.argv[1] == '-':
         for screenName in sys.stdin:
-            print(EdXTrackLogJSONParser.makeHash(screenName))
+            print(makeHash(screenName))
     else:
         for screenName in sys.argv[1:]:
-            print(EdXTrackLogJSONParser.makeHash(screenName))
+            print(makeHash(screenName))
     
\ No newline at end of file
@@ -97,6 +97,7 @@ source_dir.extend(sys.path)
 sys.path = source_dir
 
 from pymysql_utils.pymysql_utils import MySQLDB
+from transform_manifest import TransformManifest
 
 # Error info only available after 
 # exceptions. Else undefined. Set
@@ -145,6 +146,7 @@ class TrackLogPuller(object):
     TRACKING_LOG_FILE_NAME_PATTERN = re.compile(r'tracking.log-[0-9]{8}[-0-9]*.gz$')
     
     SQL_FILE_NAME_PATTERN = re.compile(r'.sql$')
+    MANIFEST_FILE_NAME_PATTERN = re.compile(r'\.sql\.manifest$')
     FILE_DATE_PATTERN = re.compile(r'[^-]*-([0-9]*)[^.]*\.gz')
 
     
@@ -342,6 +344,15 @@ class TrackLogPuller(object):
             # Destination dir doesn't even exist: All tracking log files 
             # need to be transformed:
             return localTrackingLogFilePaths
+
+        # Log files that json2sql translated as part of a directory
+        # or wildcard pattern went into shared .csv files, and are
+        # listed in the .manifest file next to the shared .sql file:
+        for manifestFileName in filter(TrackLogPuller.MANIFEST_FILE_NAME_PATTERN.search, allTransformResultFiles):
+            manifest = TransformManifest(os.path.join(csvDestDir, manifestFileName))
+            localTrackingLogFilePaths = [logFilePath for logFilePath in localTrackingLogFilePaths
+                                         if logFilePath not in manifest]
+
         # Each transformed tracking log file has generated several .csv
         # files, but only one .sql file, so keep only the latter in
         # a list: 
@@ -10,6 +10,30 @@ import sys
 import time
 
 from apipe import json2sql
+from qpipe import qpipe
+from qpipe.extractor import StreamExtractor
+
+# Suffixes under which the tracking log may be found, uncompressed first
+LOG_FILE_SUFFIXES = ['', '.gz', '.bz2', '.zst']
+
+
+def find_log_file(cfg_data_file):
+    '''
+    Returns the path of the tracking log in the log data folder,
+    which may be compressed, or None if there is none. The log file
+    may also name a directory of, or a wildcard pattern for, daily
+    tracking logs, which is returned if it holds any.
+    '''
+    log_file_path = ''.join([cfg_data_file['log_data_dir'], cfg_data_file['log_file']])
+    if json2sql.isMultiFileInput(log_file_path):
+        if json2sql.expandInputPaths(log_file_path):
+            return log_file_path
+        return None
+    for suffix in LOG_FILE_SUFFIXES:
+        log_file_path = ''.join([cfg_data_file['log_data_dir'], cfg_data_file['log_file'], suffix])
+        if os.path.isfile(log_file_path):
+            return log_file_path
+    return None
 
 
 def run_folder_setup(cfg_csv_path, cfg_data_file):
@@ -40,45 +64,33 @@ def run_folder_setup(cfg_csv_path, cfg_data_file):
     course_dir = cfg_data_file['course_dir']
 
     # The only required file for translation is the tracking_log.json file
-    # Look for it or the gzip compressed version inside either the
+    # Look for it or a compressed version inside either the
     # course_dir or LOG_DATA_DIR. The end result should be a log file
-    # located at LOG_DATA_DIR/<log file>
+    # located at LOG_DATA_DIR/<log file>[.gz|.bz2|.zst]. Compressed logs
+    # are left compressed: apipe decompresses them as it reads them.
     found_log_file = False
 
-    # First look for an uncompressed one in course_dir
-    log_file_path = os.path.join(course_dir, cfg_data_file['log_file'])
-    if os.path.isfile(log_file_path):
-        cmd_queue.append(' '.join(['mv', log_file_path, cfg_data_file]))
-        found_log_file = True
-
-    # Try looking a compressed one in the course_dir
-    if not found_log_file:
-        log_file_path = os.path.join(course_dir, cfg_data_file['log_file'] + '.gz')
-        if os.path.isfile(log_file_path):
-            cmd_queue.append(' '.join(['gzip', '-d', log_file_path]))
-            log_file_path = log_file_path[:-3]
+    # First look for one in course_dir
+    for suffix in LOG_FILE_SUFFIXES:
+        log_file_path = os.path.join(course_dir, cfg_data_file['log_file'] + suffix)
+        # A directory of daily logs is moved as a whole
+        if os.path.isfile(log_file_path) or os.path.isdir(log_file_path):
             cmd_queue.append(' '.join(['mv', log_file_path, cfg_data_file['log_data_dir']]))
             found_log_file = True
+            break
 
-    # Try looking for an uncompressed one in the LOG_DATA_DIR
+    # Try looking for one in the LOG_DATA_DIR
     if not found_log_file:
-        log_file_path = os.path.join(cfg_data_file['log_data_dir'], cfg_data_file['log_file'])
-        if os.path.isfile(log_file_path):
-            found_log_file = True
-
-    # Try looking for a compressed one in the LOG_DATA_DIR
-    if not found_log_file:
-        log_file_path = os.path.join(cfg_data_file['log_data_dir'], cfg_data_file['log_file'] + '.gz')
-        if os.path.isfile(log_file_path):
-            cmd_queue.append(' '.join(['gzip', '-d', log_file_path]))
-            found_log_file = True
+        found_log_file = find_log_file(cfg_data_file) is not None
 
     # If we still haven't found it then exit with error
     if not found_log_file:
         print(
-            "Error: could not find required log file %s or %s.gz in directory %s or %s "
+            "Error: could not find required log file %s or %s in directory %s or %s "
             "in course directory or log data folder" %
-            (cfg_data_file['log_file'], cfg_data_file['log_file'], course_dir, cfg_data_file['log_data_dir']))
+            (cfg_data_file['log_file'],
+             ', '.join(cfg_data_file['log_file'] + suffix for suffix in LOG_FILE_SUFFIXES[1:]),
+             course_dir, cfg_data_file['log_data_dir']))
         sys.exit(1)
 
     # By now the log file will be located at LOG_DATA_DIR/<log file>
@@ -90,27 +102,41 @@ def run_folder_setup(cfg_csv_path, cfg_data_file):
         subprocess.call(cmd, shell=True)
 
 
-def run_apipe(cfg_csv_path, cfg_data_file):
+def run_apipe(cfg_csv_path, cfg_data_file, workers=1, resume=False):
     '''
     Searches for tracking log file post-environment setup and runs apipe on it.
+    With workers > 1 an uncompressed log is split into byte ranges that are
+    translated by that many processes in parallel. With resume, an interrupted
+    translation continues from its last checkpoint. If the log file is a
+    directory or wildcard pattern of daily logs, workers translate whole
+    files, and with resume only the logs missing from the intermediary
+    tables are translated and appended.
     '''
-    print("********  Clearing the intermediary_csv folder **********")
-    cmd = "rm -f %s/*" % cfg_csv_path['intermediary_csv_dir']
-    print("Executing cmd: %s\n" % cmd)
-    subprocess.call(cmd, shell=True)
+    if resume:
+        print("********  Keeping the intermediary_csv folder to resume **********")
+    else:
+        print("********  Clearing the intermediary_csv folder **********")
+        cmd = "rm -f %s/*" % cfg_csv_path['intermediary_csv_dir']
+        print("Executing cmd: %s\n" % cmd)
+        subprocess.call(cmd, shell=True)
 
     print("********  Translating from json to csv **********")
 
-    log_file_path = ''.join([cfg_data_file['log_data_dir'], cfg_data_file['log_file']])
-    if os.path.isfile(log_file_path):
+    log_file_path = find_log_file(cfg_data_file)
+    if log_file_path is not None:
         print("Successfully located the tracking log file at %s" %
               log_file_path)
     else:
-        print("Could not locate the tracking log file at %s" % log_file_path)
+        print("Could not locate the tracking log file at %s" %
+              ''.join([cfg_data_file['log_data_dir'], cfg_data_file['log_file']]))
         sys.exit(1)
 
     time_elapsed = time.time()
-    json2sql.convert(log_file_path, cfg_csv_path['intermediary_csv_dir'], 'csv')
+    # Name the output after the uncompressed log, which is what qpipe expects
+    json2sql.convert(log_file_path, cfg_csv_path['intermediary_csv_dir'], 'csv',
+                     workers=workers,
+                     outFileName=cfg_data_file['log_file'] + '.sql',
+                     resume=resume)
     time_elapsed = time.time() - time_elapsed
     mins, secs = divmod(time_elapsed, 60)
     hours, mins = divmod(mins, 60)
@@ -118,6 +144,56 @@ def run_apipe(cfg_csv_path, cfg_data_file):
           (hours, mins, secs))
 
 
+def run_fused_pipe(cfg_csv_path, cfg_data_file, cfg_csv_parsing, cfg_open_edx_spec,
+                   keep_intermediary=False, qpipe_options=None, apipe_workers=1):
+    '''
+    Runs apipe and the event processing of qpipe together: the rows apipe
+    translates the tracking log into are processed by qpipe as they come,
+    rather than written to the intermediary CSV files and read back. Those
+    files are only written with keep_intermediary, e.g. for debugging.
+    A directory or wildcard pattern of daily logs is translated and
+    processed one after the other instead, by apipe_workers processes.
+    qpipe_options are passed on to qpipe's process_events.
+    '''
+    qpipe_options = qpipe_options or {}
+    print("********  Clearing the intermediary_csv folder **********")
+    cmd = "rm -f %s/*" % cfg_csv_path['intermediary_csv_dir']
+    print("Executing cmd: %s\n" % cmd)
+    subprocess.call(cmd, shell=True)
+
+    log_file_path = find_log_file(cfg_data_file)
+    if log_file_path is None:
+        print("Could not locate the tracking log file at %s" %
+              ''.join([cfg_data_file['log_data_dir'], cfg_data_file['log_file']]))
+        sys.exit(1)
+    if json2sql.isMultiFileInput(log_file_path):
+        print("Daily tracking logs at %s are translated, then processed" % log_file_path)
+        run_apipe(cfg_csv_path, cfg_data_file, workers=apipe_workers)
+        qpipe.process_events(cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec,
+                             timestamp_format=cfg_csv_parsing['timestamp_format'],
+                             **qpipe_options)
+        return
+
+    print("********  Translating and processing %s **********" % log_file_path)
+    time_elapsed = time.time()
+    row_batches = json2sql.convertToRows(log_file_path, cfg_csv_path['intermediary_csv_dir'],
+                                         outFileName=cfg_data_file['log_file'] + '.sql',
+                                         keepCSV=keep_intermediary,
+                                         tableNames=StreamExtractor.TABLE_NAMES)
+    try:
+        qpipe.process_events(cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec,
+                             timestamp_format=cfg_csv_parsing['timestamp_format'],
+                             row_batches=row_batches, **qpipe_options)
+    finally:
+        # Stops the translation if processing failed
+        row_batches.close()
+    time_elapsed = time.time() - time_elapsed
+    mins, secs = divmod(time_elapsed, 60)
+    hours, mins = divmod(mins, 60)
+    print("json to moocdb csv translation complete: took %dh%02dm%02ds" %
+          (hours, mins, secs))
+
+
 def write_full_pipe_log(cfg_data_file):
     '''
     Write git commit hash, status, remotes, and diff into a log if inside a git repo.
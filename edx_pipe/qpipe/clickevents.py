@@ -23,28 +23,30 @@ class ClickEventsManager(object):
         one of the click event types.
         '''
 
-        if event['event_type'] not in self.CLICK_EVENT_TYPES:
+        data = event.data
+        if data.get('event_type') not in self.CLICK_EVENT_TYPES:
             return
 
         # The Click Event Table video_id is the event formatted video_id (see ModuleURI).
         # This needs to be grabbed from the raw_event data because the Event type converts
         # to a string before returning an accessed item.
         # The original video_id can be accessed as event['video_id']
+        # Other values are left for the CSV writer to stringify.
         try:
             click_event_row = {
-                'observed_event_id': event['_id'],
-                'course_id': event['course_display_name'],
-                'user_id': event['anon_screen_name'],
+                'observed_event_id': data.get('_id'),
+                'course_id': data.get('course_display_name'),
+                'user_id': data.get('anon_screen_name'),
                 'video_id': event.get_video_id()[cfg_open_edx_spec['video_id_spec']](),
-                'observed_event_timestamp': event['time'],
-                'observed_event_type': event['event_type'],
-                'url': event.data['page'].url,
+                'observed_event_timestamp': data.get('time'),
+                'observed_event_type': data.get('event_type'),
+                'url': data['page'].url,
                 'code': event.get_video_code(),
-                'video_current_time': event['video_current_time'],
-                'video_new_time': event['video_new_time'],
-                'video_old_time': event['video_old_time'],
-                'video_new_speed': event['video_new_speed'],
-                'video_old_speed': event['video_old_speed']
+                'video_current_time': data.get('video_current_time'),
+                'video_new_time': data.get('video_new_time'),
+                'video_old_time': data.get('video_old_time'),
+                'video_new_speed': data.get('video_new_speed'),
+                'video_old_speed': data.get('video_old_speed')
             }
             self.writer.store(click_event_row)
         except KeyError as err:
@@ -1,5 +1,4 @@
 import helperclasses
-import util
 import genformatting
 import specformatting
 import inheritloc
@@ -13,20 +12,29 @@ class EventFormatter(object):
     cleaning up input data from a raw event before
     using it to initialize an Event class.
     '''
+    # Number of distinct HTTP Agent headers whose os and agent
+    # ids are remembered before the cache is cleared
+    MAX_CACHED_AGENTS = 100000
 
-    def __init__(self, moocdb, TIMESTAMP_FORMAT):
-        self.engaged_users = helperclasses.EngagedUsers()
+    def __init__(self, moocdb, TIMESTAMP_FORMAT, idle_timeout=None):
+        self.engaged_users = helperclasses.EngagedUsers(idle_timeout)
 
         self.urls = helperclasses.DictionaryTable(moocdb, 'urls')
         self.agents = helperclasses.DictionaryTable(moocdb, 'agent')
         self.os = helperclasses.DictionaryTable(moocdb, 'os')
 
+        # HTTP Agent header -> (os id, agent id), see record_agent_os
+        self.agent_os_ids = {}
+        self.agent_cache_hits = 0
+        self.agent_cache_misses = 0
+
         self.pass_filter_regexes = ["sequential", "page_close"]
 
         genformatting.TIMESTAMP_FORMAT = TIMESTAMP_FORMAT
 
+        # The agent and os are parsed by record_agent_os
         self.general_formatting_functions = [
-            genformatting.set_agent_os, genformatting.format_url,
+            genformatting.format_url,
             genformatting.parse_timestamp, genformatting.parse_problem_id,
             genformatting.parse_video_id, genformatting.parse_question_location
         ]
@@ -62,12 +70,25 @@ class EventFormatter(object):
             ('.*', events.Event)
         ]
 
+        # The rules are compiled once, so later changes
+        # to the lists above have no effect.
+        self.pass_filter_table = helperclasses.RuleTable(
+            [(regex, True) for regex in self.pass_filter_regexes])
+        self.specific_formatting_table = helperclasses.RuleTable(
+            self.specific_formatting_rules)
+        self.inherit_location_table = helperclasses.RuleTable(
+            self.inherit_location_rules)
+        self.update_location_table = helperclasses.RuleTable(
+            self.update_location_rules)
+        self.instanciate_event_table = helperclasses.RuleTable(
+            self.instanciate_event_rules)
+
     def pass_filter(self, raw_event):
         '''
         Returns True if the event should be processed further
         '''
-        return not util.match_regex(self.pass_filter_regexes, "event_type",
-                                    raw_event)
+        return not self.pass_filter_table.lookup(str(raw_event['event_type']),
+                                                 False)
 
     def do_generic_formatting(self, raw_event):
         '''
@@ -82,9 +103,8 @@ class EventFormatter(object):
         raw event. Returns a function(raw_event) is a corresponding one is found.
         Otherwise returns None.
         '''
-        for (regex, func) in self.specific_formatting_rules:
-            if util.match_regex([regex], "event_type", raw_event):
-                return func
+        return self.specific_formatting_table.lookup(
+            str(raw_event['event_type']))
 
     def do_specific_formatting(self, raw_event):
         '''
@@ -100,9 +120,7 @@ class EventFormatter(object):
         raw event. Returns a function(raw_event) if a corresponding one is found.
         Otherwise returns None.
         '''
-        for (regex, func) in self.inherit_location_rules:
-            if util.match_regex([regex], "page", raw_event):
-                return func
+        return self.inherit_location_table.lookup(str(raw_event['page']))
 
     def inherit_location(self, raw_event):
         '''
@@ -129,9 +147,7 @@ class EventFormatter(object):
         raw event. Returns a function(raw_event) if a corresponding one is found.
         Otherwise returns None.
         '''
-        for (regex, func) in self.update_location_rules:
-            if util.match_regex([regex], "event_type", raw_event):
-                return func
+        return self.update_location_table.lookup(str(raw_event['event_type']))
 
     def update_location(self, raw_event):
         '''
@@ -154,9 +170,8 @@ class EventFormatter(object):
         raw event. Returns a function(raw_event) if a corresponding one is found.
         Otherwise returns None.
         '''
-        for (regex, func) in self.instanciate_event_rules:
-            if util.match_regex([regex], "event_type", raw_event):
-                return func
+        return self.instanciate_event_table.lookup(
+            str(raw_event['event_type']))
 
     def instanciate_event(self, raw_event):
         '''
@@ -172,8 +187,34 @@ class EventFormatter(object):
         Event metadata is not to be confused with the moocdb metadata
         '''
         raw_event['url_id'] = self.urls.insert(str(raw_event['page']))
-        raw_event['os'] = self.os.insert(raw_event['os'])
-        raw_event['agent'] = self.agents.insert(raw_event['agent'])
+        self.record_agent_os(raw_event)
+
+    def record_agent_os(self, raw_event):
+        '''
+        Sets the 'os' and 'agent' fields to the ids of the os and agent
+        parsed from the HTTP Agent header in the 'agent' field. The ids are
+        cached by header, so that a header met before is neither parsed
+        nor looked up in the tables again.
+        '''
+        agent_header = raw_event['agent']
+        try:
+            ids = self.agent_os_ids[agent_header]
+            self.agent_cache_hits += 1
+        except KeyError:
+            self.agent_cache_misses += 1
+            genformatting.set_agent_os(raw_event)
+            ids = (self.os.insert(raw_event['os']), self.agents.insert(raw_event['agent']))
+            if len(self.agent_os_ids) >= self.MAX_CACHED_AGENTS:
+                self.agent_os_ids.clear()
+            self.agent_os_ids[agent_header] = ids
+        (raw_event['os'], raw_event['agent']) = ids
+
+    def get_agent_cache_hit_rate(self):
+        '''
+        Returns the share of events whose os and agent ids were cached.
+        '''
+        lookups = self.agent_cache_hits + self.agent_cache_misses
+        return float(self.agent_cache_hits) / lookups if lookups else 0.0
 
     def polish(self, raw_event):
         '''
@@ -86,6 +86,39 @@ class EventFormatterTest(unittest.TestCase):
                 specformatting.format_url_change,
                 self.eventformatter.get_specific_formatting_func(raw_event))
 
+    def test_get_specific_formatting_func_rule_order(self):
+        '''Test that the first rule in the list wins, even when a later
+        rule matches earlier in the event type, and that repeated
+        (memoized) lookups give the same function.
+        '''
+        raw_event = {'event_type': '/courses/org/course/run/jump_to/i4x://org/course/seq_1'}
+        for _ in range(2):
+            self.assertEqual(
+                specformatting.format_seq,
+                self.eventformatter.get_specific_formatting_func(raw_event))
+        raw_event = {'event_type': 'page_close'}
+        self.assertEqual(
+            None, self.eventformatter.get_specific_formatting_func(raw_event))
+
+    def test_record_agent_os(self):
+        '''Test that the os and agent ids of a known HTTP Agent header
+        come from the cache, and are those of the parsed names.
+        '''
+        chrome = ('Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.22 '
+                  '(KHTML, like Gecko) Chrome/25.0.1364.97 Safari/537.22')
+        firefox = 'Mozilla/5.0 (Windows NT 6.1; rv:20.0) Gecko/20100101 Firefox/20.0'
+        ids = []
+        for agent in [chrome, firefox, chrome]:
+            raw_event = {'agent': agent}
+            self.eventformatter.record_agent_os(raw_event)
+            ids.append((raw_event['os'], raw_event['agent']))
+        self.assertEqual([(0, 0), (0, 1), (0, 0)], ids)
+        self.assertEqual(['Windows 7'], self.eventformatter.os.item_list)
+        self.assertEqual(['Chrome 25.0.1364.97', 'Firefox 20.0'],
+                         self.eventformatter.agents.item_list)
+        self.assertEqual((1, 2), (self.eventformatter.agent_cache_hits,
+                                  self.eventformatter.agent_cache_misses))
+
     '''
     inherit_location is partially a wrapper for methods in inheritloc.py which has its own
     test harness. However, testing that the correct inherit location function is delegated
@@ -8,7 +8,20 @@ from the user's most recent previous event.
 
 Some event types are explicitly intended to be
 ignored for this duration computation.
+
+Only the fields of its observed_events row are kept
+of a staged event (see Event.get_observed_event).
+
+With an idle_timeout in minutes, the events staged for users idle
+for that long in event time are stored with the default duration,
+rather than kept until the users' next events. Once idle for a minute
+more than MAX_DURATION_MINUTES, the next event would give them that
+duration anyway. A shorter idle_timeout would replace real durations,
+so the idle_timeout must exceed MAX_DURATION_MINUTES.
 '''
+import datetime
+
+from events import DEFAULT_DURATION_MINUTES, MAX_DURATION_MINUTES
 
 
 class EventManager(object):
@@ -20,10 +33,15 @@ class EventManager(object):
         'problem_reset', 'save_problem_fail'
     ]
 
-    def __init__(self, moocdb=None):
+    def __init__(self, moocdb=None, idle_timeout=None):
         self.staged_events = {}
         if moocdb:
             self.observed_events = moocdb.csv_writers['observed_events']
+        if idle_timeout and idle_timeout <= MAX_DURATION_MINUTES:
+            raise ValueError('idle_timeout must exceed %d minutes, got %s' %
+                             (MAX_DURATION_MINUTES, idle_timeout))
+        self.idle_timeout = datetime.timedelta(minutes=idle_timeout) if idle_timeout else None
+        self.next_eviction_time = None
 
     def stage_event(self, event):
         user = event['anon_screen_name']
@@ -33,22 +51,43 @@ class EventManager(object):
         if event.data.get('event_type', None) in self.IGNORE:
             return None
 
-        if user in self.staged_events.keys():
-            ending_event = self.staged_events[user]
+        ending_event = self.staged_events.get(user, None)
+
+        # Stage new event
+        self.staged_events[user] = event.get_observed_event()
+        if self.idle_timeout:
+            self.evict_idle_users(event.data['time'])
+
+        if ending_event:
             end_time = event.data['time']
 
             # Compute event duration
             ending_event.set_duration(end_time)
 
-            # Stage new event
-            self.staged_events[user] = event
-
             # Return ending event, ready for insertion
             return ending_event
         else:
-            self.staged_events[user] = event
             return None
 
+    def evict_idle_users(self, time):
+        '''
+        Stores the events staged for users idle for more than idle_timeout
+        at time, with the default duration, and unstages them. The users
+        are looked at once per idle_timeout of event time.
+        '''
+        if self.next_eviction_time is None:
+            self.next_eviction_time = time + self.idle_timeout
+        if time < self.next_eviction_time:
+            return
+        self.next_eviction_time = time + self.idle_timeout
+        last_time = time - self.idle_timeout
+        idle_users = [user for (user, event) in self.staged_events.iteritems()
+                      if event.data['time'] < last_time]
+        for user in idle_users:
+            event = self.staged_events.pop(user)
+            event.duration = DEFAULT_DURATION_MINUTES
+            self.observed_events.store(event.get_observed_event_row())
+
     def store_event(self, event):
         event_to_store = self.stage_event(event)
 
@@ -2,10 +2,11 @@
 '''Tester for EventManager classes
 '''
 
+import datetime
 import unittest
 
 import eventmanager
-from events import Event
+from events import Event, DEFAULT_DURATION_MINUTES, MAX_DURATION_MINUTES
 import genformatting
 
 
@@ -70,6 +71,40 @@ class EventManagerTest(unittest.TestCase):
                     expected_answers[ending_event['_id']]['duration'],
                     str(ending_event.duration))
 
+    def test_evict_idle_users(self):
+        '''Events staged for users idle for more than idle_timeout
+        are stored with the default duration, once per idle_timeout.
+        '''
+        class Writer(object):
+            def __init__(self):
+                self.rows = []
+
+            def store(self, row):
+                self.rows.append(row)
+
+        manager = eventmanager.EventManager(idle_timeout=90)
+        manager.observed_events = Writer()
+        for (_id, user, minute) in [('1', 'A', 0), ('2', 'B', 0), ('3', 'B', 60),
+                                    ('4', 'B', 100), ('5', 'B', 200)]:
+            event = Event({'_id': _id, 'anon_screen_name': user,
+                           'time': datetime.datetime(2013, 11, 10) +
+                                   datetime.timedelta(minutes=minute)})
+            manager.stage_event(event)
+            if _id == '3':
+                self.assertEqual([], manager.observed_events.rows)
+
+        self.assertEqual([('1', DEFAULT_DURATION_MINUTES)],
+                         [(row['observed_event_id'], row['observed_event_duration'])
+                          for row in manager.observed_events.rows])
+        self.assertEqual(['B'], manager.staged_events.keys())
+
+    def test_idle_timeout_exceeds_max_duration(self):
+        '''An idle_timeout that would cut real durations is refused.
+        '''
+        self.assertRaises(ValueError, eventmanager.EventManager,
+                          idle_timeout=MAX_DURATION_MINUTES)
+        eventmanager.EventManager(idle_timeout=MAX_DURATION_MINUTES + 1)
+
 
 if __name__ == '__main__':
     SUITE = unittest.TestLoader().loadTestsFromTestCase(EventManagerTest)
@@ -0,0 +1,80 @@
+'''
+The chain of managers that each event of the EdxTrackEvent table
+goes through, from its raw CSV row to its rows in the MOOCdb tables.
+'''
+from clickevents import ClickEventsManager
+from eventformatter import EventFormatter
+from resources import ResourceManager
+from eventmanager import EventManager
+from submissions import SubmissionManager
+from helperclasses import CurationHelper
+from profiler import StageProfiler
+
+
+class EventPipe(object):
+    # (manager, method, stage) of the stages timed when profiling,
+    # the steps of polish included
+    PROFILED_STAGES = [
+        ('event_formatter', 'pass_filter', 'pass_filter'),
+        ('event_formatter', 'polish', 'polish'),
+        ('event_formatter', 'do_generic_formatting', 'polish.generic_formatting'),
+        ('event_formatter', 'do_specific_formatting', 'polish.specific_formatting'),
+        ('event_formatter', 'inherit_location', 'polish.inherit_location'),
+        ('event_formatter', 'update_location', 'polish.update_location'),
+        ('event_formatter', 'record_event_metadata', 'polish.record_event_metadata'),
+        ('event_formatter', 'instanciate_event', 'polish.instanciate_event'),
+        ('resource_manager', 'create_resource', 'create_resource'),
+        ('submission_manager', 'update_submission_tables', 'update_submission_tables'),
+        ('curation_helper', 'record_curation_hints', 'record_curation_hints'),
+        ('clickevents_manager', 'record', 'clickevents_record'),
+        ('event_manager', 'store_event', 'store_event')
+    ]
+
+    def __init__(self, moocdb, moocdb_csv_dir, cfg_open_edx_spec, timestamp_format,
+                 idle_timeout=None, profile=False):
+        self.cfg_open_edx_spec = cfg_open_edx_spec
+
+        # Instanciating the piping architecture. The per user state of
+        # users idle for idle_timeout minutes, if given, is dropped.
+        self.event_formatter = EventFormatter(moocdb, TIMESTAMP_FORMAT=timestamp_format,
+                                              idle_timeout=idle_timeout)
+        self.resource_manager = ResourceManager(moocdb, HIERARCHY_ROOT='https://')
+        self.event_manager = EventManager(moocdb, idle_timeout=idle_timeout)
+        self.submission_manager = SubmissionManager(moocdb)
+        self.curation_helper = CurationHelper(moocdb_csv_dir)
+        self.clickevents_manager = ClickEventsManager(moocdb)
+
+        # With profile, the time spent in each stage is accumulated
+        # (see profiler.py)
+        self.profiler = None
+        if profile:
+            self.profiler = StageProfiler()
+            for (manager, method_name, stage) in self.PROFILED_STAGES:
+                self.profiler.instrument(getattr(self, manager), method_name, stage)
+
+    def process(self, raw_event):
+        '''
+        Runs a raw event through the managers. Returns the polished
+        event, or None if the event is not handled by qpipe.
+        '''
+        # Skip events explicitly not handled by qpipe
+        if self.event_formatter.pass_filter(raw_event) is False:
+            return None
+
+        event = self.event_formatter.polish(raw_event)
+
+        resource_id = self.resource_manager.create_resource(event)
+
+        event.set_data_attr('resource_id', resource_id)
+        self.submission_manager.update_submission_tables(event)
+        self.curation_helper.record_curation_hints(event)
+        self.clickevents_manager.record(event, self.cfg_open_edx_spec)
+        self.event_manager.store_event(event)
+        return event
+
+    def serialize(self, resource_hierarchy_path, problem_hierarchy_path):
+        self.event_formatter.serialize()
+        self.event_manager.serialize()
+        self.resource_manager.serialize(pretty_print_to=resource_hierarchy_path)
+        self.submission_manager.serialize(pretty_print_to=problem_hierarchy_path)
+        self.curation_helper.serialize()
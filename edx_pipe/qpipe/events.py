@@ -10,6 +10,13 @@ class Event(object):
     '''
     Base event class which covers all the common event properties.
     '''
+    # Events hold no __dict__; subclasses declare their own __slots__
+    __slots__ = ('data', 'duration', 'validity')
+
+    # The fields making up the observed_events row of an event,
+    # all that is kept of it once staged (see get_observed_event)
+    OBSERVED_EVENT_FIELDS = ('_id', 'anon_screen_name', 'resource_id', 'time',
+                             'ip', 'os', 'agent', 'event_type')
 
     def __init__(self, polished_event):
         self.data = polished_event
@@ -35,20 +42,36 @@ class Event(object):
 
         Note that observed_event_id is *not* a unique identifier, since
         a user interaction may yield several rows in the intermediary DB.
+
+        Values are left for the CSV writer to stringify, as str() would.
         '''
+        data = self.data
         return {
-            'observed_event_id': self['_id'],
-            'user_id': self['anon_screen_name'],
-            'url_id': self['resource_id'],
-            'observed_event_timestamp': self['time'],
+            'observed_event_id': data.get('_id'),
+            'user_id': data.get('anon_screen_name'),
+            'url_id': data.get('resource_id'),
+            'observed_event_timestamp': data.get('time'),
             'observed_event_duration': self.duration,
-            'observed_event_ip': self['ip'],
-            'observed_event_os': self['os'],
-            'observed_event_agent': self['agent'],
-            'observed_event_type': self['event_type'],
+            'observed_event_ip': data.get('ip'),
+            'observed_event_os': data.get('os'),
+            'observed_event_agent': data.get('agent'),
+            'observed_event_type': data.get('event_type'),
             'validity': self.validity
         }
 
+    def get_observed_event(self):
+        '''
+        Returns an Event holding only the fields of this event's
+        observed_events row, with the same duration and validity:
+        a fraction of its size, to stage in its place.
+        '''
+        data = self.data
+        observed_event = Event(dict((key, data[key]) for key in self.OBSERVED_EVENT_FIELDS
+                                    if key in data))
+        observed_event.duration = self.duration
+        observed_event.validity = self.validity
+        return observed_event
+
     def __getitem__(self, key):
         '''
         Stringifies value for any found (key, value) pairs before
@@ -123,6 +146,7 @@ class VideoInteraction(Event):
     video_hide_cc_menu
     video_show_cc_menu
     '''
+    __slots__ = ()
 
     def __init__(self, polished_event):
         super(VideoInteraction, self).__init__(polished_event)
@@ -170,14 +194,15 @@ class PdfInteraction(Event):
     Instanciated from the following raw event types:
       - book
     '''
+    __slots__ = ()
 
     def __init__(self, polished_event):
         super(PdfInteraction, self).__init__(polished_event)
         self.set_page(self['goto_dest'])
 
     def set_page(self, page):
-        url = self.data['page']
-        url.set_page(page)
+        # The URL may be shared with other events, so it is copied
+        self.data['page'] = self.data['page'].with_page(page)
 
     def get_page(self):
         url = self.data['page']
@@ -220,6 +245,7 @@ class ProblemInteraction(Event):
     [edXdocs] : edx.readthedocs.org/projects/devdata/en/latest/
                 internal_data_formats/tracking_logs.html
     '''
+    __slots__ = ()
 
     # Different codes for the submission status
     # 0 : Answer is saved
@@ -276,7 +302,7 @@ class ProblemInteraction(Event):
         Deduce from the event_type wether an answer is being
         submitted or just saved.
         '''
-        return self.IS_SUBMITTED.get(self['event_type'], -1)
+        return self.IS_SUBMITTED.get(self.data.get('event_type'), -1)
 
     def get_submission_row(self):
         '''
@@ -295,17 +321,19 @@ class ProblemInteraction(Event):
         if n_attempts < 0 or is_submitted < 1:
             self.validity = 0
 
+        # Values are left for the CSV writer to stringify
+        data = self.data
         return {
-            'submission_id': self['_id'],
-            'user_id': self['anon_screen_name'],
-            'problem_id': self['problem_id'],
-            'submission_timestamp': self['time'],
-            'submission_attempt_number': self['attempts'],
-            'submission_ip': self['ip'],
-            'submission_os': self['os'],
-            'submission_agent': self['agent'],
-            'submission_answer': self['answer'],
-            'submission_is_submitted': self.get_is_submitted(),
+            'submission_id': data.get('_id'),
+            'user_id': data.get('anon_screen_name'),
+            'problem_id': data.get('problem_id'),
+            'submission_timestamp': data.get('time'),
+            'submission_attempt_number': data.get('attempts'),
+            'submission_ip': data.get('ip'),
+            'submission_os': data.get('os'),
+            'submission_agent': data.get('agent'),
+            'submission_answer': data.get('answer'),
+            'submission_is_submitted': is_submitted,
             'validity': self.validity
         }
 
@@ -319,12 +347,13 @@ class ProblemInteraction(Event):
         the grade is usually binary : either 'correct' or 'incorrect'
         ('incomplete' is treated as separate from 'incorrect')
         '''
+        data = self.data
         return {
             'assessment_grader_id': 'automatic',
-            'assessment_timestamp': self['time'],
+            'assessment_timestamp': data.get('time'),
             'assessment_grade': self.get_success(),
-            'submission_id': self['_id'],
-            'assessment_id': self['_id']
+            'submission_id': data.get('_id'),
+            'assessment_id': data.get('_id')
         }
 
 
@@ -345,6 +374,7 @@ class OpenResponseAssessment(Event):
     - staff_grading_<action> (Browser)
     - i4x_peergrading_<action> (Server)
     '''
+    __slots__ = ()
 
     def __init__(self, raw_event):
         super(OpenResponseAssessment, self).__init__(raw_event)
@@ -372,6 +402,7 @@ class Navigational(Event):
     - seq_prev
     - seq_next
     '''
+    __slots__ = ('sequence_id', 'goto_dest', 'goto_from')
 
     def __init__(self, raw_event):
         super(Navigational, self).__init__(raw_event)
@@ -42,6 +42,25 @@ class EventTest(unittest.TestCase):
         }
         self.assertEqual(observed_event_row, event.get_observed_event_row())
 
+    def test_get_observed_event(self):
+        '''The observed event keeps only what the observed events row
+        is made of, and gives the same row.
+        '''
+        event = events.ProblemInteraction({
+            '_id': 'a',
+            'anon_screen_name': 'b',
+            'time': '2013-08-13 19:47:47.451372',
+            'event_type': 'problem_check',
+            'answer': 'd'
+        })
+        event.validity = 0
+        observed_event = event.get_observed_event()
+        self.assertEqual(event.get_observed_event_row(),
+                         observed_event.get_observed_event_row())
+        self.assertEqual(['_id', 'anon_screen_name', 'event_type', 'time'],
+                         sorted(observed_event.data))
+        self.assertFalse(hasattr(observed_event, '__dict__'))
+
     def test_set_data_attr(self):
         '''Simple coverage test to check the field setter method works correctly.
         The setter function should ignore any false types.
@@ -288,7 +307,7 @@ class ProblemInteractionTest(unittest.TestCase):
             'submission_id': 'a',
             'user_id': 'b',
             'problem_id': 'c',
-            'submission_timestamp': '2013-08-13 19:47:47.451372',
+            'submission_timestamp': datetime.datetime(2013, 8, 13, 19, 47, 47, 451372),
             'submission_attempt_number': '3',
             'submission_ip': 'USA',
             'submission_os': 'TempleOS',
@@ -320,7 +339,7 @@ class ProblemInteractionTest(unittest.TestCase):
             'submission_id': 'a',
             'user_id': 'b',
             'problem_id': 'c',
-            'submission_timestamp': '2013-08-13 19:47:47.451372',
+            'submission_timestamp': datetime.datetime(2013, 8, 13, 19, 47, 47, 451372),
             'submission_attempt_number': '',
             'submission_ip': 'USA',
             'submission_os': 'TempleOS',
@@ -346,7 +365,7 @@ class ProblemInteractionTest(unittest.TestCase):
         event = events.ProblemInteraction(raw_event)
         assessment_row = {
             'assessment_grader_id': 'automatic',
-            'assessment_timestamp': '2013-08-13 19:47:47.451372',
+            'assessment_timestamp': datetime.datetime(2013, 8, 13, 19, 47, 47, 451372),
             'assessment_grade': 1,
             'submission_id': 'a',
             'assessment_id': 'a'
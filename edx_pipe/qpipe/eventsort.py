@@ -0,0 +1,180 @@
+'''
+External merge sort of the EdxTrackEvent table, for logs whose events are
+not in time order, such as logs of several files or servers concatenated.
+
+The rows are read in runs of RUN_BYTES, each sorted and written to a file of
+its own by a pool of workers, while the next run is read. The runs are then
+merged, MERGE_FAN_IN at a time. Memory thus holds a few runs at most, however
+large the table. Rows are copied as they are, and rows with equal keys keep
+their order in the table.
+'''
+from __future__ import print_function
+
+import heapq
+from itertools import count
+import marshal
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import extractor
+
+# Bytes of rows sorted in memory at once
+RUN_BYTES = 1 << 25
+
+# Runs merged at once
+MERGE_FAN_IN = 64
+
+# The fields the rows are sorted by, for each sort order
+SORT_KEYS = {
+    'time': ('time',),
+    'user': ('anon_screen_name', 'time')
+}
+
+
+def get_time_key(timestamp):
+    '''
+    Returns a timestamp as a string sorting in time order, whichever
+    of the timestamp formats it is in: the offset is removed, as when
+    parsing it (see genformatting.parse_timestamp), and the date and
+    time are separated by a space.
+    '''
+    offset_start = timestamp.find('+')
+    if offset_start >= 0:
+        timestamp = timestamp[:offset_start]
+    return timestamp.replace('T', ' ', 1)
+
+
+def get_key_function(sort_by):
+    '''
+    Returns a function giving the sort key of a row of the
+    EdxTrackEvent table, sorting by the fields in SORT_KEYS[sort_by].
+    '''
+    fields = [extractor.CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES.index(name)
+              for name in SORT_KEYS[sort_by]]
+    time_field = extractor.CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES.index('time')
+
+    def get_key(row):
+        key = []
+        for field in fields:
+            value = row[field] if len(row) > field else ''
+            if field == time_field:
+                value = get_time_key(value)
+            key.append(value)
+        return tuple(key)
+    return get_key
+
+
+def write_run(spec):
+    '''
+    Sorts the (key, position, text) records of a run and writes
+    them to the run's path. Returns the path.
+    '''
+    (path, records) = spec
+    records.sort()
+    with open(path, 'wb') as run_file:
+        for record in records:
+            marshal.dump(record, run_file)
+    return path
+
+
+def read_run(path):
+    '''
+    Yields the records of a run written by write_run.
+    '''
+    with open(path, 'rb') as run_file:
+        while True:
+            try:
+                yield marshal.load(run_file)
+            except EOFError:
+                return
+
+
+def merge_runs(paths, output):
+    '''
+    Merges the runs into output, a function called with each record.
+    '''
+    for record in heapq.merge(*[read_run(path) for path in paths]):
+        output(record)
+
+
+def sort_events(events_path, cfg_csv_parsing, sorted_path, sort_by='time', workers=1,
+                run_bytes=RUN_BYTES, progress=None):
+    '''
+    Writes the rows of the EdxTrackEvent table at events_path to sorted_path,
+    sorted by time, or by user then time if sort_by is 'user'. Runs are sorted
+    by workers processes. progress, if given, is the ProgressReporter to update
+    as rows are read. Returns the number of rows.
+    '''
+    csv_format = {
+        'delimiter': ',',
+        'quotechar': cfg_csv_parsing['quotechar'],
+        'escapechar': cfg_csv_parsing['escapechar']
+    }
+    get_key = get_key_function(sort_by)
+    run_dir = tempfile.mkdtemp(prefix='runs_', dir=os.path.dirname(os.path.abspath(sorted_path)))
+    run_numbers = count()
+    pool = multiprocessing.Pool(processes=workers) if workers > 1 else None
+    try:
+        run_paths = []
+        # Runs being sorted by the pool, at most one per worker
+        pending = []
+
+        def get_run_path():
+            return os.path.join(run_dir, 'run_%d' % next(run_numbers))
+
+        def add_run(records):
+            spec = (get_run_path(), records)
+            if pool is None:
+                run_paths.append(write_run(spec))
+                return
+            if len(pending) >= workers:
+                run_paths.append(pending.pop(0).get())
+            pending.append(pool.apply_async(write_run, (spec,)))
+
+        records = []
+        records_size = 0
+        position = 0
+        with open(events_path, 'rb') as events:
+            for (offset, text, row) in extractor.read_records(events, csv_format):
+                if not text.endswith('\n'):
+                    text += '\n'
+                records.append((get_key(row), position, text))
+                records_size += len(text)
+                position += 1
+                if records_size >= run_bytes:
+                    add_run(records)
+                    records = []
+                    records_size = 0
+                if progress:
+                    progress.update(position, offset)
+        if records:
+            add_run(records)
+        run_paths.extend(result.get() for result in pending)
+        if pool is not None:
+            pool.close()
+        if progress:
+            progress.finish(position)
+
+        # Merge the runs MERGE_FAN_IN at a time, until few enough are left
+        while len(run_paths) > MERGE_FAN_IN:
+            merged_path = get_run_path()
+            with open(merged_path, 'wb') as merged_file:
+                merge_runs(run_paths[:MERGE_FAN_IN],
+                           lambda record: marshal.dump(record, merged_file))
+            for path in run_paths[:MERGE_FAN_IN]:
+                os.remove(path)
+            run_paths = run_paths[MERGE_FAN_IN:] + [merged_path]
+
+        with open(sorted_path, 'wb') as sorted_file:
+            merge_runs(run_paths, lambda record: sorted_file.write(record[2]))
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+        shutil.rmtree(run_dir)
+    return position
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+'''Tester for the external merge sort of eventsort.py
+'''
+
+import unittest
+import tempfile
+import shutil
+import os
+import eventsort
+from extractor import CSVExtractor
+
+
+class EventSortTest(unittest.TestCase):
+    '''Tester for the sorting of the EdxTrackEvent table
+    '''
+
+    def setUp(self):
+        self.sort_dir = tempfile.mkdtemp()
+        self.events_path = os.path.join(self.sort_dir, 'events.csv')
+        self.sorted_path = os.path.join(self.sort_dir, 'sorted.csv')
+        user_field = CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES.index('anon_screen_name')
+        time_field = CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES.index('time')
+        self.rows = []
+        for (i, (user, time)) in enumerate([('u2', '2013-06-01T10:00:00.5+00:00'),
+                                            ('u1', '2013-06-01 09:00:00'),
+                                            ('u2', '2013-06-01 09:30:00'),
+                                            ('u1', '2013-06-01 10:00:00.5'),
+                                            ('u1', '2013-06-01 09:00:00')]):
+            fields = ["'%d'" % i] * len(CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES)
+            fields[user_field] = "'%s'" % user
+            fields[time_field] = "'%s'" % time
+            fields[1] = "'a\nmulti-line field'"
+            self.rows.append(','.join(fields) + '\n')
+        with open(self.events_path, 'w') as events:
+            events.write(''.join(self.rows))
+
+    def tearDown(self):
+        shutil.rmtree(self.sort_dir)
+
+    def sort(self, sort_by, **kwargs):
+        rows = eventsort.sort_events(self.events_path, {'quotechar': "'", 'escapechar': '\\'},
+                                     self.sorted_path, sort_by, **kwargs)
+        self.assertEqual(len(self.rows), rows)
+        self.assertEqual(['events.csv', 'sorted.csv'], sorted(os.listdir(self.sort_dir)))
+        with open(self.sorted_path) as sorted_file:
+            return sorted_file.read()
+
+    def test_sort_by_time(self):
+        '''Rows are copied as they are, in time order, whatever the
+        timestamp format; rows at the same time keep their order.
+        '''
+        expected = ''.join(self.rows[i] for i in [1, 4, 2, 0, 3])
+        self.assertEqual(expected, self.sort('time'))
+
+    def test_sort_by_user(self):
+        '''Rows are sorted by user then time, also when
+        the runs are merged in several passes.
+        '''
+        expected = ''.join(self.rows[i] for i in [1, 4, 3, 2, 0])
+        merge_fan_in = eventsort.MERGE_FAN_IN
+        eventsort.MERGE_FAN_IN = 2
+        try:
+            self.assertEqual(expected, self.sort('user', run_bytes=1))
+            self.assertEqual(expected, self.sort('user', workers=2, run_bytes=1))
+        finally:
+            eventsort.MERGE_FAN_IN = merge_fan_in
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(EventSortTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
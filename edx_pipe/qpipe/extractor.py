@@ -1,7 +1,154 @@
 from __future__ import print_function
 
+from array import array
 import csv
-import pandas as pd
+
+import numpy as np
+
+
+def read_records(csv_file, csv_format):
+    '''
+    Yields (offset, text, row) for each non blank row of an open CSV file,
+    from its current position on. A row may span several lines: text is
+    all of them, as read, and offset is that of the first.
+    '''
+    lines = []
+
+    def read_lines():
+        # Unlike iterating over the file, reads no further than needed
+        for line in iter(csv_file.readline, ''):
+            lines.append(line)
+            yield line
+
+    offset = csv_file.tell()
+    for row in csv.reader(read_lines(), **csv_format):
+        text = ''.join(lines)
+        if row:
+            yield (offset, text, row)
+        offset += len(text)
+        del lines[:]
+
+
+class CSVIndex(object):
+    """
+    Looks up the rows of a CSV table by their first field, the primary key.
+    Only a 64 bit hash of each key and the file offset of its row are held
+    in memory, in two numpy arrays sorted by hash: 16 bytes per row, so that
+    tables with tens of millions of rows fit. A row is read from the file
+    when it is looked up, and its key is compared then, so hash collisions
+    are harmless.
+    """
+    # Field values that pandas.read_csv() reads as NaN. The tables used to be
+    # loaded with pandas, which never joined these values into events.
+    NA_VALUES = frozenset([
+        '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+        '1.#IND', '1.#QNAN', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null'
+    ])
+
+    def __init__(self, path, fieldnames, quotechar, escapechar):
+        self.fieldnames = fieldnames
+        self.csv_format = {
+            'delimiter': ',',
+            'quotechar': quotechar,
+            'escapechar': escapechar
+        }
+        self.csv_file = open(path, 'rb')
+
+        hashes = array('l')
+        offsets = array('l')
+        for (offset, row) in self.read_rows():
+            hashes.append(hash(row[0]))
+            offsets.append(offset)
+        hashes = np.array(hashes, dtype=np.int64)
+        # A stable sort keeps rows with equal keys in file order,
+        # so the first one is found, as pandas would
+        order = np.argsort(hashes, kind='mergesort')
+        self.hashes = hashes[order]
+        self.offsets = np.array(offsets, dtype=np.int64)[order]
+
+        # Consecutive events often refer to the same row
+        self.last_key = None
+        self.last_row = None
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def read_lines(self):
+        '''
+        Yields the lines of the file from the current position on. Unlike
+        iterating over the file, reads no further than needed, so that
+        tell() stays accurate.
+        '''
+        return iter(self.csv_file.readline, '')
+
+    def read_rows(self):
+        '''
+        Yields (offset, row) for each non blank row of the file. A row
+        may span several lines; its offset is that of its first line.
+        '''
+        self.csv_file.seek(0)
+        for (offset, _, row) in read_records(self.csv_file, self.csv_format):
+            yield (offset, row)
+
+    def get(self, key):
+        '''
+        Returns the row with the given key as a dict of its non-null
+        fields, or None if there is no such row.
+        '''
+        if key == self.last_key:
+            return self.last_row
+        key_hash = hash(key)
+        position = np.searchsorted(self.hashes, key_hash)
+        row = None
+        while position < len(self.hashes) and self.hashes[position] == key_hash:
+            self.csv_file.seek(self.offsets[position])
+            candidate = next(csv.reader(self.read_lines(), **self.csv_format))
+            if candidate[0] == key:
+                row = dict((name, value)
+                           for (name, value) in zip(self.fieldnames[1:], candidate[1:])
+                           if value not in self.NA_VALUES)
+                break
+            position += 1
+        self.last_key = key
+        self.last_row = row
+        return row
+
+    def close(self):
+        self.csv_file.close()
+
+
+class RowIndex(object):
+    """
+    Looks up rows held in memory by their first field, the primary key,
+    as CSVIndex does for the rows of a file.
+    """
+
+    def __init__(self, fieldnames):
+        self.fieldnames = fieldnames
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row):
+        '''
+        Adds a row, a list of field values, unless one with
+        the same key was added first.
+        '''
+        if row[0] not in self.rows:
+            self.rows[row[0]] = dict((name, value)
+                                     for (name, value) in zip(self.fieldnames[1:], row[1:])
+                                     if value not in CSVIndex.NA_VALUES)
+
+    def get(self, key):
+        '''
+        Returns the row with the given key as a dict of its non-null
+        fields, or None if there is no such row.
+        '''
+        return self.rows.get(key)
+
+    def clear(self):
+        self.rows.clear()
 
 
 class CSVExtractor(object):
@@ -35,9 +182,9 @@ class CSVExtractor(object):
 
     def __init__(self, cfg_csv_path, cfg_csv_parsing):
         # Create a CSV reader for the EdxTrackEvent table
-        events = open(cfg_csv_path['edx_track_event_path'])
+        self.events_file = open(cfg_csv_path['edx_track_event_path'])
         self.edx_track_event = csv.DictReader(
-            events,
+            self.events_file,
             fieldnames=self.EDX_TRACK_EVENT_FIELDNAMES,
             delimiter=',',
             quotechar=cfg_csv_parsing['quotechar'],
@@ -49,32 +196,33 @@ class CSVExtractor(object):
                   cfg_csv_path['edx_track_event_path'])
             exit(1)
 
-        # Load Answer and CorrectMap tables into pandas DataFrames,
-        # indexed by the table's primary key.
+        # Index the Answer and CorrectMap tables by their primary key,
+        # for a hash join with the events.
         try:
-            self.answer = pd.read_csv(
+            self.answer = CSVIndex(
                 cfg_csv_path['answer_path'],
-                delimiter=',',
+                self.ANSWER_FIELDNAMES,
                 quotechar=cfg_csv_parsing['quotechar'],
-                escapechar=cfg_csv_parsing['escapechar'],
-                index_col=0,
-                names=self.ANSWER_FIELDNAMES,
-                dtype='string')
-            self.correct_map = pd.read_csv(
+                escapechar=cfg_csv_parsing['escapechar'])
+            self.correct_map = CSVIndex(
                 cfg_csv_path['correct_map_path'],
-                delimiter=',',
+                self.CORRECT_MAP_FIELDNAMES,
                 quotechar=cfg_csv_parsing['quotechar'],
-                escapechar=cfg_csv_parsing['escapechar'],
-                index_col=0,
-                names=self.CORRECT_MAP_FIELDNAMES,
-                dtype='string')
+                escapechar=cfg_csv_parsing['escapechar'])
         except Exception as e:
-            print('Pandas is unable to load CSV due to error: %s' % str(e))
+            print('Unable to load CSV due to error: %s' % str(e))
             exit(1)
 
     def __iter__(self):
         return self
 
+    def tell(self):
+        '''
+        Returns the byte offset reached in the EdxTrackEvent table. The file
+        being read ahead, it may be up to a few kilobytes past the last row.
+        '''
+        return self.events_file.tell()
+
     def next(self):
         event = self.edx_track_event.next()
 
@@ -87,33 +235,97 @@ class CSVExtractor(object):
                                 self.correct_map)
         return event
 
-    def get_foreign_values(self, event, fkey_name, fval_names, dataframe):
+    def get_foreign_values(self, event, fkey_name, fval_names, table):
         '''
         This method adds to the EdxTrackEvent row the relevant
         fields fetched from a foreign table.
-        It performs the analog of a SQL join with fk_dict on foreign_key_name.
+        It performs the analog of a SQL join with table on fkey_name.
 
         In case of conflict (foreign field holding same information and having
         same name as local field), the local value is kept if non empty and
         overridden otherwise.
 
-        foreign_key: value of the foreign key on which the join is performed
-        fk_dict: dictionary mapping foreign keys to foreign values
+        fkey_name: name of the foreign key field on which the join is performed
+        fval_names: names of the foreign fields to add to the event
+        table: CSVIndex of the foreign table
         '''
         fkey = event.get(fkey_name, None)
 
         if fkey:
-            try:
-                frow = dataframe.loc[fkey]
-                for name in fval_names:
-                    # pandas uses nan as its default null value, which causes problems
-                    # later when other functions interpret it as a non-null value.
-                    # Thus the event field is only set on non-null values.
-                    if not pd.isnull(frow.loc[name]):
-                        event[name] = frow.loc[name]
-            except Exception as e:
-                print('Broken foreign key: %s\n Error: %s' % (fkey, str(e)))
+            frow = table.get(fkey)
+            if frow is None:
+                print('Broken foreign key: %s\n Error: no such row' % fkey)
+                return
+            for name in fval_names:
+                # Null fields are left out of the row, since other functions
+                # would later interpret them as non-null values.
+                # Thus the event field is only set on non-null values.
+                if name in frow:
+                    event[name] = frow[name]
         else:
             # If the foreign key is missing, set all foreign fields to ''
             for name in fval_names:
                 event[name] = ''
+
+
+class StreamExtractor(CSVExtractor):
+    """
+    Joins the rows of the EdxTrackEvent, Answer and CorrectMap tables as
+    apipe produces them in batches (see json2sql.convertToRows), rather
+    than reading them back from the CSV files. The Answer and CorrectMap
+    rows of a JSON event come before the EdxTrackEvent rows referring to
+    them, so only those of the latest event are held.
+    """
+    TABLE_NAMES = ['EdxTrackEvent', 'Answer', 'CorrectMap']
+
+    def __init__(self, batches):
+        self.batches = iter(batches)
+        self.rows = iter([])
+        self.bytes_read = 0
+        self.answer = RowIndex(self.ANSWER_FIELDNAMES)
+        self.correct_map = RowIndex(self.CORRECT_MAP_FIELDNAMES)
+        self.event_seen = False
+        self.event_field_count = len(self.EDX_TRACK_EVENT_FIELDNAMES)
+
+    def tell(self):
+        '''
+        Returns the byte offset reached in the tracking log by apipe,
+        when the last batch of rows was passed on.
+        '''
+        return self.bytes_read
+
+    def next(self):
+        while True:
+            for (table_name, row) in self.rows:
+                if table_name == 'EdxTrackEvent':
+                    self.event_seen = True
+                    event = self.get_event(row)
+                    self.get_foreign_values(event, 'answer_fk', ['answer'], self.answer)
+                    self.get_foreign_values(event, 'correctMap_fk',
+                                            ['answer_identifier', 'correctness'],
+                                            self.correct_map)
+                    return event
+                # The rows of a new JSON event
+                if self.event_seen:
+                    self.answer.clear()
+                    self.correct_map.clear()
+                    self.event_seen = False
+                if table_name == 'Answer':
+                    self.answer.add(row)
+                elif table_name == 'CorrectMap':
+                    self.correct_map.add(row)
+            (self.bytes_read, rows) = next(self.batches)
+            self.rows = iter(rows)
+
+    def get_event(self, row):
+        '''
+        Returns the dict csv.DictReader would make of a row
+        of the EdxTrackEvent table.
+        '''
+        event = dict(zip(self.EDX_TRACK_EVENT_FIELDNAMES, row))
+        if len(row) < self.event_field_count:
+            for name in self.EDX_TRACK_EVENT_FIELDNAMES[len(row):]:
+                event[name] = None
+        elif len(row) > self.event_field_count:
+            event[None] = row[self.event_field_count:]
+        return event
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+'''Tester for the CSVIndex class used by CSVExtractor, and for StreamExtractor
+'''
+
+import unittest
+import tempfile
+import os
+from extractor import CSVIndex, CSVExtractor, StreamExtractor
+
+
+class CSVIndexTest(unittest.TestCase):
+    '''Tester for the CSVIndex class
+    '''
+
+    ROWS = [
+        "'a1','input_i4x-org-course-problem-p1_2_1','choice_3','org/course/run'\n",
+        # A row spanning two lines
+        "'a2','input_i4x-org-course-problem-p2_2_1','first line\nsecond line','org/course/run'\n",
+        # pandas.read_csv() reads NA as null
+        "'a3','input_i4x-org-course-problem-p3_2_1','NA',''\n",
+        "\n",
+        "'a1','input_i4x-org-course-problem-p1_2_1','duplicate key','org/course/run'\n",
+    ]
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix='.csv')
+        os.write(fd, ''.join(self.ROWS))
+        os.close(fd)
+        self.index = CSVIndex(self.path, CSVExtractor.ANSWER_FIELDNAMES,
+                              quotechar="'", escapechar='\\')
+
+    def tearDown(self):
+        self.index.close()
+        os.remove(self.path)
+
+    def test_get(self):
+        '''Rows are found by key, including multi-line rows,
+        and null fields are left out.
+        '''
+        self.assertEqual(4, len(self.index))
+        self.assertEqual('first line\nsecond line', self.index.get('a2')['answer'])
+        self.assertEqual({'problem_id': 'input_i4x-org-course-problem-p3_2_1'},
+                         self.index.get('a3'))
+        self.assertIsNone(self.index.get('a4'))
+
+    def test_get_duplicate_key(self):
+        '''The first of several rows with the same key is found.
+        '''
+        self.assertEqual('choice_3', self.index.get('a1')['answer'])
+        self.index.get('a2')
+        self.assertEqual('choice_3', self.index.get('a1')['answer'])
+
+
+class StreamExtractorTest(unittest.TestCase):
+    '''Tester for the StreamExtractor class
+    '''
+
+    def get_event_row(self, event_id, answer_fk='', correct_map_fk=''):
+        fieldnames = CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES
+        row = ['null'] * len(fieldnames)
+        row[0] = event_id
+        row[fieldnames.index('answer_fk')] = answer_fk
+        row[fieldnames.index('correctMap_fk')] = correct_map_fk
+        return row
+
+    def test_next(self):
+        '''Events are joined with the Answer and CorrectMap rows of their
+        JSON event, as CSVExtractor does, and made into dicts as by
+        csv.DictReader; rows of other JSON events are not kept.
+        '''
+        batches = [
+            (100, [('Answer', ['a1', 'p1', 'choice_1', 'org/course/run']),
+                   ('CorrectMap', ['c1', 'p1_2_1', 'correct', '1', '', '', 'null', '']),
+                   ('EdxTrackEvent', self.get_event_row('e1', 'a1', 'c1'))]),
+            (250, [('Answer', ['a2', 'p1', 'NA', 'org/course/run']),
+                   ('EdxTrackEvent', self.get_event_row('e2', 'a2')),
+                   ('EdxTrackEvent', self.get_event_row('e3', 'a1')[:-1])])
+        ]
+        extract = StreamExtractor(batches)
+        event = extract.next()
+        self.assertEqual(100, extract.tell())
+        self.assertEqual(('e1', 'choice_1', 'p1_2_1', 'correct'),
+                         (event['_id'], event['answer'], event['answer_identifier'],
+                          event['correctness']))
+        self.assertEqual(len(CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES) + 3, len(event))
+
+        event = extract.next()
+        self.assertEqual(250, extract.tell())
+        self.assertEqual('e2', event['_id'])
+        self.assertFalse('answer' in event)
+        self.assertEqual(('', ''), (event['answer_identifier'], event['correctness']))
+
+        event = extract.next()
+        self.assertEqual('e3', event['_id'])
+        self.assertIsNone(event['load_info_fk'])
+        self.assertFalse('answer' in event)
+        self.assertRaises(StopIteration, extract.next)
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(CSVIndexTest),
+        unittest.TestLoader().loadTestsFromTestCase(StreamExtractorTest)
+    ])
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
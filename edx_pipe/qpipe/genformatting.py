@@ -1,13 +1,21 @@
 from __future__ import print_function
 
+import os
+import sys
 import httpagentparser
 import helperclasses
-import datetime
-import re
+
+# The timestamp parser is shared with apipe
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '../apipe/json_to_relation'))
+from timestamp_parser import TimestampParser
 
 # A place holder of timestamp format passing from config file
 TIMESTAMP_FORMAT = []
 
+# Parser for TIMESTAMP_FORMAT, rebuilt when the formats change
+_timestamp_parser = TimestampParser(TIMESTAMP_FORMAT)
+
 def set_agent_os(raw_event):
     """ Parses the HTTP Agent header taken from the 'agent' field 
     of raw event, and sets 'agent' and 'os' fields."""
@@ -17,26 +25,29 @@ def set_agent_os(raw_event):
 
 
 def format_url(raw_event):
-    """ Instanciates a CourseURL object from the 'page' field """
-    raw_event['page'] = helperclasses.CourseURL(raw_event['page'])
+    """ Sets the 'page' field to the CourseURL object parsed from it,
+    shared with the other events on the same page """
+    raw_event['page'] = helperclasses.course_urls.get(raw_event['page'])
 
 
 def parse_timestamp(raw_event):
+    global _timestamp_parser
     # Remove possible offset information
     # 2013-09-11T13:25:44.876729+00:00
     # 2013-09-11T13:25:44.876729
-    timestamp = re.sub('\+.*$', '', raw_event['time'])
-
-    for timestamp_format in TIMESTAMP_FORMAT:
-        try:
-            # Parse timestamp
-            raw_event['time'] = datetime.datetime.strptime(timestamp,
-                                                           timestamp_format)
-            return
-
-        except ValueError:
-            # Attempt to parse with other timestamp format
-            pass
+    timestamp = raw_event['time']
+    offset_start = timestamp.find('+')
+    if offset_start >= 0:
+        timestamp = timestamp[:offset_start]
+
+    if _timestamp_parser.formats != TIMESTAMP_FORMAT:
+        _timestamp_parser = TimestampParser(TIMESTAMP_FORMAT)
+    try:
+        # Parse timestamp, starting with the format that worked last
+        raw_event['time'] = _timestamp_parser.parse(timestamp)
+        return
+    except ValueError:
+        pass
 
     # If we got here that means we were unable to parse the timestamp correctly
     print(
@@ -63,7 +74,7 @@ def parse_problem_id(raw_event):
     else:
         return
             
-    raw_event['module'] = helperclasses.ModuleURI(problem_id)
+    raw_event['module'] = helperclasses.module_uris.get(problem_id)
 
 
 def parse_video_id(raw_event):
@@ -77,10 +88,10 @@ def parse_video_id(raw_event):
         video_id = raw_event['transcript_id']
     else:
         return
-    raw_event['module'] = helperclasses.ModuleURI(video_id)
+    raw_event['module'] = helperclasses.module_uris.get(video_id)
 
 
 def parse_question_location(raw_event):
     if raw_event['question_location']:
-        raw_event['module'] = helperclasses.ModuleURI(
+        raw_event['module'] = helperclasses.module_uris.get(
             raw_event['question_location'])
@@ -56,6 +56,26 @@ class GenFormattingTest(unittest.TestCase):
             genformatting.parse_timestamp(raw_event)
             self.assertEqual(datetime_answer, raw_event['time'])
 
+    def test_parse_timestamp_switching_formats(self):
+        '''Timestamps in alternating formats, including the
+        time zone suffixed format of newer logs, all parse as
+        the formats are tried in turn.
+        '''
+        genformatting.TIMESTAMP_FORMAT = ['%Y-%m-%dT%H:%M:%S.%f',
+                                          '%Y-%m-%d %H:%M:%S.%f %Z']
+        for timestamp_string, datetime_answer in [
+                ('2013-09-11T13:25:44.876729',
+                 datetime.datetime(2013, 9, 11, 13, 25, 44, 876729)),
+                ('2016-03-01 08:15:02.5 UTC',
+                 datetime.datetime(2016, 3, 1, 8, 15, 2, 500000)),
+                ('2016-03-01 08:15:03.25 UTC',
+                 datetime.datetime(2016, 3, 1, 8, 15, 3, 250000)),
+                ('2013-09-11T13:25:45.1+00:00',
+                 datetime.datetime(2013, 9, 11, 13, 25, 45, 100000))]:
+            raw_event = {'time': timestamp_string}
+            genformatting.parse_timestamp(raw_event)
+            self.assertEqual(datetime_answer, raw_event['time'])
+
     def test_parse_problem_id(self):
         '''Simple test coverage of problem id parser. Note that
         the problem id can come from both the answer_identifier or
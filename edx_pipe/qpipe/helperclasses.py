@@ -1,5 +1,7 @@
 from __future__ import print_function
 
+import copy
+import datetime
 import re
 import csv
 import os
@@ -164,6 +166,18 @@ class CourseURL:
         # Finally, update the instance's page number
         self.page = pagenum
 
+    # Copy-on-write variants of set_seq and set_page, for URLs
+    # that may be shared (see InternCache)
+    def with_seq(self, seqnum):
+        url = copy.copy(self)
+        url.set_seq(seqnum)
+        return url
+
+    def with_page(self, pagenum):
+        url = copy.copy(self)
+        url.set_page(pagenum)
+        return url
+
     # These are kept to avoid breaking existing code
     # but obviously of no use for the moment
     def get_unit(self):
@@ -359,11 +373,48 @@ class ModuleURI(object):
             return self.module_id.replace('_', ' ')
 
 
+class InternCache(object):
+    """Parsed objects shared by the raw strings they were parsed from,
+    as page and module strings repeat across events. The objects are
+    shared, so they must not be mutated afterwards: CourseURL.with_seq
+    and with_page return modified copies instead."""
+
+    # Number of distinct strings whose parsed object is
+    # remembered before the cache is cleared
+    MAX_INTERNED = 100000
+
+    def __init__(self, parse):
+        self.parse = parse
+        self.objects = {}
+
+    def get(self, string):
+        '''
+        Returns the object parsed from string, parsing it only
+        if it is not cached.
+        '''
+        try:
+            return self.objects[string]
+        except KeyError:
+            parsed = self.parse(string)
+            if len(self.objects) >= self.MAX_INTERNED:
+                self.objects.clear()
+            self.objects[string] = parsed
+            return parsed
+
+
+# Caches used by genformatting and specformatting
+course_urls = InternCache(CourseURL)
+module_uris = InternCache(ModuleURI)
+
+
 class DictionaryTable(object):
-    """Basically a list, used to build the various dictionary tables in MOOCdb"""
+    """Basically a list, used to build the various dictionary tables in MOOCdb.
+    A dict from each value to its index in the list makes insert() take
+    constant time, however many distinct values there are."""
 
     def __init__(self, moocdb, table_name):
         self.item_list = []
+        self.item_ids = {}
         self.table = moocdb.csv_writers[table_name]
         self.fieldnames = moocdb.TABLES[table_name]
 
@@ -372,9 +423,16 @@ class DictionaryTable(object):
         Inserts value in the DictionaryTable's internal list if it does not already exist.
         Index of the value in the list is returned.
         '''
-        if value in self.item_list:
-            return self.item_list.index(value)
-        else:
+        try:
+            return self.item_ids[value]
+        except KeyError:
+            self.item_list.append(value)
+            self.item_ids[value] = len(self.item_list) - 1
+            return len(self.item_list) - 1
+        except TypeError:
+            # Unhashable values are looked up the slow way
+            if value in self.item_list:
+                return self.item_list.index(value)
             self.item_list.append(value)
             return len(self.item_list) - 1
 
@@ -400,6 +458,50 @@ class DictionaryTable(object):
                 self.table.store(row)
 
 
+class RuleTable(object):
+    """Ordered (regex, value) rules, compiled once into a single pattern.
+    lookup() gives the value of the first rule whose regex is found in a
+    string, as trying re.search() with each regex in turn would."""
+
+    # Number of distinct strings whose result is remembered
+    # before the memo is cleared
+    MAX_MEMOIZED = 10000
+
+    def __init__(self, rules):
+        self.values = []
+        alternatives = []
+        for (i, (regex, value)) in enumerate(rules):
+            # Each alternative only looks ahead for its regex, so that
+            # matching at the start of the string tries the rules in order.
+            # An empty group marks which rule matched.
+            alternatives.append('(?=[\s\S]*?(?:%s))(?P<rule%d>)' % (regex, i))
+            self.values.append(value)
+        self.pattern = re.compile('|'.join(alternatives)) if alternatives else None
+        # string -> index of the first matching rule, or None.
+        # Fields such as event types only take a handful of values.
+        self.memo = {}
+
+    def lookup(self, string, default=None):
+        '''
+        Returns the value of the first rule matching the string,
+        or default if none does.
+        '''
+        try:
+            rule_index = self.memo[string]
+        except KeyError:
+            rule_index = None
+            if self.pattern is not None:
+                match = self.pattern.match(string)
+                if match:
+                    rule_index = int(match.lastgroup[len('rule'):])
+            if len(self.memo) >= self.MAX_MEMOIZED:
+                self.memo.clear()
+            self.memo[string] = rule_index
+        if rule_index is None:
+            return default
+        return self.values[rule_index]
+
+
 class CurationHelper(object):
     def __init__(self, output_dir):
         self.output_dir = output_dir
@@ -497,23 +599,25 @@ class CurationHelper(object):
 
 
 class EngagedUsers(object):
-    """ Used to maintain the list of engaged users in EventFormatter """
+    """ Used to maintain the list of engaged users in EventFormatter.
+    With an idle_timeout in minutes, users whose location has not been
+    updated for that long in event time are no longer engaged, so that
+    only the users active lately are kept. """
 
-    def __init__(self):
+    def __init__(self, idle_timeout=None):
         self.engaged_users = {}
+        self.idle_timeout = datetime.timedelta(minutes=idle_timeout) if idle_timeout else None
+        self.next_eviction_time = None
 
     def is_engaged(self, user):
-        return user in self.engaged_users.keys()
+        return user in self.engaged_users
 
     def get_location(self, user):
-        if self.is_engaged(user):
-            return self.engaged_users[user]
-        else:
-            return None
+        return self.engaged_users.get(user, None)
 
     def remove_user(self, user):
-        if user in self.engaged_users.keys():
-            self.engaged_users.pop(user)
+        if user in self.engaged_users:
+            del self.engaged_users[user]
         else:
             print(
                 '[EngagedUsers.remove_user] : Trying to remove unengaged user : '
@@ -521,6 +625,25 @@ class EngagedUsers(object):
 
     def update_location(self, user, new_location, time):
         self.engaged_users[user] = (new_location, time)
+        if self.idle_timeout:
+            self.evict_idle_users(time)
+
+    def evict_idle_users(self, time):
+        '''
+        Removes the users idle for more than idle_timeout at time. The
+        users are looked at once per idle_timeout of event time, so that
+        the cost of a look is spread over the events in between.
+        '''
+        if self.next_eviction_time is None:
+            self.next_eviction_time = time + self.idle_timeout
+        if time < self.next_eviction_time:
+            return
+        self.next_eviction_time = time + self.idle_timeout
+        last_time = time - self.idle_timeout
+        idle_users = [user for (user, (_, user_time)) in self.engaged_users.iteritems()
+                      if user_time < last_time]
+        for user in idle_users:
+            del self.engaged_users[user]
 
 
 class CSVWriter(object):
@@ -537,3 +660,32 @@ class CSVWriter(object):
 
     def close(self):
         self.output.close()
+
+
+if __name__ == '__main__':
+    # Benchmark: the cost per DictionaryTable insert as the number
+    # of distinct values grows, each value inserted about ten times
+    # as with the urls of a course's events
+    import random
+    import shutil
+    import tempfile
+    import time
+    from moocdb import MOOCdb
+
+    moocdb_dir = tempfile.mkdtemp()
+    try:
+        moocdb = MOOCdb(moocdb_dir)
+        for num_values in [1000, 10000, 100000]:
+            urls = ['https://www.edx.org/courses/org/course/run/courseware/%d/' % i
+                    for i in range(num_values)] * 10
+            random.shuffle(urls)
+            table = DictionaryTable(moocdb, 'urls')
+            start_time = time.time()
+            for url in urls:
+                table.insert(url)
+            elapsed = time.time() - start_time
+            print('%7d distinct values: %.2f microseconds per insert' %
+                  (num_values, 1e6 * elapsed / len(urls)))
+        moocdb.close()
+    finally:
+        shutil.rmtree(moocdb_dir)
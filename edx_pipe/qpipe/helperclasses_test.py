@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''Tester for the DictionaryTable, RuleTable, InternCache and EngagedUsers helper classes
+'''
+
+import datetime
+import unittest
+import tempfile
+import os
+from helperclasses import CourseURL, DictionaryTable, EngagedUsers, InternCache, RuleTable
+from moocdb import MOOCdb
+
+
+class HelperClassesTest(unittest.TestCase):
+    '''Tester for the DictionaryTable, RuleTable, InternCache and EngagedUsers
+    helper classes
+    '''
+
+    def setUp(self):
+        self.moocdb = MOOCdb(tempfile.gettempdir())
+
+    def tearDown(self):
+        self.moocdb.close()
+        for name in self.moocdb.TABLES:
+            os.remove(os.path.join(tempfile.gettempdir(), '%s.csv' % name))
+
+    def test_dictionary_table_insert(self):
+        '''Values get ids in order of first insertion, and
+        inserting a value again returns its existing id.
+        '''
+        table = DictionaryTable(self.moocdb, 'resources_urls')
+        self.assertEqual(0, table.insert((3, 7)))
+        self.assertEqual(1, table.insert((3, 8)))
+        self.assertEqual(0, table.insert((3, 7)))
+        self.assertEqual(2, table.insert((4, 7)))
+        self.assertEqual(3, len(table))
+        self.assertEqual((3, 8), table[1])
+
+    def test_rule_table_lookup(self):
+        '''The first rule in the list wins, not the one
+        matching earliest in the string.
+        '''
+        table = RuleTable([('seq_', 'seq'), ('i4x:/', 'i4x'), ('^$', 'empty')])
+        self.assertEqual('seq', table.lookup('i4x://org/course/seq_1'))
+        self.assertEqual('i4x', table.lookup('i4x://org/course/problem'))
+        self.assertEqual('empty', table.lookup(''))
+        self.assertEqual(None, table.lookup('page_close'))
+        self.assertEqual(False, table.lookup('page_close', False))
+
+    def test_intern_cache_get(self):
+        '''The same string gives the same parsed object, which
+        with_seq copies rather than modifies.
+        '''
+        cache = InternCache(CourseURL)
+        url = cache.get('/courses/org/course/run/courseware/unit/subunit/')
+        self.assertTrue(url is cache.get('/courses/org/course/run/courseware/unit/subunit/'))
+        url_copy = url.with_seq(3)
+        self.assertEqual('3', url_copy.get_seq())
+        self.assertEqual('1', url.get_seq())
+        self.assertEqual(
+            'https://www.edx.org/courses/org/course/run/courseware/unit/subunit/1/', str(url))
+
+        cache.MAX_INTERNED = 1
+        other_url = cache.get('/courses/org/course/run/info/')
+        self.assertEqual(1, len(cache.objects))
+        self.assertTrue(other_url is cache.get('/courses/org/course/run/info/'))
+
+    def test_engaged_users_eviction(self):
+        '''Users idle for more than idle_timeout are no longer engaged.
+        '''
+        users = EngagedUsers(idle_timeout=60)
+        start = datetime.datetime(2013, 11, 10)
+        users.update_location('A', 'url_a', start)
+        users.update_location('B', 'url_b', start + datetime.timedelta(minutes=30))
+        self.assertTrue(users.is_engaged('A'))
+        users.update_location('B', 'url_b', start + datetime.timedelta(minutes=90))
+        self.assertFalse(users.is_engaged('A'))
+        self.assertEqual(None, users.get_location('A'))
+        self.assertEqual(('url_b', start + datetime.timedelta(minutes=90)),
+                         users.get_location('B'))
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(HelperClassesTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
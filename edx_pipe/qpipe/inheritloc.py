@@ -36,7 +36,8 @@ def inherit_seqnum(raw_event):
         seqnum = current_location.get_seq()
 
         if seqnum:
-            event_url.set_seq(seqnum)
+            # The URL may be shared with other events, so it is copied
+            raw_event['page'] = event_url.with_seq(seqnum)
             raw_event['inherited'] = 'seqnum'
         else:
             pass
@@ -57,9 +57,12 @@ class MOOCdb(object):
         ],
     }
 
-    def __init__(self, moocdb_dir=''):
+    def __init__(self, moocdb_dir='', buffer_rows=None, buffer_size=None):
+        '''
+        buffer_rows and buffer_size, if given, are passed on to each CSVWriter.
+        '''
         self.csv_writers = {}
-        self.create_csv_writers(moocdb_dir)
+        self.create_csv_writers(moocdb_dir, buffer_rows, buffer_size)
 
     def close(self):
         '''Closes all the contained CSVWriter objects to ensure data is flushed to disk.
@@ -67,28 +70,54 @@ class MOOCdb(object):
         for _, csv_writer in self.csv_writers.iteritems():
             csv_writer.close()
 
-    def create_csv_writers(self, moocdb_dir):
+    def create_csv_writers(self, moocdb_dir, buffer_rows=None, buffer_size=None):
         '''Creates all the CSVWriter objects responsible for each moocdb table's corresponding
         csv file.
         '''
+        options = {}
+        if buffer_rows is not None:
+            options['buffer_rows'] = buffer_rows
+        if buffer_size is not None:
+            options['buffer_size'] = buffer_size
         for table_name in self.TABLES:
             self.csv_writers[table_name] = CSVWriter(
                 os.path.join(moocdb_dir, table_name + '.csv'),
-                self.TABLES[table_name])
+                self.TABLES[table_name], **options)
+
+    def get_stats(self):
+        '''Returns a dict from each table name to the (rows, bytes) written to its csv file.
+        '''
+        return dict((table_name, csv_writer.get_stats())
+                    for (table_name, csv_writer) in self.csv_writers.iteritems())
 
 
 class CSVWriter(object):
-    '''This is a wrapper around csv.DictWriter that bundles the output file
-    with a csv.DictWriter object together.
+    '''This is a wrapper around csv.writer that bundles the output file
+    with a csv.writer object together.
+
+    Rows are either positional, in the order of fields, or dicts from field
+    names to values, missing fields being left empty as with csv.DictWriter.
+    They are kept in memory and written buffer_rows at a time with
+    writerows(), through a file buffer of buffer_size bytes.
     '''
+    # Rows kept in memory before they are written
+    BUFFER_ROWS = 10000
+    # Size of the output file's buffer, in bytes
+    BUFFER_SIZE = 1 << 20
 
-    def __init__(self, output_file, fields, escape='\\'):
+    def __init__(self, output_file, fields, escape='\\', buffer_rows=BUFFER_ROWS,
+                 buffer_size=BUFFER_SIZE):
+        self.fields = fields
+        self.field_set = frozenset(fields)
+        self.buffer_rows = buffer_rows
+        self.rows = []
+        self.row_count = 0
+        self.byte_count = 0
         try:
-            self.output = open(output_file, 'w')
-            self.writer = csv.DictWriter(
+            self.output = open(output_file, 'w', buffer_size)
+            self.writer = csv.writer(
                 self.output,
                 delimiter=',',
-                fieldnames=fields,
                 quotechar='"',
                 escapechar=escape,
                 lineterminator='\n')
@@ -99,11 +128,37 @@ class CSVWriter(object):
             return
 
     def store(self, row):
-        '''Writes row to open csv.DictWriter.
+        '''Buffers a row given as a dict from field names to values.
+        '''
+        if not self.field_set.issuperset(row):
+            raise ValueError('dict contains fields not in fieldnames: %s' %
+                             ', '.join(repr(key) for key in row if key not in self.field_set))
+        self.store_row([row.get(field, '') for field in self.fields])
+
+    def store_row(self, row):
+        '''Buffers a row given as a list of values, in the order of fields.
+        '''
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        '''Writes the buffered rows to the output file.
+        '''
+        self.writer.writerows(self.rows)
+        self.row_count += len(self.rows)
+        del self.rows[:]
+
+    def get_stats(self):
+        '''Returns the (rows, bytes) written so far, buffered rows included.
         '''
-        self.writer.writerow(row)
+        self.flush()
+        if not self.output.closed:
+            self.byte_count = self.output.tell()
+        return (self.row_count, self.byte_count)
 
     def close(self):
         '''Closes the open output file to ensure data is flushed to disk.
         '''
+        self.get_stats()
         self.output.close()
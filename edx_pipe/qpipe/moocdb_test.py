@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+'''Tester for the CSVWriter class of moocdb
+'''
+
+import unittest
+import tempfile
+import os
+from moocdb import CSVWriter
+
+
+class CSVWriterTest(unittest.TestCase):
+    '''Tester for the CSVWriter class
+    '''
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.writer = CSVWriter(self.path, ['os_id', 'os_name'], buffer_rows=2)
+
+    def tearDown(self):
+        self.writer.close()
+        os.remove(self.path)
+
+    def read(self):
+        with open(self.path) as csv_file:
+            return csv_file.read()
+
+    def test_store(self):
+        '''Dict and positional rows are written alike, buffer_rows at
+        a time, and the rows and bytes written are counted.
+        '''
+        self.writer.store({'os_id': 0, 'os_name': 'Linux, "x86_64"'})
+        self.writer.store_row([1, None])
+        self.writer.output.flush()
+        self.assertEqual('0,"Linux, ""x86_64"""\n1,\n', self.read())
+        self.writer.store({'os_id': 2})
+        self.writer.output.flush()
+        self.assertEqual('0,"Linux, ""x86_64"""\n1,\n', self.read())
+        self.assertEqual((3, 28), self.writer.get_stats())
+        self.writer.close()
+        self.assertEqual('0,"Linux, ""x86_64"""\n1,\n2,\n', self.read())
+        self.assertEqual((3, 28), self.writer.get_stats())
+
+    def test_store_unknown_field(self):
+        '''As with csv.DictWriter, a dict row with a field not in
+        the table is an error.
+        '''
+        self.assertRaises(ValueError, self.writer.store, {'os_id': 0, 'agent_id': 1})
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(CSVWriterTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
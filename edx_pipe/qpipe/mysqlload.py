@@ -0,0 +1,215 @@
+'''
+Parallel loading of the MOOCdb CSV files into MySQL.
+
+The copy script (copy_to_mysqlDB.sql) loads the tables one after the
+other, through a single mysql client, into tables whose secondary keys
+are maintained row by row. Here, the LOAD DATA statements of the script
+run concurrently, one table per connection of a small pool, into tables
+created without their secondary keys (see create_mysql's defer_keys).
+These keys are added once the tables are loaded, each table's in a
+single ALTER TABLE, building its indexes by sorting the loaded rows.
+'''
+from __future__ import print_function
+
+from multiprocessing.pool import ThreadPool
+import os
+import re
+import time
+
+import mysql.connector.pooling
+import sqlparse
+
+# mysql.connector does not allow larger connection pools
+MAX_POOL_SIZE = 32
+
+# A table definition of the create scripts; these end with ');'
+# on a line of its own
+CREATE_TABLE_PATTERN = re.compile(
+    r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*?)\n\s*\)\s*;',
+    re.IGNORECASE | re.DOTALL)
+
+# A secondary key of a table definition, on a line of its own
+KEY_PATTERN = re.compile(r'^[ \t]*KEY[ \t]*\(([^)]*)\)[ \t]*,?[ \t]*(?:\n|\Z)', re.MULTILINE)
+
+# A comma left before the closing parenthesis once the keys are removed
+TRAILING_COMMA_PATTERN = re.compile(r',(\s*(?:--[^\n]*\s*)*)$')
+
+LOAD_TABLE_PATTERN = re.compile(r'INTO\s+TABLE\s+(\w+)', re.IGNORECASE)
+LOAD_FILE_PATTERN = re.compile(r'INFILE\s+\'([^\']*)\'', re.IGNORECASE)
+
+
+def split_secondary_keys(script):
+    '''
+    Returns the script without the secondary keys of its tables, and
+    these keys, as a dict of table name to list of indexed columns.
+    '''
+    keys = {}
+
+    def remove_keys(match):
+        (table, definition) = match.groups()
+        table_keys = [columns.strip() for columns in KEY_PATTERN.findall(definition)]
+        if not table_keys:
+            return match.group(0)
+        keys[table] = table_keys
+        stripped = TRAILING_COMMA_PATTERN.sub(r'\1', KEY_PATTERN.sub('', definition).rstrip())
+        start = match.start(2) - match.start(0)
+        end = match.end(2) - match.start(0)
+        statement = match.group(0)
+        return statement[:start] + stripped + statement[end:]
+
+    return (CREATE_TABLE_PATTERN.sub(remove_keys, script), keys)
+
+
+def split_load_statements(script):
+    '''
+    Returns the statements of a copy script other than LOAD DATA, such
+    as USE or SET, and its LOAD DATA statements as (table, path, statement)
+    '''
+    # As in executeSQL, comment lines are dropped
+    lines = [line for line in script.split('\n') if line.lstrip()[0:2] != '--']
+    setup = []
+    loads = []
+    for statement in sqlparse.split('\n'.join(lines)):
+        statement = str(statement).rstrip().rstrip(';').strip()
+        if not statement:
+            continue
+        if statement.upper().startswith('LOAD DATA'):
+            table = LOAD_TABLE_PATTERN.search(statement).group(1)
+            path = LOAD_FILE_PATTERN.search(statement).group(1)
+            loads.append((table, path, statement))
+        elif not statement.upper().startswith('USE '):
+            # The connections of the pool are opened on the database
+            setup.append(statement)
+    return (setup, loads)
+
+
+def get_key_name(columns):
+    '''
+    Returns the name MySQL gives a key left unnamed, that of its first column
+    '''
+    return columns.split(',')[0].strip().strip('`')
+
+
+def get_rate(rows, seconds):
+    return rows / seconds if seconds > 0 else 0.0
+
+
+class TableLoader(object):
+    '''
+    Runs the statements of a copy script over a pool of connections
+    to the database of cfg_mysql.
+    '''
+
+    def __init__(self, cfg_mysql, workers):
+        self.cfg_mysql = cfg_mysql
+        self.workers = max(1, min(workers, MAX_POOL_SIZE))
+        self.pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name='qpipe_load', pool_size=self.workers,
+            host=cfg_mysql['host'], port=cfg_mysql['port'],
+            user=cfg_mysql['user'], password=cfg_mysql['password'],
+            database=cfg_mysql['database'], allow_local_infile=True)
+
+    def execute(self, statement, params=None):
+        '''
+        Executes statement on a connection of the pool,
+        returning the number of rows affected
+        '''
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(statement, params)
+            if cursor.with_rows:
+                cursor.fetchall()
+            rows = cursor.rowcount
+            cursor.close()
+            connection.commit()
+        finally:
+            # Returns the connection to the pool
+            connection.close()
+        return rows
+
+    def query(self, statement, params=None):
+        connection = self.pool.get_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(statement, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            connection.close()
+        return rows
+
+    def load_table(self, load):
+        '''
+        Runs the LOAD DATA statement of a table, returning
+        (table, rows loaded, seconds)
+        '''
+        (table, path, statement) = load
+        start = time.time()
+        rows = self.execute(statement)
+        return (table, rows, time.time() - start)
+
+    def add_keys(self, table_keys):
+        '''
+        Adds the keys of a table it does not have yet, in a single
+        ALTER TABLE, returning (table, keys added, seconds)
+        '''
+        (table, keys) = table_keys
+        existing = set(row[0] for row in self.query(
+            'SELECT DISTINCT index_name FROM information_schema.statistics '
+            'WHERE table_schema = %s AND table_name = %s',
+            (self.cfg_mysql['database'], table)))
+        missing = [columns for columns in keys if get_key_name(columns) not in existing]
+        start = time.time()
+        if missing:
+            self.execute('ALTER TABLE %s %s' % (table, ', '.join(
+                'ADD KEY %s (%s)' % (get_key_name(columns), columns) for columns in missing)))
+        return (table, len(missing), time.time() - start)
+
+    def run(self, func, items, workers):
+        thread_pool = ThreadPool(processes=max(1, min(workers, self.workers)))
+        try:
+            results = thread_pool.map(func, items, chunksize=1)
+            thread_pool.close()
+        except:
+            thread_pool.terminate()
+            raise
+        finally:
+            thread_pool.join()
+        return results
+
+    def load(self, script, keys=None, index_workers=1):
+        '''
+        Loads the tables of a copy script in parallel, then adds their
+        keys, in index_workers tables at a time. Prints the rows/sec of
+        each table, and returns the results of load_table.
+        '''
+        (setup, loads) = split_load_statements(script)
+        for statement in setup:
+            self.execute(statement)
+
+        # The largest tables first, so that the last ones to
+        # start do not leave the other connections idle
+        def get_size(load):
+            return os.path.getsize(load[1]) if os.path.exists(load[1]) else 0
+        loads = sorted(loads, key=get_size, reverse=True)
+
+        start = time.time()
+        results = self.run(self.load_table, loads, self.workers)
+        total_rows = 0
+        for (table, rows, seconds) in sorted(results):
+            total_rows += rows
+            print('* Loaded %s: %d rows in %0.1fs (%0.0f rows/sec)'
+                  % (table, rows, seconds, get_rate(rows, seconds)))
+        seconds = time.time() - start
+        print('* Loaded %d tables: %d rows in %0.1fs (%0.0f rows/sec)'
+              % (len(results), total_rows, seconds, get_rate(total_rows, seconds)))
+
+        if keys:
+            loaded = set(load[0] for load in loads)
+            table_keys = sorted((table, keys[table]) for table in keys if table in loaded)
+            start = time.time()
+            for (table, added, seconds) in self.run(self.add_keys, table_keys, index_workers):
+                print('* Indexed %s: %d keys in %0.1fs' % (table, added, seconds))
+            print('* Indexed %d tables in %0.1fs' % (len(table_keys), time.time() - start))
+        return results
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+'''Tester for the parsing of the create and copy scripts in mysqlload
+'''
+
+import unittest
+import os
+from mysqlload import split_secondary_keys, split_load_statements, get_key_name
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_script(name):
+    with open(os.path.join(SCRIPT_DIR, name)) as script:
+        return script.read()
+
+
+class MySQLLoadTest(unittest.TestCase):
+    '''Tester for the parsing of the create and copy scripts in mysqlload
+    '''
+
+    def test_split_secondary_keys(self):
+        '''The secondary keys are removed from the table definitions,
+        which keep their primary keys and no trailing comma.
+        '''
+        (script, keys) = split_secondary_keys(read_script('create_mysqlDB.sql'))
+        self.assertEqual(['user_id', 'problem_id'], keys['submissions'])
+        self.assertEqual(['problem_name', 'problem_parent_id', 'problem_type_id', 'resource_id'],
+                         keys['problems'])
+        self.assertEqual(['commit_hash'], keys['metadata'])
+        self.assertNotIn('agent', keys)
+        self.assertNotIn('answer', keys)
+
+        self.assertEqual(14, script.count('CREATE TABLE'))
+        self.assertEqual(13, script.count('PRIMARY KEY'))
+        self.assertEqual(script.count('PRIMARY KEY'), script.count('KEY'))
+        self.assertNotRegexpMatches(script, r',\s*\)\s*;')
+        self.assertIn('PRIMARY KEY (submission_id)\n);', script)
+        self.assertIn('events_processing_duration  int(255)    NULL\n);', script)
+        self.assertEqual(({}, script), split_secondary_keys(script)[::-1])
+
+    def test_split_load_statements(self):
+        '''The LOAD DATA statements are those of each table,
+        other statements but USE being run beforehand.
+        '''
+        (setup, loads) = split_load_statements(read_script('copy_to_mysqlDB.sql'))
+        self.assertEqual(['SET @@global.local_infile = 1'], setup)
+        tables = [table for (table, path, statement) in loads]
+        self.assertEqual(13, len(tables))
+        self.assertNotIn('answer', tables)
+        self.assertEqual(('agent', 'MOOCDB_DIR/agent.csv'), loads[0][:2])
+        (table, path, statement) = loads[tables.index('click_events')]
+        self.assertEqual('MOOCDB_DIR/click_events.csv', path)
+        self.assertTrue(statement.endswith("video_old_speed          = nullif(@v13, '')"))
+
+    def test_get_key_name(self):
+        '''Unnamed keys are named after their first column.
+        '''
+        self.assertEqual('user_id', get_key_name('user_id'))
+        self.assertEqual('user_id', get_key_name('`user_id`, course_id'))
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(MySQLLoadTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
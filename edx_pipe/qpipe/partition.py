@@ -0,0 +1,402 @@
+'''
+Parallel processing of the events, partitioned by user.
+
+What the managers keep per user, the engaged users' locations and the
+staged events, depends on that user's events only. The EdxTrackEvent table
+is thus split by anon_screen_name into partitions, each run through an
+EventPipe of its own in a process pool, writing its MOOCdb tables to a
+directory of its own.
+
+Each partition numbers the urls, agents, os, resources and problems in the
+order it meets them. The merge numbers them again in the order the serial
+pipe would meet them, that of the events in the EdxTrackEvent table, and
+rewrites the rows of the partitions with these ids. The MOOCdb tables then
+hold the same rows as with the serial pipe, though not in the same order.
+'''
+from __future__ import print_function
+
+from array import array
+from itertools import izip
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zlib
+
+import extractor
+from eventpipe import EventPipe
+from moocdb import MOOCdb
+from progress import ProgressReporter
+from resources import Problem
+
+# The positions of a partition's events are written by chunks of that many
+POSITIONS_CHUNK = 100000
+
+# The tables written as events are processed, with their columns
+# holding ids assigned by a partition, and the table these refer to
+EVENT_TABLES = {
+    'observed_events': {
+        'url_id': 'resources',
+        'observed_event_os': 'os',
+        'observed_event_agent': 'agent'
+    },
+    'submissions': {
+        'problem_id': 'problems',
+        'submission_os': 'os',
+        'submission_agent': 'agent'
+    },
+    'assessments': {},
+    'click_events': {}
+}
+
+
+class InsertLog(object):
+    '''
+    Logs the inserts into a ResourceHierarchy that may change it: the first
+    of each URI, and the first to bring the attribute that merge() fills in,
+    the name of a resource or the resource id of a problem. Any other insert
+    leaves the hierarchy as it is, so inserting the logged nodes again, in
+    order, builds the same hierarchy.
+    '''
+
+    def __init__(self, hierarchy, attribute):
+        self.attribute = attribute
+        # Position of the event being processed
+        self.position = None
+        # (position, uri, attribute value) for each logged insert
+        self.inserts = []
+        # uri -> whether an insert with the attribute was logged
+        self.logged = {}
+        self.hierarchy_insert = hierarchy.insert
+        hierarchy.insert = self.insert
+
+    def insert(self, node):
+        value = getattr(node, self.attribute)
+        has_value = self.logged.get(node.uri)
+        if has_value is None or (value and not has_value):
+            self.logged[node.uri] = bool(value)
+            self.inserts.append((self.position, node.uri, value))
+        return self.hierarchy_insert(node)
+
+
+def get_partition(user, partitions):
+    # crc32 rather than hash(), which differs between 32 and 64 bit builds
+    return (zlib.crc32(user or '') & 0xffffffff) % partitions
+
+
+def split_events(events_path, cfg_csv_parsing, partition_dir, partitions, progress=None):
+    '''
+    Splits the EdxTrackEvent table by user into partitions, copying each row
+    as it is. The position of each row in the table is written alongside,
+    in <partition path>.positions. Returns the paths of the partitions.
+    progress, if given, is the ProgressReporter to update as rows are read.
+    '''
+    csv_format = {
+        'delimiter': ',',
+        'quotechar': cfg_csv_parsing['quotechar'],
+        'escapechar': cfg_csv_parsing['escapechar']
+    }
+    user_field = extractor.CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES.index('anon_screen_name')
+    paths = [os.path.join(partition_dir, 'events_%d.csv' % partition)
+             for partition in range(partitions)]
+    event_files = [open(path, 'wb') for path in paths]
+    position_files = [open(path + '.positions', 'wb') for path in paths]
+    positions = [array('l') for _ in paths]
+
+    position = 0
+    with open(events_path, 'rb') as events:
+        for (offset, text, row) in extractor.read_records(events, csv_format):
+            user = row[user_field] if len(row) > user_field else None
+            partition = get_partition(user, partitions)
+            if not text.endswith('\n'):
+                text += '\n'
+            event_files[partition].write(text)
+            positions[partition].append(position)
+            if len(positions[partition]) == POSITIONS_CHUNK:
+                positions[partition].tofile(position_files[partition])
+                del positions[partition][:]
+            position += 1
+            if progress:
+                progress.update(position, offset)
+
+    for partition in range(partitions):
+        positions[partition].tofile(position_files[partition])
+        position_files[partition].close()
+        event_files[partition].close()
+    if progress:
+        progress.finish(position)
+    return paths
+
+
+def get_node_ids(hierarchy):
+    '''
+    Returns a dict from the URI of each node of the hierarchy,
+    but the root, to its id.
+    '''
+    node_ids = {}
+    nodes = list(hierarchy.hierarchy.children)
+    while nodes:
+        node = nodes.pop()
+        node_ids.setdefault(node.uri, node._id)
+        nodes.extend(node.children)
+    return node_ids
+
+
+def process_partition(spec):
+    '''
+    Runs the events of a partition through an EventPipe, writing the MOOCdb
+    tables of its events, and returns what the merge needs to know of the
+    ids it assigned.
+    '''
+    (cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec, timestamp_format, idle_timeout,
+     progress_interval, metrics_path, label, profile) = spec
+    moocdb = MOOCdb(cfg_csv_path['moocdb_csv_dir'])
+    pipe = EventPipe(moocdb, cfg_csv_path['moocdb_csv_dir'], cfg_open_edx_spec,
+                     timestamp_format, idle_timeout, profile)
+
+    resource_inserts = InsertLog(pipe.resource_manager.resource_hierarchy, 'resource_name')
+    problem_inserts = InsertLog(pipe.submission_manager.problem_hierarchy, 'resource_id')
+    tables = {
+        'urls': pipe.event_formatter.urls,
+        'os': pipe.event_formatter.os,
+        'agent': pipe.event_formatter.agents,
+        'resources_urls': pipe.resource_manager.resources_urls
+    }
+    # Position of the event that first inserted each value of the tables
+    first_positions = dict((name, array('l')) for name in tables)
+    # (position, module_uri, (url_id, resource_id)) for each candidate resource
+    candidates = []
+    candidate_counts = {}
+
+    positions = array('l')
+    with open(cfg_csv_path['edx_track_event_path'] + '.positions', 'rb') as position_file:
+        positions.fromstring(position_file.read())
+    extract = extractor.CSVExtractor(cfg_csv_path, cfg_csv_parsing)
+    progress = ProgressReporter(cfg_csv_path['edx_track_event_path'], interval=progress_interval,
+                                metrics_path=metrics_path, label=label)
+
+    for (event_count, (position, raw_event)) in enumerate(izip(positions, extract), 1):
+        progress.update(event_count, extract.tell())
+        resource_inserts.position = position
+        problem_inserts.position = position
+        event = pipe.process(raw_event)
+        if event is None:
+            continue
+
+        for (name, table) in tables.iteritems():
+            while len(first_positions[name]) < len(table):
+                first_positions[name].append(position)
+
+        module = event.data.get('module', None)
+        if module:
+            module_uri = module.get_uri()
+            module_candidates = pipe.curation_helper.candidate_resources[module_uri]
+            if len(module_candidates) > candidate_counts.get(module_uri, 0):
+                candidate_counts[module_uri] = len(module_candidates)
+                candidates.append((position, module_uri, module_candidates[-1]))
+
+    # The tables of ids are written once merged, the staged events here
+    pipe.event_manager.serialize()
+    moocdb.close()
+    progress.finish(len(positions))
+
+    result = {
+        'resource_inserts': resource_inserts.inserts,
+        'problem_inserts': problem_inserts.inserts,
+        'resource_ids': get_node_ids(pipe.resource_manager.resource_hierarchy),
+        'problem_ids': get_node_ids(pipe.submission_manager.problem_hierarchy),
+        'hints': pipe.curation_helper.hints,
+        'candidates': candidates,
+        'agent_cache': (pipe.event_formatter.agent_cache_hits,
+                        pipe.event_formatter.agent_cache_misses)
+    }
+    for (name, table) in tables.iteritems():
+        result[name] = (table.item_list, first_positions[name])
+    if pipe.profiler:
+        pipe.profiler.finish()
+        result['profile'] = pipe.profiler.get_stats()
+    return result
+
+
+def get_global_id(id_map, local_id):
+    '''
+    Returns the global id for an id assigned by a partition, as a string
+    like those of events. A missing id, None or '', is left as it is.
+    '''
+    if local_id is None or local_id == '':
+        return local_id
+    return str(id_map[int(local_id)])
+
+
+def merge_dictionary_table(table, partition_tables, get_value=lambda partition, value: value):
+    '''
+    Inserts into table the values of the partitions' tables, in the order
+    of the events that first inserted them. Returns for each partition
+    the list of the global ids of its values.
+    '''
+    inserts = []
+    for (partition, (values, first_positions)) in enumerate(partition_tables):
+        inserts.extend(izip(first_positions, [partition] * len(values), range(len(values))))
+    inserts.sort()
+
+    id_maps = [[None] * len(values) for (values, _) in partition_tables]
+    for (_, partition, local_id) in inserts:
+        value = get_value(partition, partition_tables[partition][0][local_id])
+        id_maps[partition][local_id] = table.insert(value)
+    return id_maps
+
+
+def merge_hierarchy(insert, partition_inserts, partition_node_ids, get_node_ids):
+    '''
+    Inserts again the nodes logged by the InsertLog of each partition, in
+    the order of their events, with insert(uri, attribute value, partition).
+    Returns for each partition a dict from its node ids to the global ones.
+    '''
+    inserts = []
+    for (partition, logged_inserts) in enumerate(partition_inserts):
+        inserts.extend((position, partition, uri, value)
+                       for (position, uri, value) in logged_inserts)
+    inserts.sort()
+    for (_, partition, uri, value) in inserts:
+        insert(uri, value, partition)
+
+    global_ids = get_node_ids()
+    return [dict((local_id, global_ids[uri]) for (uri, local_id) in node_ids.iteritems())
+            for node_ids in partition_node_ids]
+
+
+def merge_partitions(pipe, moocdb, partition_dirs, results):
+    '''
+    Fills the pipe's dictionary tables, hierarchies and curation hints
+    with those of the partitions, and writes the rows of their events
+    to moocdb with global ids.
+    '''
+    id_maps = {}
+    formatter_tables = {
+        'urls': pipe.event_formatter.urls,
+        'os': pipe.event_formatter.os,
+        'agent': pipe.event_formatter.agents
+    }
+    for (name, table) in formatter_tables.iteritems():
+        id_maps[name] = merge_dictionary_table(table, [result[name] for result in results])
+    for result in results:
+        (hits, misses) = result['agent_cache']
+        pipe.event_formatter.agent_cache_hits += hits
+        pipe.event_formatter.agent_cache_misses += misses
+
+    id_maps['resources'] = merge_hierarchy(
+        lambda uri, name, partition: pipe.resource_manager.insert_resource(uri, name),
+        [result['resource_inserts'] for result in results],
+        [result['resource_ids'] for result in results],
+        lambda: get_node_ids(pipe.resource_manager.resource_hierarchy))
+
+    def insert_problem(uri, resource_id, partition):
+        problem_node = Problem(uri)
+        problem_node.resource_id = get_global_id(id_maps['resources'][partition], resource_id)
+        pipe.submission_manager.problem_hierarchy.insert(problem_node)
+
+    id_maps['problems'] = merge_hierarchy(
+        insert_problem,
+        [result['problem_inserts'] for result in results],
+        [result['problem_ids'] for result in results],
+        lambda: get_node_ids(pipe.submission_manager.problem_hierarchy))
+
+    def get_resource_url(partition, resource_url):
+        (resource_id, url_id) = resource_url
+        # The root of the hierarchy has no id
+        if resource_id is not None:
+            resource_id = id_maps['resources'][partition][resource_id]
+        return (resource_id, get_global_id(id_maps['urls'][partition], url_id))
+
+    merge_dictionary_table(pipe.resource_manager.resources_urls,
+                           [result['resources_urls'] for result in results],
+                           get_resource_url)
+
+    # Curation hints are counts, summed over the partitions; candidate
+    # resources are listed in the order of their first event
+    hints = pipe.curation_helper.hints
+    for (partition, result) in enumerate(results):
+        url_ids = id_maps['urls'][partition]
+        for (module_base_uri, module_hints) in result['hints'].iteritems():
+            for (base_url, counts) in module_hints.iteritems():
+                merged_counts = hints.setdefault(module_base_uri, {}).setdefault(base_url, {})
+                for ((seqnum, url_id), count) in counts.iteritems():
+                    key = (seqnum, get_global_id(url_ids, url_id))
+                    merged_counts[key] = merged_counts.get(key, 0) + count
+
+    candidates = []
+    for (partition, result) in enumerate(results):
+        for (position, module_uri, (url_id, resource_id)) in result['candidates']:
+            candidates.append((position, module_uri,
+                               (get_global_id(id_maps['urls'][partition], url_id),
+                                get_global_id(id_maps['resources'][partition], resource_id))))
+    candidates.sort()
+    for (_, module_uri, candidate) in candidates:
+        module_candidates = pipe.curation_helper.candidate_resources.setdefault(module_uri, [])
+        if candidate not in module_candidates:
+            module_candidates.append(candidate)
+
+    # The rows were written with the writer's quoting, which reading
+    # without an escape character undoes exactly
+    for (table_name, id_columns) in EVENT_TABLES.iteritems():
+        writer = moocdb.csv_writers[table_name]
+        id_fields = [(MOOCdb.TABLES[table_name].index(column), id_table)
+                     for (column, id_table) in id_columns.iteritems()]
+        for (partition, partition_dir) in enumerate(partition_dirs):
+            with open(os.path.join(partition_dir, table_name + '.csv'), 'rb') as csv_file:
+                for row in csv.reader(csv_file, delimiter=',', quotechar='"'):
+                    for (field, id_table) in id_fields:
+                        row[field] = get_global_id(id_maps[id_table][partition], row[field])
+                    writer.store_row(row)
+
+
+def process_events_partitioned(moocdb, cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec,
+                               timestamp_format, workers, idle_timeout=None, progress_interval=10,
+                               metrics_path=None, profile=False):
+    '''
+    Processes the events in a pool of workers processes, one partition of
+    the users each, and writes their rows to moocdb. Returns an EventPipe
+    holding the merged ids, to serialize as after processing serially.
+    With profile, its profiler holds the timings of all the partitions.
+    '''
+    pipe = EventPipe(moocdb, cfg_csv_path['moocdb_csv_dir'], cfg_open_edx_spec,
+                     timestamp_format, profile=profile)
+    partition_dir = tempfile.mkdtemp(prefix='partitions_', dir=cfg_csv_path['moocdb_csv_dir'])
+    try:
+        print('* Splitting %s by user into %d partitions' %
+              (cfg_csv_path['edx_track_event_path'], workers))
+        progress = ProgressReporter(cfg_csv_path['edx_track_event_path'],
+                                    interval=progress_interval, metrics_path=metrics_path,
+                                    label='split')
+        events_paths = split_events(cfg_csv_path['edx_track_event_path'], cfg_csv_parsing,
+                                    partition_dir, workers, progress)
+        specs = []
+        for (partition, events_path) in enumerate(events_paths):
+            partition_csv_path = dict(cfg_csv_path)
+            partition_csv_path['edx_track_event_path'] = events_path
+            partition_csv_path['moocdb_csv_dir'] = os.path.join(partition_dir, str(partition))
+            os.mkdir(partition_csv_path['moocdb_csv_dir'])
+            specs.append((partition_csv_path, cfg_csv_parsing, cfg_open_edx_spec, timestamp_format,
+                          idle_timeout, progress_interval, metrics_path,
+                          'partition %d' % partition, profile))
+
+        pool = multiprocessing.Pool(processes=workers)
+        try:
+            # Results come back in the order of specs
+            results = pool.map(process_partition, specs, chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        print('* Merging the ids of the partitions')
+        merge_partitions(pipe, moocdb, [spec[0]['moocdb_csv_dir'] for spec in specs], results)
+        if profile:
+            for result in results:
+                pipe.profiler.merge(result['profile'])
+    finally:
+        shutil.rmtree(partition_dir)
+    return pipe
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+'''Tester for the merge of partitions in partition.py
+'''
+
+import unittest
+import tempfile
+import shutil
+import os
+from array import array
+import partition
+from extractor import CSVExtractor
+from helperclasses import DictionaryTable
+from moocdb import MOOCdb
+from resources import ResourceHierarchy, Resource
+
+
+class PartitionTest(unittest.TestCase):
+    '''Tester for the splitting and merging of partitions
+    '''
+
+    def setUp(self):
+        self.moocdb = MOOCdb(tempfile.gettempdir())
+        self.partition_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.moocdb.close()
+        for name in self.moocdb.TABLES:
+            os.remove(os.path.join(tempfile.gettempdir(), '%s.csv' % name))
+        shutil.rmtree(self.partition_dir)
+
+    def test_split_events(self):
+        '''The rows of each user go to the same partition, as they are
+        and in order, along with their position in the table.
+        '''
+        user_field = CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES.index('anon_screen_name')
+        rows = []
+        for (i, user) in enumerate(['u1', 'u2', 'u1', 'u3', 'u2', 'u1']):
+            fields = ["'%d'" % i] * len(CSVExtractor.EDX_TRACK_EVENT_FIELDNAMES)
+            fields[user_field] = "'%s'" % user
+            fields[1] = "'a\nmulti-line field'"
+            rows.append((user, ','.join(fields) + '\n'))
+        events_path = os.path.join(self.partition_dir, 'events.csv')
+        with open(events_path, 'w') as events:
+            events.write(''.join(row for (_, row) in rows))
+
+        paths = partition.split_events(events_path, {'quotechar': "'", 'escapechar': '\\'},
+                                       self.partition_dir, 2)
+        for (i, path) in enumerate(paths):
+            positions = array('l')
+            with open(path + '.positions', 'rb') as position_file:
+                positions.fromstring(position_file.read())
+            expected = [position for (position, (user, _)) in enumerate(rows)
+                        if partition.get_partition(user, 2) == i]
+            self.assertEqual(expected, list(positions))
+            with open(path) as partition_file:
+                self.assertEqual(''.join(rows[position][1] for position in expected),
+                                 partition_file.read())
+
+    def test_merge_dictionary_table(self):
+        '''Values get the ids they would get inserted serially,
+        in the order of the events that first inserted them.
+        '''
+        table = DictionaryTable(self.moocdb, 'urls')
+        id_maps = partition.merge_dictionary_table(table, [
+            (['b', 'a'], [1, 4]),
+            (['a', 'c'], [0, 2]),
+        ])
+        self.assertEqual(['a', 'b', 'c'], table.item_list)
+        self.assertEqual([[1, 0], [0, 2]], id_maps)
+
+    def test_merge_hierarchy(self):
+        '''Inserting the logged nodes of the partitions builds the hierarchy
+        built serially, names included, and local ids map to its ids.
+        '''
+        inserts = [
+            ('https://a/b/c/', '', 0),
+            ('https://a/d/', 'd', 1),
+            ('https://a/b/c/', 'c', 1),
+            ('https://a/b/', '', 0),
+            ('https://a/b/c/', 'other name', 0),
+        ]
+        serial = ResourceHierarchy(None, 'https://', Resource)
+        for (uri, name, _) in inserts:
+            serial.insert(Resource(uri, name))
+
+        partitions = [ResourceHierarchy(None, 'https://', Resource) for _ in range(2)]
+        logs = [partition.InsertLog(hierarchy, 'resource_name') for hierarchy in partitions]
+        for (position, (uri, name, i)) in enumerate(inserts):
+            logs[i].position = position
+            partitions[i].insert(Resource(uri, name))
+
+        merged = ResourceHierarchy(None, 'https://', Resource)
+        id_maps = partition.merge_hierarchy(
+            lambda uri, name, i: merged.insert(Resource(uri, name)),
+            [log.inserts for log in logs],
+            [partition.get_node_ids(hierarchy) for hierarchy in partitions],
+            lambda: partition.get_node_ids(merged))
+
+        self.assertEqual(str(serial), str(merged))
+        serial_ids = partition.get_node_ids(serial)
+        self.assertEqual(serial_ids, partition.get_node_ids(merged))
+        self.assertEqual('c', merged.get_known_parent('https://a/b/c/').resource_name)
+        for (hierarchy, id_map) in zip(partitions, id_maps):
+            for (uri, local_id) in partition.get_node_ids(hierarchy).iteritems():
+                self.assertEqual(serial_ids[uri], id_map[local_id])
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(PartitionTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
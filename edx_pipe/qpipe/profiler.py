@@ -0,0 +1,111 @@
+'''
+Wall time and call counts of the stages events go through in EventPipe,
+and of the steps of EventFormatter.polish, so that a slowdown can be
+traced to the stage it comes from. Stages are timed by wrapping the
+methods of the managers of a pipe, which are left as they are when
+not profiling.
+'''
+from __future__ import print_function
+
+import csv
+import time
+
+# Report written to the moocdb_csv_dir
+PROFILE_FILE_NAME = 'profile.csv'
+
+# Stages of a step of another stage are named '<stage>.<step>'
+STEP_SEPARATOR = '.'
+
+
+class StageProfiler(object):
+    '''
+    Accumulates the calls and seconds spent in each stage,
+    in the order the stages were instrumented.
+    '''
+
+    def __init__(self):
+        self.stages = []
+        self.timings = {}
+        self.start_time = time.time()
+        self.total = 0.0
+
+    def instrument(self, obj, method_name, stage):
+        '''
+        Replaces the method of obj with one timing its calls as stage.
+        '''
+        method = getattr(obj, method_name)
+        timing = self.add_stage(stage)
+        clock = time.time
+
+        def timed_method(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timing[0] += 1
+                timing[1] += clock() - start
+        setattr(obj, method_name, timed_method)
+
+    def add_stage(self, stage):
+        '''
+        Returns the [calls, seconds] of a stage, added if new.
+        '''
+        if stage not in self.timings:
+            self.stages.append(stage)
+            self.timings[stage] = [0, 0.0]
+        return self.timings[stage]
+
+    def finish(self):
+        '''
+        Records the time elapsed since the profiler was created
+        as the total the stages are part of.
+        '''
+        self.total = time.time() - self.start_time
+
+    def get_stats(self):
+        '''
+        Returns the stages, their timings and the total, as merge expects.
+        '''
+        return {
+            'stages': list(self.stages),
+            'timings': dict((stage, list(timing)) for (stage, timing) in self.timings.iteritems()),
+            'total': self.total
+        }
+
+    def merge(self, stats):
+        '''
+        Adds the timings of another profiler, such as that of a
+        partition processed in another process (see partition.py).
+        '''
+        for stage in stats['stages']:
+            timing = self.add_stage(stage)
+            timing[0] += stats['timings'][stage][0]
+            timing[1] += stats['timings'][stage][1]
+        self.total += stats['total']
+
+    def get_rows(self):
+        '''
+        Returns a row (stage, calls, seconds, microseconds per call,
+        percentage of the total) per stage, and one for the time
+        spent outside the stages, such as reading the events.
+        '''
+        def get_row(stage, calls, seconds):
+            return (stage, calls, '%0.3f' % seconds,
+                    '%0.1f' % (1e6 * seconds / calls if calls else 0.0),
+                    '%0.1f' % (100.0 * seconds / self.total if self.total else 0.0))
+
+        rows = [get_row(stage, *self.timings[stage]) for stage in self.stages]
+        in_stages = sum(seconds for (stage, (calls, seconds)) in self.timings.iteritems()
+                        if STEP_SEPARATOR not in stage)
+        rows.append(get_row('other', 0, max(self.total - in_stages, 0.0)))
+        rows.append(get_row('total', 0, self.total))
+        return rows
+
+    def write_report(self, path):
+        '''
+        Writes the rows of get_rows, with a header, as CSV.
+        '''
+        with open(path, 'wb') as report:
+            writer = csv.writer(report)
+            writer.writerow(['stage', 'calls', 'seconds', 'us_per_call', 'percent'])
+            writer.writerows(self.get_rows())
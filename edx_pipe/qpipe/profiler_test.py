@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+'''Tester for the StageProfiler class
+'''
+
+import unittest
+import tempfile
+import os
+from profiler import StageProfiler
+
+
+class Manager(object):
+    def step(self, value):
+        return value + 1
+
+    def stage(self, value):
+        return self.step(value) * 2
+
+    def fail(self):
+        raise ValueError('failed')
+
+
+class StageProfilerTest(unittest.TestCase):
+    '''Tester for the StageProfiler class
+    '''
+
+    def setUp(self):
+        self.manager = Manager()
+        self.profiler = StageProfiler()
+        self.profiler.instrument(self.manager, 'stage', 'stage')
+        self.profiler.instrument(self.manager, 'step', 'stage.step')
+        self.profiler.instrument(self.manager, 'fail', 'fail')
+
+    def test_instrument(self):
+        '''Instrumented methods return as before, and their calls
+        are counted, including those raising.
+        '''
+        self.assertEqual(4, self.manager.stage(1))
+        self.assertEqual(2, self.manager.step(1))
+        self.assertRaises(ValueError, self.manager.fail)
+        self.assertEqual(['stage', 'stage.step', 'fail'], self.profiler.stages)
+        self.assertEqual([1, 2, 1], [self.profiler.timings[stage][0]
+                                     for stage in self.profiler.stages])
+
+    def test_merge_and_report(self):
+        '''Timings of other profilers are added, and the time outside
+        the stages is reported, steps not being counted twice.
+        '''
+        self.manager.stage(1)
+        stats = {
+            'stages': ['stage', 'stage.step', 'other_stage'],
+            'timings': {'stage': [2, 3.0], 'stage.step': [2, 2.0], 'other_stage': [1, 1.0]},
+            'total': 5.0
+        }
+        self.profiler.timings['stage'][1] = 1.0
+        self.profiler.timings['stage.step'][1] = 0.5
+        self.profiler.total = 3.0
+        self.profiler.merge(stats)
+        rows = self.profiler.get_rows()
+        self.assertEqual(('stage', 3, '4.000', '1333333.3', '50.0'), rows[0])
+        self.assertEqual(('stage.step', 3, '2.500'), rows[1][:3])
+        self.assertEqual(('other_stage', 1, '1.000'), rows[3][:3])
+        self.assertEqual(('other', 0, '3.000'), rows[-2][:3])
+        self.assertEqual(('total', 0, '8.000'), rows[-1][:3])
+
+        (fd, path) = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            self.profiler.write_report(path)
+            with open(path) as report:
+                lines = report.read().splitlines()
+            self.assertEqual('stage,calls,seconds,us_per_call,percent', lines[0])
+            self.assertEqual(len(rows) + 1, len(lines))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(StageProfilerTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
@@ -0,0 +1,114 @@
+'''
+Progress of the processing of a file, reported from the byte offset
+reached in it, so that the file needs no counting of its rows beforehand.
+Where the total size is not known, such as for rows streamed from apipe,
+rows and throughput are reported without a share or ETA.
+'''
+from __future__ import print_function
+
+import json
+import os
+import resource
+import sys
+import time
+
+
+def get_rss():
+    '''
+    Returns the resident set size of the process, in bytes. Where
+    /proc is not available, returns its peak resident set size.
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ProgressReporter(object):
+    '''
+    Reports rows processed, rows/sec, MB/sec, ETA and RSS every interval
+    seconds: to stderr, or as a JSON object per line appended to the
+    metrics file if one is given. path is None if the total size is
+    not known.
+    '''
+    # Rows between two looks at the clock
+    CHECK_EVERY = 100
+
+    def __init__(self, path, interval=10, metrics_path=None, label=''):
+        self.path = path
+        self.total_bytes = os.path.getsize(path) if path else None
+        self.interval = interval
+        self.metrics_path = metrics_path
+        self.label = label or os.path.basename(path or '')
+        self.start_time = time.time()
+        self.last_report_time = self.start_time
+
+    def update(self, rows, offset):
+        '''
+        Called with the rows processed so far and the byte offset
+        reached in the file; reports if interval has elapsed.
+        '''
+        if rows % self.CHECK_EVERY:
+            return
+        now = time.time()
+        if now - self.last_report_time >= self.interval:
+            self.last_report_time = now
+            self.report(rows, offset, now)
+
+    def finish(self, rows, offset=None):
+        '''
+        Reports the final figures, the whole file having been processed,
+        up to offset if the total size is not known.
+        '''
+        if self.total_bytes is not None:
+            offset = self.total_bytes
+        self.report(rows, offset or 0, time.time())
+
+    def get_metrics(self, rows, offset, now):
+        elapsed = max(now - self.start_time, 1e-6)
+        bytes_per_sec = offset / elapsed
+        if bytes_per_sec > 0 and self.total_bytes is not None:
+            eta = (self.total_bytes - offset) / bytes_per_sec
+        else:
+            eta = None
+        if self.total_bytes is None:
+            progress = None
+        elif self.total_bytes:
+            progress = 100.0 * offset / self.total_bytes
+        else:
+            progress = 100.0
+        return {
+            'time': now,
+            'label': self.label,
+            'rows': rows,
+            'bytes': offset,
+            'total_bytes': self.total_bytes,
+            'progress': progress,
+            'rows_per_sec': rows / elapsed,
+            'mb_per_sec': bytes_per_sec / (1 << 20),
+            'eta_sec': eta,
+            'rss_mb': get_rss() / float(1 << 20)
+        }
+
+    def report(self, rows, offset, now):
+        metrics = self.get_metrics(rows, offset, now)
+        if self.metrics_path:
+            # A single write of a line, so that several processes
+            # appending to the same file do not interleave
+            with open(self.metrics_path, 'a') as metrics_file:
+                metrics_file.write(json.dumps(metrics, sort_keys=True) + '\n')
+        else:
+            if metrics['eta_sec'] is None:
+                eta = '?'
+            else:
+                eta = '%dm%02ds' % divmod(int(metrics['eta_sec']), 60)
+            if metrics['progress'] is None:
+                progress = '?'
+            else:
+                progress = '%0.1f%%' % metrics['progress']
+            print('[%s] %s  %d rows  %d rows/s  %0.2f MB/s  ETA %s  RSS %d MB' %
+                  (metrics['label'], progress, rows, metrics['rows_per_sec'],
+                   metrics['mb_per_sec'], eta, metrics['rss_mb']),
+                  file=sys.stderr)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+'''Tester for the ProgressReporter class
+'''
+
+import unittest
+import tempfile
+import json
+import os
+from progress import ProgressReporter
+
+
+class ProgressReporterTest(unittest.TestCase):
+    '''Tester for the ProgressReporter class
+    '''
+
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix='.csv')
+        os.write(fd, 'x' * 1000)
+        os.close(fd)
+        (fd, self.metrics_path) = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+        os.remove(self.metrics_path)
+
+    def read_metrics(self):
+        with open(self.metrics_path) as metrics_file:
+            return [json.loads(line) for line in metrics_file]
+
+    def test_report(self):
+        '''Progress is the share of the file's bytes reached,
+        reported as JSON lines once interval has elapsed.
+        '''
+        progress = ProgressReporter(self.path, interval=3600,
+                                    metrics_path=self.metrics_path, label='test')
+        progress.update(100, 250)
+        self.assertEqual([], self.read_metrics())
+
+        progress.interval = 0
+        progress.update(150, 250)
+        self.assertEqual([], self.read_metrics())
+        progress.update(200, 250)
+        progress.finish(400)
+        metrics = self.read_metrics()
+        self.assertEqual([(200, 250, 25.0), (400, 1000, 100.0)],
+                         [(line['rows'], line['bytes'], line['progress']) for line in metrics])
+        self.assertEqual('test', metrics[0]['label'])
+        self.assertEqual(1000, metrics[0]['total_bytes'])
+        self.assertTrue(metrics[0]['eta_sec'] > 0)
+        self.assertTrue(metrics[0]['rss_mb'] > 0)
+
+    def test_report_unknown_size(self):
+        '''Without a file, there is no share of it or ETA, and
+        the final figures are those of the offset reached.
+        '''
+        progress = ProgressReporter(None, interval=0, metrics_path=self.metrics_path,
+                                    label='stream')
+        progress.update(100, 250)
+        progress.finish(150, 400)
+        metrics = self.read_metrics()
+        self.assertEqual([(100, 250), (150, 400)],
+                         [(line['rows'], line['bytes']) for line in metrics])
+        self.assertEqual([None, None], [line['progress'] for line in metrics])
+        self.assertEqual([None, None], [line['eta_sec'] for line in metrics])
+        self.assertIsNone(metrics[0]['total_bytes'])
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(ProgressReporterTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
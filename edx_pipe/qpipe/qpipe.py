@@ -7,79 +7,104 @@ to curated MySQL database in MOOCdb format
 '''
 from __future__ import print_function
 
-import sys
 import os
+import shutil
+import tempfile
 import time
-from subprocess import check_output, Popen, PIPE
+from subprocess import Popen, PIPE
 
 # qpipe modules
+import eventsort
 import extractor
-from clickevents import ClickEventsManager
-from eventformatter import EventFormatter
-from resources import ResourceManager
-from eventmanager import EventManager
-from submissions import SubmissionManager
-from helperclasses import CurationHelper
+import partition
+from profiler import PROFILE_FILE_NAME
+from progress import ProgressReporter
+from eventpipe import EventPipe
 from moocdb import MOOCdb
 
 
-def process_events(cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec, timestamp_format):
+def process_events(cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec, timestamp_format,
+                   workers=1, idle_timeout=None, sort_by=None, progress_interval=10,
+                   metrics_path=None, row_batches=None, profile=False):
+    '''
+    With workers > 1, the events are processed in that many processes,
+    partitioned by user (see partition.py).
+
+    With an idle_timeout in minutes, the location and staged event of users
+    idle for that long are dropped, the staged event being stored with the
+    default duration (see eventmanager.py), so that memory follows the
+    users active lately rather than all the users seen. The idle_timeout
+    must exceed MAX_DURATION_MINUTES (see events.py).
+
+    With sort_by 'time', or 'user' for user then time, the events are
+    first sorted in that order (see eventsort.py), for logs whose events
+    are out of order.
+
+    Progress is reported every progress_interval seconds to stderr, or
+    as JSON lines appended to metrics_path if given (see progress.py).
+
+    With row_batches, the batches of rows apipe produces in the same run
+    (see json2sql.convertToRows), the events are taken from them rather
+    than from the intermediary CSV files. They are then processed
+    serially, in the order apipe produces them.
+
+    With profile, the wall time and calls of each stage of the processing
+    of events are written to profile.csv in the moocdb_csv_dir (see
+    profiler.py). Timing the stages slows the processing down a little.
+    '''
     print('****** Processing events *******')
+    if row_batches is not None and (workers > 1 or sort_by):
+        print('* Rows from apipe are processed serially and unsorted')
+        workers = 1
+        sort_by = None
 
     events_processing_duration = time.time()
 
     # MOOCdb storage interface
     moocdb = MOOCdb(cfg_csv_path['moocdb_csv_dir'])
 
-    # Instanciating the piping architecture
-    event_formatter = EventFormatter(moocdb, TIMESTAMP_FORMAT=timestamp_format)
-    resource_manager = ResourceManager(moocdb, HIERARCHY_ROOT='https://')
-    event_manager = EventManager(moocdb)
-    submission_manager = SubmissionManager(moocdb)
-    curation_helper = CurationHelper(cfg_csv_path['moocdb_csv_dir'])
-    clickevents_manager = ClickEventsManager(moocdb)
-
-    print("Processing %s" % cfg_csv_path['edx_track_event_path'])
-    extract = extractor.CSVExtractor(cfg_csv_path, cfg_csv_parsing)
-
-    num_rows = int(
-        check_output(["wc", "-l", cfg_csv_path['edx_track_event_path']]).split(" ")[0])
-    event_count = 0
-
-    for raw_event in extract:
-        event_count += 1
-        if event_count % 500 == 0:
-            progress = 'Progress: %0.4f%%' % (100.0 * float(event_count) /
-                                                    float(num_rows))
-            # A print statement is not used here because
-            # a newline is automatically appended on each print, whereas
-            # we want to use the CR character to move the terminal
-            # pointer back to the beginning of the same line.
-            print(progress)
-            sys.stdout.write("\033[F")
-
-        # Skip events explicitly not handled by qpipe
-        if event_formatter.pass_filter(raw_event) is False:
-            continue
-
-        event = event_formatter.polish(raw_event)
-
-        resource_id = resource_manager.create_resource(event)
-
-        event.set_data_attr('resource_id', resource_id)
-        submission_manager.update_submission_tables(event)
-        curation_helper.record_curation_hints(event)
-        clickevents_manager.record(event, cfg_open_edx_spec)
-        event_manager.store_event(event)
+    sort_dir = None
+    try:
+        if sort_by:
+            events_path = cfg_csv_path['edx_track_event_path']
+            sort_dir = tempfile.mkdtemp(prefix='sorted_', dir=cfg_csv_path['moocdb_csv_dir'])
+            cfg_csv_path = dict(cfg_csv_path)
+            cfg_csv_path['edx_track_event_path'] = os.path.join(sort_dir,
+                                                                os.path.basename(events_path))
+            print('* Sorting %s by %s' % (events_path, sort_by))
+            progress = ProgressReporter(events_path, interval=progress_interval,
+                                        metrics_path=metrics_path, label='sort')
+            eventsort.sort_events(events_path, cfg_csv_parsing,
+                                  cfg_csv_path['edx_track_event_path'], sort_by, workers,
+                                  progress=progress)
+
+        if workers > 1:
+            pipe = partition.process_events_partitioned(
+                moocdb, cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec, timestamp_format,
+                workers, idle_timeout, progress_interval, metrics_path, profile)
+        else:
+            pipe = process_events_serially(moocdb, cfg_csv_path, cfg_csv_parsing,
+                                           cfg_open_edx_spec, timestamp_format, idle_timeout,
+                                           progress_interval, metrics_path, row_batches,
+                                           profile)
+    finally:
+        if sort_dir:
+            shutil.rmtree(sort_dir)
 
     print('* All events processed')
+    event_formatter = pipe.event_formatter
+    print('* Agent cache: %d hits, %d misses (%0.2f%% hit rate)' %
+          (event_formatter.agent_cache_hits, event_formatter.agent_cache_misses,
+           100 * event_formatter.get_agent_cache_hit_rate()))
     print('* Writing CSV output to : %s' % cfg_csv_path['moocdb_csv_dir'])
 
-    event_formatter.serialize()
-    event_manager.serialize()
-    resource_manager.serialize(pretty_print_to=cfg_csv_path['resource_hierarchy_path'])
-    submission_manager.serialize(pretty_print_to=cfg_csv_path['problem_hierarchy_path'])
-    curation_helper.serialize()
+    if pipe.profiler:
+        profile_path = os.path.join(cfg_csv_path['moocdb_csv_dir'], PROFILE_FILE_NAME)
+        print('* Writing the profile of the stages to : %s' % profile_path)
+        pipe.profiler.write_report(profile_path)
+
+    pipe.serialize(cfg_csv_path['resource_hierarchy_path'],
+                   cfg_csv_path['problem_hierarchy_path'])
 
     print('* Writing resource hierarchy to : %s' % cfg_csv_path['resource_hierarchy_path'])
     print('* Writing problem hierarchy to : %s' % cfg_csv_path['problem_hierarchy_path'])
@@ -104,3 +129,41 @@ def process_events(cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec, timestamp_f
     except OSError:
         pass
     moocdb.close()
+
+    for (table_name, (rows, size)) in sorted(moocdb.get_stats().iteritems()):
+        print('* Wrote %d rows, %d bytes to %s.csv' % (rows, size, table_name))
+
+
+def process_events_serially(moocdb, cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec,
+                            timestamp_format, idle_timeout=None, progress_interval=10,
+                            metrics_path=None, row_batches=None, profile=False):
+    # Instanciating the piping architecture
+    pipe = EventPipe(moocdb, cfg_csv_path['moocdb_csv_dir'], cfg_open_edx_spec,
+                     timestamp_format, idle_timeout, profile)
+
+    if row_batches is not None:
+        print("Processing the rows of apipe")
+        extract = extractor.StreamExtractor(row_batches)
+        # The size of the translated log is not known beforehand
+        progress = ProgressReporter(None, interval=progress_interval,
+                                    metrics_path=metrics_path, label='apipe rows')
+    else:
+        print("Processing %s" % cfg_csv_path['edx_track_event_path'])
+        extract = extractor.CSVExtractor(cfg_csv_path, cfg_csv_parsing)
+
+        # Progress is measured by the offset reached in the file,
+        # rather than counting its rows beforehand
+        progress = ProgressReporter(cfg_csv_path['edx_track_event_path'],
+                                    interval=progress_interval, metrics_path=metrics_path)
+    event_count = 0
+
+    for raw_event in extract:
+        event_count += 1
+        progress.update(event_count, extract.tell())
+
+        pipe.process(raw_event)
+
+    progress.finish(event_count, extract.tell())
+    if pipe.profiler:
+        pipe.profiler.finish()
+    return pipe
@@ -3,8 +3,7 @@ from __future__ import print_function
 import re
 import os
 
-import util
-from helperclasses import DictionaryTable
+from helperclasses import DictionaryTable, RuleTable
 
 
 class Node(object):
@@ -14,6 +13,12 @@ class Node(object):
         self.parent_id = None
         self.child_number = None
         self.children = []
+        # Index of the children whose URI is this node's URI plus one
+        # '/'-terminated path segment, which is how insert() builds them:
+        # uri -> (position in children, node). Any other children are
+        # kept, in order, in irregular_children.
+        self.children_by_uri = {}
+        self.irregular_children = []
 
     def append_child(self, node):
         '''
@@ -22,6 +27,32 @@ class Node(object):
         if node:
             self.children.append(node)
             node.parent_id = self._id
+            position = len(self.children) - 1
+            if node.uri.startswith(self.uri) and \
+                    node.uri.find('/', len(self.uri)) == len(node.uri) - 1:
+                # The first of several children with the same URI wins
+                self.children_by_uri.setdefault(node.uri, (position, node))
+            else:
+                self.irregular_children.append((position, node))
+
+    def find_child_in(self, uri):
+        '''
+        Returns the first child whose URI is contained in uri, or None.
+        Regular children are found by looking up the prefix of uri that
+        extends this node's URI by one segment.
+        '''
+        (child_position, child) = (None, None)
+        if uri.startswith(self.uri):
+            segment_end = uri.find('/', len(self.uri))
+            if segment_end != -1:
+                (child_position, child) = self.children_by_uri.get(
+                    uri[:segment_end + 1], (None, None))
+        for (position, irregular_child) in self.irregular_children:
+            if child is not None and position > child_position:
+                break
+            if irregular_child.uri in uri:
+                return irregular_child
+        return child
 
     def __str__(self, increment='-'):
         return self.print_lineage(self, increment, increment)
@@ -131,18 +162,17 @@ class ResourceHierarchy(object):
         node._id = self.size
 
     def get_known_parent(self, uri):
-        def rec_search(node, uri):
-            search_under = None
-            for child in node.children:
-                if child.uri in uri:
-                    search_under = child
-                    break
-            if search_under:
-                return rec_search(search_under, uri)
-            else:
-                return node
-
-        return rec_search(self.hierarchy, uri)
+        '''
+        Returns the deepest node whose URI is contained in uri, descending
+        from the root through the first such child at each level. Takes
+        one dict lookup per level, however many children the nodes have.
+        '''
+        node = self.hierarchy
+        search_under = node.find_child_in(uri)
+        while search_under is not None:
+            node = search_under
+            search_under = node.find_child_in(uri)
+        return node
 
     def rec_store_resource(self, node):
         self.resources.store(node.get_row())
@@ -264,6 +294,10 @@ class ResourceManager(object):
             'open_ended': 'text'
         }
 
+        # Compiled once, trying the rules in the dicts' iteration order
+        self.content_table = RuleTable(self.content_rules.iteritems())
+        self.medium_table = RuleTable(self.medium_rules.iteritems())
+
     def create_resource(self, event):
         resource_uri = event.get_uri()
         resource_name = event.get_resource_display_name()
@@ -272,43 +306,28 @@ class ResourceManager(object):
         if not resource_uri:
             return None
 
-        new_resource = Resource(resource_uri, resource_name)
-        new_resource_type = self.determine_resource_type(event)
-
-        # Inserts resource into hierarchy
-        # Sets the resource's id and type
-
-        new_resource.content = new_resource_type[0]
-        new_resource.medium = new_resource_type[1]
-
         # Record resource url mapping
-        new_resource_id = self.resource_hierarchy.insert(new_resource)
+        new_resource_id = self.insert_resource(resource_uri, resource_name)
         self.resources_urls.insert((new_resource_id, event['url_id']))
 
         # Return resource ID generated at insertion in the hierarchy
         return new_resource_id
 
-    def determine_resource_type(self, event):
-        # Build an array with the useful attributes
-        # for making the inference
-        array = {}
-        array['class_name'] = event.__class__.__name__
-        array['uri'] = event.get_uri()
-        array['resource_name'] = event['resource_display_name']
-
-        content = None
-        for (regex, category) in self.content_rules.iteritems():
-            if util.match_regex([regex], "uri", array):
-                content = category
-                break
+    def insert_resource(self, resource_uri, resource_name=''):
+        '''
+        Inserts the resource into the hierarchy, setting its type.
+        Returns its id.
+        '''
+        new_resource = Resource(resource_uri, resource_name)
+        (new_resource.content, new_resource.medium) = self.get_resource_type(str(resource_uri))
+        return self.resource_hierarchy.insert(new_resource)
 
-        medium = None
-        for (regex, category) in self.medium_rules.iteritems():
-            if util.match_regex([regex], "uri", array):
-                medium = category
-                break
+    def determine_resource_type(self, event):
+        return self.get_resource_type(str(event.get_uri()))
 
-        return (content, medium)
+    def get_resource_type(self, uri):
+        # Both the content and medium are inferred from the URI
+        return (self.content_table.lookup(uri), self.medium_table.lookup(uri))
 
     # Functions to build resource type dictionary table
     # and set resource_type_id values.
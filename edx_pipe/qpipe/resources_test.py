@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+'''Tester for ResourceHierarchy
+'''
+
+import unittest
+from resources import ResourceHierarchy, Resource
+
+
+class ResourceHierarchyTest(unittest.TestCase):
+    '''Tester for the ResourceHierarchy class
+    '''
+
+    def linear_known_parent(self, hierarchy, uri):
+        '''The known parent as found by scanning all children
+        of each node, first match wins.
+        '''
+        node = hierarchy.hierarchy
+        while True:
+            matches = [child for child in node.children if child.uri in uri]
+            if not matches:
+                return node
+            node = matches[0]
+
+    def test_get_known_parent(self):
+        '''Inserting many siblings, and a child without a trailing slash,
+        the indexed lookup finds the same parents as a linear scan.
+        '''
+        hierarchy = ResourceHierarchy(None, 'https://', Resource)
+        uris = ['https://www.edx.org/courses/org/course/run/courseware/unit%d/sub%d/' % (i % 7, i)
+                for i in range(200)]
+        uris.append('https://www.edx.org/courses/org/course/run/info')
+        uris.append('https://www.edx.org/courses/org/course/run/infobox/')
+        for uri in uris:
+            self.assertIs(self.linear_known_parent(hierarchy, uri),
+                          hierarchy.get_known_parent(uri))
+            hierarchy.insert(Resource(uri))
+        for uri in uris + ['https://www.edx.org/courses/org/course/run/courseware/unit3/new/',
+                           'https://unknown/']:
+            self.assertIs(self.linear_known_parent(hierarchy, uri),
+                          hierarchy.get_known_parent(uri))
+
+    def test_insert_ids(self):
+        '''Intermediary nodes are numbered before the resource,
+        and inserting a known URI returns its id.
+        '''
+        hierarchy = ResourceHierarchy(None, 'https://', Resource)
+        self.assertEqual(3, hierarchy.insert(Resource('https://a/b/c/')))
+        self.assertEqual(4, hierarchy.insert(Resource('https://a/d/')))
+        self.assertEqual(2, hierarchy.insert(Resource('https://a/b/')))
+        self.assertEqual(1, hierarchy.get_known_parent('https://a/d/').parent_id)
+
+
+if __name__ == '__main__':
+    SUITE = unittest.TestLoader().loadTestsFromTestCase(ResourceHierarchyTest)
+    unittest.TextTestRunner(verbosity=2).run(SUITE)
@@ -4,7 +4,7 @@ import helperclasses
 # Handles formatting of raw i4x events
 def format_i4x(raw_event):
     # Parsing event_type
-    module = helperclasses.ModuleURI(raw_event['event_type'])
+    module = helperclasses.module_uris.get(raw_event['event_type'])
 
     # Construct and set event_type
     raw_event['event_type'] = 'i4x_' + str(module.category) + '_' + str(
@@ -45,5 +45,6 @@ def format_seq(raw_event):
     if not goto_dest:
         return
 
+    # The URL may be shared with other events, so it is copied
     if url.get_sub_unit():
-        url.set_seq(goto_dest)
+        raw_event['page'] = url.with_seq(goto_dest)
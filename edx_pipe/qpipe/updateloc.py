@@ -1,7 +1,6 @@
 '''
 Functions for keeping track of updating locations.
 '''
-import copy
 
 # Each rule has to return the new location of the user
 # If the user is previously engaged, the 'current_location' field is available in raw_event
@@ -21,9 +20,7 @@ def update_seq(raw_event):
     with an update sequence number according to the
     goto_dest field
     '''
-    url_copy = copy.copy(raw_event['page'])
-    url_copy.set_seq(raw_event['goto_dest'])
-    return url_copy
+    return raw_event['page'].with_seq(raw_event['goto_dest'])
 
 
 def close_previous_page(raw_event):
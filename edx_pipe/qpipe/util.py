@@ -7,6 +7,8 @@ from subprocess import call
 import mysql.connector
 import sqlparse
 
+from mysqlload import TableLoader, split_secondary_keys
+
 # Returns True if any of the regex match the specified field
 # False otherwise.
 
@@ -19,7 +21,11 @@ def match_regex(regexes, field, dictionary):
     return False
 
 
-def create_mysql(cfg_mysql, cfg_data_file, cfg_mysql_script_path):
+def create_mysql(cfg_mysql, cfg_data_file, cfg_mysql_script_path, defer_keys=False):
+    '''
+    With defer_keys, the tables are created without their secondary
+    keys, which fill_mysql adds once they are loaded (see mysqlload.py).
+    '''
     print('****** Create and Curate MySQL db from csv files *******')
     print('Creating MySQL Database : %s' % cfg_mysql['database'])
     # Create the .sql script for DB creation
@@ -27,6 +33,8 @@ def create_mysql(cfg_mysql, cfg_data_file, cfg_mysql_script_path):
     to_be_replaced = ['DB_NAME']
     replace_by = [cfg_mysql['database']]
     replaced_script = replaceWordsInFile(filename, to_be_replaced, replace_by)
+    if defer_keys:
+        replaced_script = split_secondary_keys(replaced_script)[0]
     create_name = "create_to_mysqlDB_%s.sql" % cfg_data_file['course_folder']
     create_script = open(create_name, "w")
     create_script.write(replaced_script)
@@ -38,7 +46,14 @@ def create_mysql(cfg_mysql, cfg_data_file, cfg_mysql_script_path):
     os.remove(create_name)
 
 
-def fill_mysql(cfg_mysql, cfg_csv_path, cfg_data_file, mysql_script):
+def fill_mysql(cfg_mysql, cfg_csv_path, cfg_data_file, mysql_script,
+               workers=None, create_script=None, index_workers=1):
+    '''
+    With workers, the tables of mysql_script are loaded that many at a
+    time over a pool of connections, rather than by the mysql client,
+    and the secondary keys of create_script, if given, are then added
+    to those lacking them, index_workers tables at a time.
+    '''
     print('Filling MYSQL Database : %s with csv files data for %s' %
           (cfg_mysql['database'], cfg_data_file['course_folder']))
 
@@ -47,6 +62,12 @@ def fill_mysql(cfg_mysql, cfg_csv_path, cfg_data_file, mysql_script):
     to_be_replaced = ['MOOCDB_DIR', 'DB_NAME']
     replace_by = [cfg_csv_path['moocdb_csv_dir'], cfg_mysql['database']]
     replaced_script = replaceWordsInFile(filename, to_be_replaced, replace_by)
+    if workers:
+        keys = None
+        if create_script:
+            keys = split_secondary_keys(open(create_script).read())[1]
+        TableLoader(cfg_mysql, workers).load(replaced_script, keys, index_workers)
+        return
     copy_name = "copy_to_mysqlDB_%s.sql" % cfg_data_file['course_folder']
     copy_script = open(copy_name, "w")
     copy_script.write(replaced_script)
@@ -2,52 +2,91 @@
 """
 This is the complete moocdb moocdb/MOOC-Learner-Curated, translation followed by curation and vismooc extensions.
 After configuration, run in the command line using:
-python full_pipe.py
+python full_pipe.py [config file] [--fused [--keep-intermediary]]
+                   [--apipe-workers N] [--resume]
+                   [--load-workers N [--index-workers N]]
+                   [--qpipe-workers N] [--idle-timeout MINUTES] [--sort-by {time,user}]
+                   [--progress-interval SECONDS] [--metrics-path PATH] [--profile]
 """
 
 from __future__ import print_function
 
+import argparse
 import sys
 
 from config import config
 from curation.curation import curate
-from edx_pipe.edx_pipe import run_folder_setup, write_full_pipe_log, run_apipe
+from edx_pipe.edx_pipe import run_folder_setup, write_full_pipe_log, run_apipe, run_fused_pipe
 from edx_pipe.qpipe import qpipe, util as qpipe_util
 from vismooc_extensions.vismooc_extensions import process_vismooc
 from newmitx_extensions.newmitx_extensions import process_newmitx
 
 
-def run_edx():
+def run_edx(fused=False, keep_intermediary=False, load_workers=None, index_workers=1,
+            qpipe_options=None, apipe_options=None):
     """
     edx pipe
+
+    With fused, apipe and qpipe's event processing run together, without
+    the intermediary CSV files, unless keep_intermediary (see run_fused_pipe).
+    With load_workers, the MOOCdb tables are created without their secondary
+    keys, loaded that many at a time, then indexed (see qpipe/mysqlload.py).
+    qpipe_options are passed on to qpipe's process_events, such as its
+    workers, idle_timeout, sort_by or profile, and apipe_options to
+    run_apipe, its workers and resume.
     """
+    qpipe_options = qpipe_options or {}
+    apipe_options = apipe_options or {}
     cfg_csv_path = cfg.get_csv_path()
     cfg_data_file = cfg.get_data_file()
     cfg_mysql_script_path = cfg.get_mysql_script_path()
     cfg_open_edx_spec = cfg.get_open_edx_spec()
     cfg_csv_parsing = cfg.get_csv_parsing()
 
-    if cfg.get_or_query_pipeline("folder_setup"):
-        run_folder_setup(cfg_csv_path, cfg_data_file)
+    # The fused pipe needs the qpipe answers before apipe runs;
+    # each question is still asked only once
+    answers = {}
 
-    write_full_pipe_log(cfg_data_file)
+    def query_pipeline(pipeline_name):
+        if pipeline_name not in answers:
+            answers[pipeline_name] = cfg.get_or_query_pipeline(pipeline_name)
+        return answers[pipeline_name]
 
-    if cfg.get_or_query_pipeline("apipe"):
-        print ("(WARNING: This will remove all files in the intermediary_csv folder)")
-        run_apipe(cfg_csv_path, cfg_data_file)
+    if query_pipeline("folder_setup"):
+        run_folder_setup(cfg_csv_path, cfg_data_file)
 
-    if cfg.get_or_query_pipeline("qpipe"):
+    write_full_pipe_log(cfg_data_file)
 
-        if cfg.get_or_query_pipeline("qpipe:qpipe_process_events"):
+    events_processed = False
+    if query_pipeline("apipe"):
+        if not apipe_options.get('resume'):
+            print ("(WARNING: This will remove all files in the intermediary_csv folder)")
+        if fused and query_pipeline("qpipe") and \
+                query_pipeline("qpipe:qpipe_process_events"):
+            run_fused_pipe(cfg_csv_path, cfg_data_file, cfg_csv_parsing, cfg_open_edx_spec,
+                           keep_intermediary, qpipe_options,
+                           apipe_workers=apipe_options.get('workers', 1))
+            events_processed = True
+        else:
+            run_apipe(cfg_csv_path, cfg_data_file, **apipe_options)
+
+    if query_pipeline("qpipe"):
+
+        if not events_processed and query_pipeline("qpipe:qpipe_process_events"):
             qpipe.process_events(cfg_csv_path, cfg_csv_parsing, cfg_open_edx_spec,
-                                 timestamp_format=cfg_csv_parsing['timestamp_format'])
+                                 timestamp_format=cfg_csv_parsing['timestamp_format'],
+                                 **qpipe_options)
 
-        if cfg.get_or_query_pipeline("qpipe:qpipe_create_db"):
-            qpipe_util.create_mysql(cfg_mysql, cfg_data_file, cfg_mysql_script_path)
+        if query_pipeline("qpipe:qpipe_create_db"):
+            qpipe_util.create_mysql(cfg_mysql, cfg_data_file, cfg_mysql_script_path,
+                                    defer_keys=bool(load_workers))
 
-        if cfg.get_or_query_pipeline("qpipe:qpipe_populate_db"):
+        if query_pipeline("qpipe:qpipe_populate_db"):
             qpipe_util.fill_mysql(cfg_mysql, cfg_csv_path, cfg_data_file,
-                                  mysql_script=cfg_mysql_script_path['qpipe_copy_db_path'])
+                                  mysql_script=cfg_mysql_script_path['qpipe_copy_db_path'],
+                                  workers=load_workers,
+                                  create_script=cfg_mysql_script_path['qpipe_create_db_path'],
+                                  index_workers=index_workers)
 
 
 def run_curation():
@@ -98,24 +137,75 @@ def run_newmitx():
                                   mysql_script=cfg_mysql_script_path['newmitx_extensions_import_path'])
 
 
-def main():
+def main(fused=False, keep_intermediary=False, load_workers=None, index_workers=1,
+         qpipe_options=None, apipe_options=None):
     '''
     Main function handler for full pipe.
     This is a wrapper around edx_pipe, curation, and vismooc_extensions.
     '''
-    run_edx()
+    run_edx(fused, keep_intermediary, load_workers, index_workers, qpipe_options,
+            apipe_options)
     run_curation()
     run_vismooc()
     run_newmitx()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(prog='full_pipe.py')
+    parser.add_argument('config_file', nargs='?',
+                        help='config file; the default one of the config module if omitted')
+    parser.add_argument('--fused', action='store_true',
+                        help='process the rows of apipe in qpipe as they are translated, '
+                             'without writing the intermediary CSV files')
+    parser.add_argument('--keep-intermediary', action='store_true',
+                        help='with --fused, write the intermediary CSV files as well, for debugging')
+    parser.add_argument('--apipe-workers', type=int, default=1, metavar='N',
+                        help='translate the tracking log in N processes: byte ranges of an '
+                             'uncompressed log, or whole files of a directory of daily logs')
+    parser.add_argument('--resume', action='store_true',
+                        help='keep the intermediary CSV files, and continue an interrupted '
+                             'translation, or translate only the daily logs not yet translated')
+    parser.add_argument('--load-workers', type=int, metavar='N',
+                        help='load N MOOCdb tables at a time, over a pool of N connections, '
+                             'adding their secondary keys once loaded')
+    parser.add_argument('--index-workers', type=int, default=1, metavar='N',
+                        help='with --load-workers, add the keys of N tables at a time')
+    parser.add_argument('--qpipe-workers', type=int, default=1, metavar='N',
+                        help='process the events in N processes, partitioned by user')
+    parser.add_argument('--idle-timeout', type=int, metavar='MINUTES',
+                        help='drop the state of users idle for MINUTES of event time; '
+                             'must exceed the 60 minute maximum event duration')
+    parser.add_argument('--sort-by', choices=['time', 'user'],
+                        help='sort the events by time, or by user then time, before processing')
+    parser.add_argument('--progress-interval', type=int, default=10, metavar='SECONDS',
+                        help='report the progress of the event processing every SECONDS')
+    parser.add_argument('--metrics-path', metavar='PATH',
+                        help='append the progress reports as JSON lines to PATH, '
+                             'rather than printing them')
+    parser.add_argument('--profile', action='store_true',
+                        help='write the time spent in each stage of the event processing '
+                             'to profile.csv in the MOOCdb CSV folder')
+    args = parser.parse_args()
+    if args.fused and args.resume:
+        parser.error('--resume cannot be used with --fused, which does not keep '
+                     'the intermediary CSV files')
+    if args.config_file is None:
         cfg = config.ConfigParser()
     else:
-        cfg = config.ConfigParser(sys.argv[1])
+        cfg = config.ConfigParser(args.config_file)
     if not cfg.is_valid():
         sys.exit("Config file is invalid.")
     cfg_mysql = cfg.get_or_query_mysql()
 
-    main()
+    qpipe_options = {'workers': args.qpipe_workers,
+                     'idle_timeout': args.idle_timeout,
+                     'sort_by': args.sort_by,
+                     'progress_interval': args.progress_interval,
+                     'metrics_path': args.metrics_path,
+                     'profile': args.profile}
+
+    apipe_options = {'workers': args.apipe_workers,
+                     'resume': args.resume}
+
+    main(args.fused, args.keep_intermediary, args.load_workers, args.index_workers,
+         qpipe_options, apipe_options)
@@ -1,5 +1,14 @@
+# Add json_to_relation source dir to $PATH, for the
+# anonymization hash function of the tracking log transform:
+import os
+import sys
+
+source_dir = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "../edx_pipe/apipe/json_to_relation/")]
+source_dir.extend(sys.path)
+sys.path = source_dir
+
 from process import report
-import hashlib
+from anon_hash import makeHash
 
 def UNIT_MAP_IDENTICAL(x):
     return x
@@ -12,9 +21,7 @@ def UNIT_MAP_CONVERT_BOOL_TO_TINYINT(x):
         return 0
 
 def UNIT_MAP_HASH_USERNAME(x):
-    oneHash = hashlib.new('ripemd160')
-    oneHash.update(x)
-    return oneHash.hexdigest()
+    return makeHash(x)
 
 
 PRE_MAP_DICT = {